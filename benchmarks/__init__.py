@@ -0,0 +1 @@
+"""Benchmark and load-test scripts. Run from the project root, e.g. `python -m benchmarks.worker_load_test`."""
@@ -0,0 +1,98 @@
+"""
+WhisperX transcription sweep: transcribe the same audio with every combination of
+ASR threads, batch size and chunk length, and report the real-time factor (RTF =
+transcription seconds / audio seconds, lower is faster) of each, with the process RSS
+high-water mark after it (cumulative over the sweep, so only an increase is attributable
+to that setting).
+
+The model (WHISPER_MODEL / WHISPER_COMPUTE / WHISPER_DEVICE from .env) is loaded once
+per thread count. A setting that runs out of memory is reported and skipped. With
+--save the fastest setting is written to ASR_TUNING_FILE, where ASR_AUTOTUNE=1 picks
+it up (src/asr_tuning.py).
+
+Usage:
+    python -m benchmarks.asr_sweep meeting.wav --threads 8,16,32 --batch-sizes 4,8,16,32 \\
+        --chunk-sizes 15,30 --seconds 300 --save
+"""
+
+import argparse
+import gc
+import itertools
+import time
+
+from main import pipeline_options
+from config import ASR_TUNING_FILE
+from src.asr_tuning import probe_resources, save_tuning, tuning_key
+from src.audio_utils import load_audio, SAMPLE_RATE
+from src.profiling import peak_rss_mb, format_mb
+from src.transcription import load_asr_model
+
+
+def _ints(value: str) -> list:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_path")
+    parser.add_argument("--threads", default="4", help="comma-separated ASR thread counts (default: 4)")
+    parser.add_argument("--batch-sizes", default="4,8,16", help="comma-separated batch sizes (default: 4,8,16)")
+    parser.add_argument("--chunk-sizes", default="30", help="comma-separated chunk lengths in s (default: 30)")
+    parser.add_argument("--seconds", type=float, default=300, help="audio to transcribe per run (default: 300)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per setting (fastest kept)")
+    parser.add_argument("--save", action="store_true", help="save the fastest setting to ASR_TUNING_FILE")
+    args = parser.parse_args()
+
+    options = pipeline_options()
+    model_name, compute_type, device = options["model_name"], options["compute_type"], options["device"]
+    audio = load_audio(args.input_path)
+    if args.seconds:
+        audio = audio[:int(args.seconds * SAMPLE_RATE)]
+    audio_seconds = len(audio) / SAMPLE_RATE
+    resources = probe_resources(device)
+    print(f"[bench] {model_name} ({compute_type}, {device}), {audio_seconds:.0f}s of audio, "
+          f"{resources['cores']} cores, {format_mb(resources['memory_mb'])} available")
+
+    rows = []
+    for threads in _ints(args.threads):
+        model = load_asr_model(model_name, language=options["language"], device=device,
+                               compute_type=compute_type, threads=threads)
+        model.transcribe(audio[:30 * SAMPLE_RATE], batch_size=1)   # warm-up
+        for batch_size, chunk_size in itertools.product(_ints(args.batch_sizes), _ints(args.chunk_sizes)):
+            samples = []
+            try:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    model.transcribe(audio, batch_size=batch_size, chunk_size=chunk_size)
+                    samples.append(time.perf_counter() - start)
+            except (MemoryError, RuntimeError) as e:
+                print(f"[bench] threads={threads} batch={batch_size} chunk={chunk_size}: "
+                      f"{type(e).__name__}: {e}")
+                rows.append((threads, batch_size, chunk_size, None, peak_rss_mb()))
+                gc.collect()
+                continue
+            rows.append((threads, batch_size, chunk_size, min(samples) / audio_seconds, peak_rss_mb()))
+        del model
+        gc.collect()
+
+    print(f"[bench] {'threads':>7} {'batch':>6} {'chunk':>6} {'RTF':>7} {'x realtime':>10} {'RSS high-water':>14}")
+    for threads, batch_size, chunk_size, rtf, peak in rows:
+        speed = "failed" if rtf is None else f"{1 / rtf:>9.1f}x"
+        print(f"[bench] {threads:>7} {batch_size:>6} {chunk_size:>6} "
+              f"{'-' if rtf is None else f'{rtf:.3f}':>7} {speed:>10} {format_mb(peak):>14}")
+
+    finished = [r for r in rows if r[3] is not None]
+    if not finished:
+        raise SystemExit("no setting completed")
+    threads, batch_size, chunk_size, rtf, _ = min(finished, key=lambda r: r[3])
+    print(f"[bench] fastest: threads={threads} batch={batch_size} chunk={chunk_size} (RTF {rtf:.3f})")
+    if args.save:
+        settings = {"asr_batch_size": batch_size, "asr_chunk_size": chunk_size, "asr_threads": threads}
+        save_tuning(tuning_key(model_name, compute_type, device),
+                    dict(settings, source="sweep", rtf=rtf, cores=resources["cores"],
+                         memory_mb=resources["memory_mb"]), ASR_TUNING_FILE)
+        print(f"[bench] saved to {ASR_TUNING_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Batch-mode scaling benchmark: run the same set of recordings with 1, 2, 4, ...
+worker processes and report throughput, speed-up and parallel efficiency.
+
+Each run writes to a fresh temporary output directory (with its own audio cache), so
+nothing is skipped and every run decodes its inputs from scratch.
+
+Usage:
+    python -m benchmarks.batch_scaling recordings/ --workers 1,2,4
+"""
+
+import argparse
+import os
+import tempfile
+
+from main import pipeline_options
+from src.batch import collect_inputs, run_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", help="directory, glob pattern, or manifest")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts (default: 1,2,4)")
+    args = parser.parse_args()
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        raise SystemExit(f"no audio files found for: {args.inputs}")
+    counts = [int(c) for c in args.workers.split(",")]
+    print(f"[bench] {len(inputs)} files, worker counts {counts}, {os.cpu_count()} cores")
+
+    rows = []
+    for count in counts:
+        with tempfile.TemporaryDirectory(prefix="batch_bench_") as out_dir:
+            options = dict(pipeline_options(), output_dir=out_dir, audio_cache_dir=os.path.join(out_dir, "audio"))
+            summary = run_batch(inputs, options, workers=count, retries=0, force=True)
+        rows.append((count, summary["wall_s"], summary["files_per_min"], summary["failed"]))
+
+    # speed-up is relative to the first (smallest) worker count; efficiency scales by the worker ratio
+    base_count, base_wall = rows[0][0], rows[0][1]
+    print(f"[bench] {'workers':>7} {'wall_s':>9} {'files/min':>10} {'speed-up':>9} {'efficiency':>10} {'failed':>6}")
+    for count, wall, fpm, failed in rows:
+        speedup = base_wall / wall if wall > 0 else float("nan")
+        efficiency = speedup * base_count / count
+        print(f"[bench] {count:>7} {wall:>9.1f} {fpm:>10.2f} {speedup:>8.2f}x {efficiency:>9.0%} {failed:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Shared helpers for benchmark scripts: percentiles and latency summaries.
+"""
+
+import math
+
+
+def percentile(values, q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of a non-empty sequence."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    pos = (len(ordered) - 1) * q / 100.0
+    lo, hi = math.floor(pos), math.ceil(pos)
+    if lo == hi:
+        return ordered[lo]
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def summarize_latencies(latencies, wall_seconds: float) -> dict:
+    """Throughput and latency percentiles for a batch of completed jobs."""
+    return {
+        "jobs": len(latencies),
+        "wall_s": wall_seconds,
+        "jobs_per_min": 60.0 * len(latencies) / wall_seconds if wall_seconds > 0 else float("nan"),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "max_s": max(latencies) if latencies else float("nan"),
+    }
+
+
+def print_summary(label: str, summary: dict):
+    print(
+        f"[bench] {label:<10} jobs={summary['jobs']:<4} "
+        f"throughput={summary['jobs_per_min']:.2f} jobs/min  "
+        f"p50={summary['p50_s']:.2f}s  p95={summary['p95_s']:.2f}s  max={summary['max_s']:.2f}s"
+    )
@@ -0,0 +1,92 @@
+"""
+Speaker-embedding backend benchmark: embed the same segments with every ECAPA
+backend (src/ecapa_backends.py) and report throughput (audio-seconds embedded per
+second), plus speed-up and cosine agreement relative to the first backend listed
+(eager fp32 by default).
+
+Segments are cut from the reference clips when config/references.json has audio,
+otherwise from seeded noise (fine for speed and parity, not for accuracy).
+
+Usage:
+    python -m benchmarks.ecapa_bench --backends eager,int8,torchscript,onnx,onnx-int8 --threads 4
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from main import pipeline_options
+from src.audio_utils import SAMPLE_RATE
+from src.ecapa_backends import ECAPA_BACKENDS, optimize_verifier
+from src.speaker_verification import load_verification_model, embed_waveforms
+from benchmarks.synthetic import load_reference_audio
+
+
+def make_segments(ref_config_path: str, count: int, seconds=(1.0, 8.0), seed: int = 0) -> list:
+    """`count` waveforms of random length, cut from the reference audio if there is any."""
+    rng = np.random.default_rng(seed)
+    clips = [c for clips in load_reference_audio(ref_config_path).values() for c in clips]
+    segments = []
+    for _ in range(count):
+        length = int(rng.uniform(*seconds) * SAMPLE_RATE)
+        if clips:
+            clip = clips[rng.integers(len(clips))]
+            length = min(length, len(clip))
+            offset = rng.integers(0, len(clip) - length + 1)
+            segments.append(clip[offset:offset + length])
+        else:
+            segments.append((rng.standard_normal(length) * 0.1).astype(np.float32))
+    return segments
+
+
+def cosine_rows(a, b):
+    a, b = np.asarray(a).reshape(len(a), -1), np.asarray(b).reshape(len(b), -1)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(ECAPA_BACKENDS), help="comma-separated backends")
+    parser.add_argument("--segments", type=int, default=200, help="segments to embed per run")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (default: torch default)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per backend (median kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = pipeline_options()
+    segments = make_segments(options["ref_config_path"], args.segments, seed=args.seed)
+    audio_seconds = sum(len(s) for s in segments) / SAMPLE_RATE
+    batch_opts = dict(target_sr=SAMPLE_RATE, max_batch_samples=options["embed_max_batch_samples"],
+                      max_batch_rows=options["embed_max_batch_rows"])
+    print(f"[bench] {len(segments)} segments, {audio_seconds:.0f}s of audio, threads={args.threads or 'default'}")
+
+    base = load_verification_model(device="cpu")
+    reference = None
+    rows = []
+    for backend in args.backends.split(","):
+        verifier = optimize_verifier(base, backend=backend, threads=args.threads)
+        if verifier.backend != backend:
+            print(f"[bench] skipping {backend}: not available")
+            continue
+        embed_waveforms(verifier, segments[:8], **batch_opts)   # warm-up
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            embeddings = embed_waveforms(verifier, segments, **batch_opts)
+            samples.append(time.perf_counter() - start)
+        if reference is None:
+            reference = embeddings
+        cos = cosine_rows(reference, embeddings)
+        rows.append((backend, statistics.median(samples), float(cos.min()), float(cos.mean())))
+
+    base_seconds = rows[0][1] if rows else float("nan")
+    print(f"[bench] {'backend':<18} {'seconds':>9} {'audio s/s':>10} {'speed-up':>9} {'min cos':>8} {'mean cos':>9}")
+    for backend, seconds, min_cos, mean_cos in rows:
+        print(f"[bench] {backend:<18} {seconds:>9.2f} {audio_seconds / seconds:>10.1f} "
+              f"{base_seconds / seconds:>8.2f}x {min_cos:>8.4f} {mean_cos:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Replay harness for live mode: feed an audio file into LiveCaptioner at real-time
+(1x) speed and measure end-to-end caption latency, i.e. the wall-clock delay
+between the moment the last sample of a caption was "spoken" and the caption
+being emitted.
+
+Usage:
+    python -m benchmarks.live_replay meeting.wav [--speed 1.0] [--block 0.1]
+"""
+
+import argparse
+import time
+
+from benchmarks.common import percentile
+from main import pipeline_options
+from src.audio_utils import load_audio, SAMPLE_RATE
+from src.live import build_live_captioner, run_live, print_caption
+
+
+def paced_frames(audio, speed, block_seconds, clock):
+    """Yield blocks no faster than real time (scaled by `speed`)."""
+    block = int(block_seconds * SAMPLE_RATE)
+    for i in range(0, len(audio), block):
+        due = clock["t0"] + (i + block) / SAMPLE_RATE / speed
+        delay = due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        yield audio[i:i + block]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_path")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed (default: 1.0 = real time)")
+    parser.add_argument("--block", type=float, default=0.1, help="seconds per fed block (default: 0.1)")
+    args = parser.parse_args()
+
+    options = pipeline_options()
+    keys = ("ref_config_path", "model_name", "language", "device", "compute_type", "asr_threads",
+            "similarity_threshold", "matcher_backend", "index_nprobe")
+    clock = {"t0": None}
+    latencies = {"partial": [], "final": []}
+
+    def on_caption(caption):
+        spoken_at = clock["t0"] + caption["end"] / args.speed
+        latencies[caption["type"]].append(caption["emitted_at"] - spoken_at)
+        print_caption(caption)
+
+    captioner = build_live_captioner(on_caption=on_caption, **{k: options[k] for k in keys})
+    audio = load_audio(args.input_path)
+
+    clock["t0"] = time.time()
+    run_live(paced_frames(audio, args.speed, args.block, clock), captioner)
+    wall = time.time() - clock["t0"]
+
+    print(f"[bench] Replayed {len(audio) / SAMPLE_RATE:.1f}s of audio in {wall:.1f}s at {args.speed}x")
+    for kind, values in latencies.items():
+        if values:
+            print(f"[bench] {kind:<8} captions={len(values):<4} latency p50={percentile(values, 50):.2f}s "
+                  f"p95={percentile(values, 95):.2f}s max={max(values):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
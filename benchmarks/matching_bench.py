@@ -0,0 +1,58 @@
+"""
+Microbenchmark: per-segment match_speaker loop vs the vectorized SpeakerMatcher.
+
+Uses random 192-d embeddings (ECAPA size). The loop baseline is O(segments x refs)
+Python calls, so at large roster sizes it is timed on a subset of segments
+(bounded by --loop-max-calls) and reported per segment.
+
+Usage:
+    python -m benchmarks.matching_bench --refs 10,1000,100000 --segments 1000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.matching import SpeakerMatcher
+from src.speaker_verification import match_speaker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--refs", default="10,1000,100000", help="comma-separated roster sizes")
+    parser.add_argument("--segments", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=192)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--loop-max-calls", type=int, default=2_000_000,
+                        help="cap on cosine_similarity calls for the loop baseline")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    segments = rng.standard_normal((args.segments, 1, args.dim)).astype(np.float32)
+
+    print(f"[bench] {'refs':>7} {'loop us/seg':>12} {'matrix us/seg':>14} {'build ms':>9} {'speed-up':>9} {'agree':>6}")
+    for n_refs in (int(r) for r in args.refs.split(",")):
+        refs = {f"spk{i}": v for i, v in enumerate(rng.standard_normal((n_refs, args.dim)).astype(np.float32))}
+
+        loop_n = max(1, min(args.segments, args.loop_max_calls // n_refs))
+        t0 = time.perf_counter()
+        loop_labels = [match_speaker(e, refs, threshold=0.0) for e in segments[:loop_n]]
+        loop_us = (time.perf_counter() - t0) / loop_n * 1e6
+
+        t0 = time.perf_counter()
+        matcher = SpeakerMatcher.from_dict(refs)
+        build_ms = (time.perf_counter() - t0) * 1e3
+
+        t0 = time.perf_counter()
+        labels, _, _ = matcher.match(segments, threshold=0.0, top_k=args.top_k)
+        matrix_us = (time.perf_counter() - t0) / args.segments * 1e6
+
+        agree = np.mean([a == b for a, b in zip(loop_labels, labels[:loop_n])])
+        print(f"[bench] {n_refs:>7} {loop_us:>12.1f} {matrix_us:>14.2f} {build_ms:>9.1f} "
+              f"{loop_us / matrix_us:>8.0f}x {agree:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
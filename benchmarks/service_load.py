@@ -0,0 +1,145 @@
+"""
+Load generator for the HTTP job service (`python main.py serve`): replay a directory
+of recordings against it and report sustained throughput and tail latency.
+
+Jobs arrive at a fixed --rate (open loop: arrivals do not wait for earlier results),
+or, without --rate, from --concurrency clients that each submit their next job when
+the previous one finishes. A 429 is honoured (sleep Retry-After, resubmit) and
+counted. Latency is end to end: first submission attempt to finished result.
+
+Usage:
+    python main.py serve --workers 2 --max-queue 8 &
+    python -m benchmarks.service_load recordings/ --jobs 50 --concurrency 4
+    python -m benchmarks.service_load recordings/ --jobs 100 --rate 0.2 --upload
+"""
+
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentile, summarize_latencies, print_summary
+from src.batch import collect_inputs
+
+
+def request(method: str, url: str, body: bytes = None, content_type: str = "application/json",
+            timeout: float = 600) -> tuple:
+    """(status, headers, parsed JSON body); HTTP error statuses are returned, not raised."""
+    req = urllib.request.Request(url, data=body, method=method, headers={"Content-Type": content_type})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.headers, json.loads(resp.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, json.loads(e.read() or b"{}")
+
+
+def wait_for_service(url: str, timeout: float):
+    """Poll /health until every worker has its models loaded."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if request("GET", f"{url}/health", timeout=5)[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(1.0)
+    raise TimeoutError(f"service at {url} not ready after {timeout}s")
+
+
+class LoadRunner:
+    def __init__(self, url: str, upload: bool, wait: float):
+        self.url = url
+        self.upload = upload
+        self.wait = wait
+        self.rejections = 0
+        self._lock = threading.Lock()
+
+    def submit(self, path: str) -> str:
+        if self.upload:
+            with open(path, "rb") as f:
+                body = f.read()
+            url = f"{self.url}/jobs?filename={urllib.request.quote(os.path.basename(path))}"
+            args = (body, "application/octet-stream")
+        else:
+            url = f"{self.url}/jobs"
+            args = (json.dumps({"input_path": os.path.abspath(path)}).encode("utf-8"), "application/json")
+        while True:
+            status, headers, payload = request("POST", url, *args)
+            if status == 202:
+                return payload["id"]
+            if status != 429:
+                raise RuntimeError(f"submit failed ({status}): {payload.get('error')}")
+            with self._lock:
+                self.rejections += 1
+            time.sleep(float(headers.get("Retry-After", 1)))
+
+    def run_one(self, path: str) -> dict:
+        start = time.perf_counter()
+        job_id = self.submit(path)
+        while True:
+            status, _, payload = request("GET", f"{self.url}/jobs/{job_id}/result?wait={self.wait}")
+            if status != 202:
+                return {"ok": status == 200, "latency_s": time.perf_counter() - start,
+                        "error": payload.get("error")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", help="directory, glob pattern, or manifest of recordings")
+    parser.add_argument("--url", default="http://127.0.0.1:8770")
+    parser.add_argument("--jobs", type=int, default=20, help="jobs to submit, cycling through the inputs")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second (default: closed loop)")
+    parser.add_argument("--concurrency", type=int, default=2, help="closed-loop clients (default: 2)")
+    parser.add_argument("--upload", action="store_true", help="upload the audio instead of sending its path")
+    parser.add_argument("--wait", type=float, default=30.0, help="long-poll seconds per result request")
+    parser.add_argument("--startup-timeout", type=float, default=900.0)
+    args = parser.parse_args()
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        raise SystemExit(f"no audio files found for: {args.inputs}")
+    wait_for_service(args.url, args.startup_timeout)
+    paths = list(itertools.islice(itertools.cycle(files), args.jobs))
+    runner = LoadRunner(args.url, args.upload, args.wait)
+    mode = f"{args.rate}/s open loop" if args.rate > 0 else f"{args.concurrency} closed-loop clients"
+    print(f"[bench] {len(paths)} jobs from {len(files)} files, {mode}, {'upload' if args.upload else 'path'} mode")
+
+    start = time.perf_counter()
+    if args.rate > 0:
+        def arrive(i, path):
+            time.sleep(max(0.0, start + i / args.rate - time.perf_counter()))
+            return runner.run_one(path)
+
+        with ThreadPoolExecutor(max_workers=min(len(paths), 512)) as pool:
+            outcomes = list(pool.map(arrive, range(len(paths)), paths))
+    else:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(runner.run_one, paths))
+    wall = time.perf_counter() - start
+
+    latencies = [o["latency_s"] for o in outcomes if o["ok"]]
+    failed = [o for o in outcomes if not o["ok"]]
+    summary = summarize_latencies(latencies, wall)
+    print_summary("service", summary)
+    print(f"[bench] p99={percentile(latencies, 99):.2f}s  failed={len(failed)}  "
+          f"429 rejections={runner.rejections}")
+    for outcome in failed[:5]:
+        print(f"[bench]   failed: {outcome['error']}")
+
+    _, _, metrics = request("GET", f"{args.url}/metrics")
+
+    def seconds(kind, q):
+        value = metrics[kind][q]
+        return "n/a" if value is None else f"{value:.2f}s"
+
+    print(f"[bench] server: queue wait p50={seconds('queue_wait_s', 'p50')} p95={seconds('queue_wait_s', 'p95')}, "
+          f"run p50={seconds('run_s', 'p50')} p95={seconds('run_s', 'p95')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Reproducible benchmark suite with regression tracking.
+
+`run` builds synthetic meetings from the references (benchmarks/synthetic.py) for every
+audio length x speaker count, runs the full pipeline on each (result cache disabled,
+models loaded once) and records every stage's wall time, CPU time, RSS change and RTF
+plus speaker accuracy against the ground truth. It also microbenchmarks
+embed_segments, match_speaker (vs the vectorized matcher) and load_reference_embeddings
+(cold and warm). Results go to one JSON file with the environment they were measured in.
+
+`compare` diffs two result files and exits non-zero when any timing got slower than
+the tolerance allows (or accuracy dropped), so it can gate upgrades in CI.
+
+Usage:
+    python -m benchmarks.suite run --lengths 60,300 --speakers 2,4 --out benchmarks/results/baseline.json
+    python -m benchmarks.suite run --micro-only --out current.json
+    python -m benchmarks.suite compare benchmarks/results/baseline.json current.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import load_reference_audio, build_meeting, write_meeting, speaker_accuracy
+
+TIMING_KEYS = ("seconds", "cpu_seconds")
+
+
+def _versions() -> dict:
+    from importlib import metadata
+    versions = {}
+    for package in ("whisperx", "speechbrain", "torch", "numpy", "ctranslate2", "pyannote.audio"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def _median_records(records: list) -> dict:
+    """Per-field median over repeated stage records (None fields are skipped)."""
+    merged = {}
+    for key in records[0]:
+        values = [r[key] for r in records if r.get(key) is not None]
+        merged[key] = statistics.median(values) if values else None
+    return merged
+
+
+def _repeat(fn, repeat: int) -> dict:
+    """Time `fn` `repeat` times; returns median / min seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(samples), "min_seconds": min(samples), "repeat": repeat}
+
+
+# ----------------------------
+# pipeline runs
+# ----------------------------
+def bench_pipeline(options, models, reference_audio, lengths, speakers, repeat, seed, work_dir) -> dict:
+    from src.pipeline import run_pipeline
+
+    results = {}
+    for seconds in lengths:
+        for n_speakers in speakers:
+            if n_speakers > len(reference_audio):
+                print(f"[bench] skipping {n_speakers} speakers: only {len(reference_audio)} references")
+                continue
+            name = f"{int(seconds)}s-{n_speakers}spk"
+            meeting = build_meeting(reference_audio, n_speakers, seconds, seed=seed)
+            path = write_meeting(meeting, os.path.join(work_dir, f"{name}.wav"))
+            runs, accuracy = [], []
+            for _ in range(repeat):
+                result = run_pipeline(input_path=path, models=models,
+                                      **dict(options, output_dir=work_dir, cache_dir=None))
+                runs.append(result["timings"])
+                accuracy.append(speaker_accuracy(result["labels"], meeting["turns"]))
+            stages = {stage: _median_records([r[stage] for r in runs if stage in r]) for stage in runs[0]}
+            results[name] = {
+                "audio_seconds": seconds,
+                "speakers": n_speakers,
+                "accuracy": statistics.median(accuracy),
+                "stages": stages,
+            }
+            print(f"[bench] {name}: accuracy {results[name]['accuracy']:.1%}, "
+                  f"total {sum(s['seconds'] for k, s in stages.items() if '.' not in k):.2f}s")
+    return results
+
+
+# ----------------------------
+# microbenchmarks
+# ----------------------------
+def bench_micro(options, verifier, reference_audio, repeat, seed, work_dir) -> dict:
+    from src.matching import SpeakerMatcher
+    from src.reference_store import ReferenceStore
+    from src.speaker_utils import sync_reference_store
+    from src.speaker_verification import embed_segments, match_speaker
+
+    results = {}
+    rng = np.random.default_rng(seed)
+
+    # embed_segments on a 2-minute synthetic meeting, segmented at the true turns
+    n_speakers = min(3, len(reference_audio))
+    meeting = build_meeting(reference_audio, n_speakers, 120, seed=seed)
+    segments = [{"start": s, "end": e, "text": ""} for s, e, _ in meeting["turns"]]
+    batch_opts = dict(max_batch_samples=options["embed_max_batch_samples"],
+                      max_batch_rows=options["embed_max_batch_rows"])
+    results["embed_segments"] = dict(
+        _repeat(lambda: embed_segments(verifier, meeting["audio"], meeting["sr"], segments, **batch_opts), repeat),
+        segments=len(segments), audio_seconds=120)
+
+    # match_speaker (per-segment loop) vs SpeakerMatcher (one matrix product)
+    dim = 192
+    refs = {f"spk{i}": v for i, v in enumerate(rng.standard_normal((100, dim)).astype(np.float32))}
+    queries = rng.standard_normal((1000, dim)).astype(np.float32)
+    results["match_speaker"] = dict(
+        _repeat(lambda: [match_speaker(q, refs, threshold=0.0) for q in queries], repeat),
+        refs=len(refs), segments=len(queries))
+    matcher = SpeakerMatcher.from_dict(refs)
+    results["speaker_matcher"] = dict(
+        _repeat(lambda: matcher.match(queries, threshold=0.0), repeat), refs=len(refs), segments=len(queries))
+
+    # load_reference_embeddings: cold (empty store, everything embedded) and warm (stat-only)
+    sync_opts = dict(hash_algo=options["reference_hash"], threads=options["reference_sync_threads"])
+
+    def cold():
+        store_dir = tempfile.mkdtemp(prefix="store_", dir=work_dir)
+        sync_reference_store(options["ref_config_path"], verifier, store=ReferenceStore(store_dir), **sync_opts)
+
+    results["load_reference_embeddings.cold"] = _repeat(cold, repeat)
+    warm_store = ReferenceStore(tempfile.mkdtemp(prefix="store_", dir=work_dir))
+    sync_reference_store(options["ref_config_path"], verifier, store=warm_store, **sync_opts)
+    results["load_reference_embeddings.warm"] = _repeat(
+        lambda: sync_reference_store(options["ref_config_path"], verifier, store=warm_store, **sync_opts), repeat)
+
+    for name, r in results.items():
+        print(f"[bench] {name:<32} median {r['seconds'] * 1e3:9.2f} ms   min {r['min_seconds'] * 1e3:9.2f} ms")
+    return results
+
+
+def run(args):
+    from main import pipeline_options
+    from src.models import load_models
+
+    options = pipeline_options()
+    reference_audio = load_reference_audio(options["ref_config_path"])
+    if not reference_audio:
+        raise SystemExit(f"no reference audio found via {options['ref_config_path']}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "packages": _versions(),
+        },
+        "config": {k: v for k, v in options.items() if k != "hf_token"},
+        "seed": args.seed,
+        "repeat": args.repeat,
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench_suite_") as work_dir:
+        start = time.perf_counter()
+        if args.micro_only:
+            from src.speaker_verification import load_verification_model
+            models = None
+            verifier = load_verification_model(device=options["device"], backend=options["ecapa_backend"],
+                                               threads=options["ecapa_threads"],
+                                               interop_threads=options["ecapa_interop_threads"])
+        else:
+            models = load_models(model_name=options["model_name"], language=options["language"],
+                                 device=options["device"], compute_type=options["compute_type"],
+                                 hf_token=options["hf_token"], asr_threads=options["asr_threads"],
+                                 ecapa_backend=options["ecapa_backend"], ecapa_threads=options["ecapa_threads"],
+                                 ecapa_interop_threads=options["ecapa_interop_threads"])
+            verifier = models.verifier
+        report["model_load_seconds"] = time.perf_counter() - start
+
+        report["micro"] = bench_micro(options, verifier, reference_audio, args.repeat, args.seed, work_dir)
+        if not args.micro_only:
+            lengths = [float(x) for x in args.lengths.split(",")]
+            speakers = [int(x) for x in args.speakers.split(",")]
+            report["pipeline"] = bench_pipeline(options, models, reference_audio, lengths, speakers,
+                                                args.repeat, args.seed, work_dir)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] Results written to {args.out}")
+
+
+# ----------------------------
+# regression comparison
+# ----------------------------
+def flatten(report: dict) -> dict:
+    """{metric name: value} for every timing (and accuracy) in a results file."""
+    metrics = {}
+    for name, r in report.get("micro", {}).items():
+        metrics[f"micro/{name}"] = r["seconds"]
+    for name, r in report.get("pipeline", {}).items():
+        metrics[f"pipeline/{name}/accuracy"] = r["accuracy"]
+        for stage, record in r["stages"].items():
+            for key in TIMING_KEYS:
+                if record.get(key) is not None:
+                    metrics[f"pipeline/{name}/{stage}/{key}"] = record[key]
+    return metrics
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float = 0.15, min_seconds: float = 0.01,
+                    accuracy_tolerance: float = 0.02):
+    """
+    Return (rows, regressions). A timing regresses when it is more than `tolerance`
+    (relative) and `min_seconds` (absolute, to ignore noise on tiny stages) slower;
+    accuracy regresses when it drops by more than `accuracy_tolerance`.
+    """
+    base, cur = flatten(baseline), flatten(current)
+    rows, regressions = [], []
+    for metric in sorted(set(base) & set(cur)):
+        b, c = base[metric], cur[metric]
+        if metric.endswith("/accuracy"):
+            regressed = c < b - accuracy_tolerance
+        else:
+            regressed = c > b * (1 + tolerance) and c - b > min_seconds
+        change = (c - b) / b if b else float("nan")
+        rows.append((metric, b, c, change, regressed))
+        if regressed:
+            regressions.append(metric)
+    return rows, regressions
+
+
+def compare(args):
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    if baseline.get("environment", {}).get("packages") != current.get("environment", {}).get("packages"):
+        print("[bench] note: package versions differ between the two runs")
+    rows, regressions = compare_reports(baseline, current, args.tolerance, args.min_seconds,
+                                        args.accuracy_tolerance)
+    print(f"[bench] {'metric':<60} {'baseline':>10} {'current':>10} {'change':>8}")
+    for metric, b, c, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"[bench] {metric:<60} {b:>10.4f} {c:>10.4f} {change:>+8.1%}{flag}")
+    if regressions:
+        print(f"[bench] {len(regressions)} regression(s) beyond tolerance")
+        sys.exit(1)
+    print("[bench] No regressions.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the suite and write a results JSON")
+    run_parser.add_argument("--lengths", default="60,300", help="comma-separated meeting lengths in seconds")
+    run_parser.add_argument("--speakers", default="2,4", help="comma-separated speaker counts")
+    run_parser.add_argument("--repeat", type=int, default=3, help="repetitions per measurement (median kept)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--micro-only", action="store_true", help="skip the full-pipeline runs")
+    run_parser.add_argument("--out", default=os.path.join("benchmarks", "results", "latest.json"))
+
+    cmp_parser = sub.add_parser("compare", help="flag regressions between two results files")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("current")
+    cmp_parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slow-down")
+    cmp_parser.add_argument("--min-seconds", type=float, default=0.01, help="ignore slow-downs smaller than this")
+    cmp_parser.add_argument("--accuracy-tolerance", type=float, default=0.02, help="allowed accuracy drop")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Cold vs warm load test for the persistent worker.
+
+Cold: every job is a fresh `python main.py <file>` process (models reloaded each time).
+Warm: jobs are sent to one `python main.py worker --port N` process that keeps models loaded.
+
+Usage:
+    python -m benchmarks.worker_load_test refs/amit2.wav refs/chirag.wav --jobs 10
+    python -m benchmarks.worker_load_test meeting.wav --jobs 20 --skip-cold --concurrency 2
+"""
+
+import argparse
+import itertools
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import summarize_latencies, print_summary
+from src.worker import submit_job
+
+
+def run_cold(files, jobs):
+    latencies = []
+    start = time.perf_counter()
+    for path in itertools.islice(itertools.cycle(files), jobs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "main.py", path], check=True,
+                       stdout=subprocess.DEVNULL)
+        latencies.append(time.perf_counter() - t0)
+    return summarize_latencies(latencies, time.perf_counter() - start)
+
+
+def wait_for_worker(host, port, timeout):
+    """Poll the worker with pings until its models are loaded."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return submit_job(host=host, port=port, request={"op": "ping"}, timeout=5)
+        except OSError:
+            time.sleep(1.0)
+    raise TimeoutError(f"worker on {host}:{port} not ready after {timeout}s")
+
+
+def run_warm(files, jobs, host, port, concurrency):
+    def one(path):
+        t0 = time.perf_counter()
+        response = submit_job(path, host=host, port=port)
+        if response.get("status") != "ok":
+            raise RuntimeError(f"job failed: {response.get('error')}")
+        return time.perf_counter() - t0
+
+    paths = list(itertools.islice(itertools.cycle(files), jobs))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, paths))
+    return summarize_latencies(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="audio files to cycle through")
+    parser.add_argument("--jobs", type=int, default=10, help="jobs per mode (default: 10)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent warm clients")
+    parser.add_argument("--skip-cold", action="store_true", help="only measure the warm worker")
+    parser.add_argument("--startup-timeout", type=float, default=900.0)
+    args = parser.parse_args()
+
+    if not args.skip_cold:
+        print(f"[bench] Cold: {args.jobs} fresh processes...")
+        cold = run_cold(args.files, args.jobs)
+        print_summary("cold", cold)
+
+    print(f"[bench] Starting worker on {args.host}:{args.port}...")
+    t0 = time.perf_counter()
+    worker = subprocess.Popen([sys.executable, "main.py", "worker",
+                               "--host", args.host, "--port", str(args.port)],
+                              stdout=subprocess.DEVNULL)
+    try:
+        wait_for_worker(args.host, args.port, args.startup_timeout)
+        print(f"[bench] Worker ready in {time.perf_counter() - t0:.1f}s (one-off model load)")
+        warm = run_warm(args.files, args.jobs, args.host, args.port, args.concurrency)
+        print_summary("warm", warm)
+    finally:
+        worker.terminate()
+        worker.wait()
+
+    if not args.skip_cold:
+        print(f"[bench] Warm speed-up (p50): {cold['p50_s'] / warm['p50_s']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,41 @@ Edit .env (or export env variables) to change behavior:
   - WHISPER_DEVICE: cpu|cuda|mps  (default: cpu)
   - WHISPER_COMPUTE: int8|float16  (default: int8)
   - SIMILARITY_THRESHOLD: float between 0 and 1 for speaker matching (default: 0.37)
+  - EMBED_MAX_BATCH_SAMPLES: padded samples per ECAPA batch (rows * longest) (default: 1920000 = 120 s @ 16 kHz)
+  - EMBED_MAX_BATCH_ROWS: maximum segments per ECAPA batch (default: 64)
+  - EMBED_MIN_SECONDS: shorter segments are not embedded and inherit a neighbour's label (default: 1.0, 0 = off)
+  - EMBED_MERGE_SECONDS: merge consecutive same-speaker segments into windows up to this long (default: 8, 0 = off)
+  - EMBED_MERGE_GAP_SECONDS: longest pause merged across within a window (default: 1.5, 0 = no limit)
+  - EMBED_MAX_SECONDS: trim each embedding window to its centre this long (default: 15, 0 = off)
+  - CONCURRENT_DIARIZATION: 1|0 run diarization in parallel with ASR + alignment (default: 1)
+  - ASR_THREADS: CTranslate2 CPU threads for WhisperX ASR (default: 4)
+  - ALIGN_THREADS / DIARIZE_THREADS: torch threads for alignment / diarization (default: 0 = auto split;
+    with CONCURRENT_DIARIZATION both stages share DIARIZE_THREADS, the count is process-wide)
+  - WHISPER_BATCH_SIZE: VAD chunks transcribed per WhisperX batch (default: 16)
+  - WHISPER_CHUNK_SIZE: maximum VAD chunk length in seconds (default: 30)
+  - ASR_AUTOTUNE: 1|0 size WHISPER_BATCH_SIZE / WHISPER_CHUNK_SIZE / ASR_THREADS to this machine (default: 0)
+  - ASR_TUNING_FILE: saved auto-tuned settings per model / compute type / device (default: .cache/asr_tuning.json)
+  - MATCHER_BACKEND: exact|ivf speaker matching (default: exact; ivf for very large rosters)
+  - INDEX_NPROBE: IVF cells visited per query (default: 8)
+  - SPEAKER_ID_MODE: cluster|segment identification (default: cluster)
+  - CLUSTER_MAX_SECONDS: audio pooled per diarized speaker in cluster mode (default: 30)
+  - RESULT_CACHE_DIR: stage-level result cache directory, empty to disable (default: .cache/results)
+  - RESULT_CACHE_MAX_MB: size cap for the result cache, LRU-evicted (default: 2048)
+  - STREAM_WINDOW_SECONDS / STREAM_OVERLAP_SECONDS: window and left-context for `main.py stream` (default: 600 / 5)
+  - SPEAKER_LINK_THRESHOLD: cosine needed to link a window's speaker to an earlier one (default: 0.5)
+  - REFERENCE_HASH: sha1|blake2b|xxhash content hash for changed reference files (default: sha1)
+  - REFERENCE_SYNC_THREADS: threads hashing / decoding changed references (default: 4)
+  - ENROLL_SUB_CENTROIDS: extra k-means centroids per speaker for `main.py enroll` (default: 0)
+  - METRICS_FILE: also write stage metrics in Prometheus text format here (default: empty = off)
+  - PROFILE_STAGES: comma-separated stages to profile, or "all" (default: empty = off)
+  - PROFILER: cprofile|sample profiler for PROFILE_STAGES (default: cprofile)
+  - ECAPA_BACKEND: eager|int8|torchscript|torchscript-int8|onnx|onnx-int8 speaker-embedding backend (default: eager)
+  - ECAPA_THREADS / ECAPA_INTEROP_THREADS: intra-/inter-op CPU threads for speaker embedding (default: 0 = torch default)
+  - AUDIO_CACHE_DIR: decoded-audio cache for inputs needing ffmpeg / resampling, empty to disable (default: .cache/audio)
+  - AUDIO_CACHE_MAX_MB: size cap for the decoded-audio cache, LRU-evicted (default: 4096)
+  - FFMPEG_JOBS: concurrent ffmpeg decodes ahead of the workers in `main.py batch` (default: 2)
+  - OUTPUT_FORMATS: comma-separated txt|jsonl|srt|vtt|parquet|arrow transcript outputs (default: txt)
+  - OUTPUT_TOP_K: candidate speakers (with scores) kept per segment in structured outputs (default: 3)
 """
 from dotenv import load_dotenv
 import os
@@ -24,3 +59,86 @@ WHISPER_COMPUTE = os.getenv("WHISPER_COMPUTE", "int8")
 # When matching segment embeddings against reference embeddings, the cosine
 # similarity must be >= this threshold to accept the match. Tune as needed.
 SIMILARITY_THRESHOLD = os.getenv("SIMILARITY_THRESHOLD", "0.37")
+
+# Segment embedding batches are bucketed by length and capped so that
+# rows * longest_segment stays under this many samples (bounds peak memory).
+EMBED_MAX_BATCH_SAMPLES = os.getenv("EMBED_MAX_BATCH_SAMPLES", "1920000")
+EMBED_MAX_BATCH_ROWS = os.getenv("EMBED_MAX_BATCH_ROWS", "64")
+
+# Before per-segment embedding, sub-second fragments are skipped (they inherit a label),
+# consecutive segments of one diarized speaker are merged, and long windows trimmed.
+EMBED_MIN_SECONDS = os.getenv("EMBED_MIN_SECONDS", "1.0")
+EMBED_MERGE_SECONDS = os.getenv("EMBED_MERGE_SECONDS", "8")
+EMBED_MERGE_GAP_SECONDS = os.getenv("EMBED_MERGE_GAP_SECONDS", "1.5")
+EMBED_MAX_SECONDS = os.getenv("EMBED_MAX_SECONDS", "15")
+
+# Diarization only reads the audio, so it can overlap ASR + alignment. The thread
+# budgets keep the concurrent stages from oversubscribing the CPU (0 = auto).
+CONCURRENT_DIARIZATION = os.getenv("CONCURRENT_DIARIZATION", "1")
+ASR_THREADS = os.getenv("ASR_THREADS", "4")
+ALIGN_THREADS = os.getenv("ALIGN_THREADS", "0")
+DIARIZE_THREADS = os.getenv("DIARIZE_THREADS", "0")
+
+# WhisperX transcribes VAD chunks of up to WHISPER_CHUNK_SIZE seconds, WHISPER_BATCH_SIZE
+# at a time. With ASR_AUTOTUNE these and ASR_THREADS come from ASR_TUNING_FILE, filled on
+# first run from the cores / memory available (or by `python -m benchmarks.asr_sweep --save`).
+WHISPER_BATCH_SIZE = os.getenv("WHISPER_BATCH_SIZE", "16")
+WHISPER_CHUNK_SIZE = os.getenv("WHISPER_CHUNK_SIZE", "30")
+ASR_AUTOTUNE = os.getenv("ASR_AUTOTUNE", "0")
+ASR_TUNING_FILE = os.getenv("ASR_TUNING_FILE", os.path.join(".cache", "asr_tuning.json"))
+
+# Exact matching is fine for small rosters; "ivf" uses the approximate speaker
+# index persisted at refs/speaker_index.npz for tens of thousands of voices.
+MATCHER_BACKEND = os.getenv("MATCHER_BACKEND", "exact")
+INDEX_NPROBE = os.getenv("INDEX_NPROBE", "8")
+
+# "cluster" embeds each diarized speaker once (from its longest clean regions, up to
+# CLUSTER_MAX_SECONDS) and labels all of its segments; "segment" embeds every segment.
+SPEAKER_ID_MODE = os.getenv("SPEAKER_ID_MODE", "cluster")
+CLUSTER_MAX_SECONDS = os.getenv("CLUSTER_MAX_SECONDS", "30")
+
+# Transcripts and speaker embeddings are cached by audio content hash + model
+# settings, so changing only the threshold or references re-runs just matching.
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(".cache", "results"))
+RESULT_CACHE_MAX_MB = os.getenv("RESULT_CACHE_MAX_MB", "2048")
+
+# Streaming mode (`python main.py stream`): window length, left-context overlap, and
+# the similarity needed to treat a window's diarized speaker as one seen earlier.
+STREAM_WINDOW_SECONDS = os.getenv("STREAM_WINDOW_SECONDS", "600")
+STREAM_OVERLAP_SECONDS = os.getenv("STREAM_OVERLAP_SECONDS", "5")
+SPEAKER_LINK_THRESHOLD = os.getenv("SPEAKER_LINK_THRESHOLD", "0.5")
+
+# Reference files are re-checked by size/mtime/inode first; only files whose stat
+# changed are content-hashed (xxhash needs the optional `xxhash` package).
+REFERENCE_HASH = os.getenv("REFERENCE_HASH", "sha1")
+REFERENCE_SYNC_THREADS = os.getenv("REFERENCE_SYNC_THREADS", "4")
+
+# `python main.py enroll <folder>`: besides each speaker's centroid, store up to this
+# many sub-centroids (k-means over its clips) for speakers with varied recordings.
+ENROLL_SUB_CENTROIDS = os.getenv("ENROLL_SUB_CENTROIDS", "0")
+
+# Every job writes outputs/<base>_report.json with per-stage wall / CPU time, peak RSS,
+# audio-seconds and real-time factor. METRICS_FILE adds a Prometheus textfile (e.g. for
+# node_exporter); PROFILE_STAGES wraps stages such as "transcription.asr" in a profiler.
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+PROFILE_STAGES = os.getenv("PROFILE_STAGES", "")
+PROFILER = os.getenv("PROFILER", "cprofile")
+
+# CPU speaker embedding: the ECAPA network can run as a TorchScript or ONNX (onnxruntime,
+# optional) graph, or with torch dynamic int8 (nn.Linear only, so refused for a Conv1d-only
+# network; onnx-int8 also quantizes Conv). Exports are cached in .cache/ecapa and checked
+# against the fp32 model; a backend that disagrees or fails falls back to eager.
+ECAPA_BACKEND = os.getenv("ECAPA_BACKEND", "eager")
+ECAPA_THREADS = os.getenv("ECAPA_THREADS", "0")
+ECAPA_INTEROP_THREADS = os.getenv("ECAPA_INTEROP_THREADS", "0")
+
+# Inputs that need ffmpeg (m4a, mp3, ...) or resampling are decoded once into this
+# content-keyed cache; nothing is written next to the source file.
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", os.path.join(".cache", "audio"))
+AUDIO_CACHE_MAX_MB = os.getenv("AUDIO_CACHE_MAX_MB", "4096")
+FFMPEG_JOBS = os.getenv("FFMPEG_JOBS", "2")
+
+# The `[speaker]: text` transcript is always written; jsonl / srt / vtt / parquet / arrow
+# add timings, word alignments and top-k speaker scores (parquet / arrow need pyarrow).
+OUTPUT_FORMATS = os.getenv("OUTPUT_FORMATS", "txt")
+OUTPUT_TOP_K = os.getenv("OUTPUT_TOP_K", "3")
@@ -3,12 +3,35 @@ Entry point for the Speaker-Identification pipeline.
 
 Usage:
     python main.py <audio_file>
+    python main.py worker [--spool DIR | --host HOST --port PORT]
+    python main.py serve [--host HOST] [--port PORT] [--workers N] [--max-queue N]
+    python main.py batch <dir|glob|manifest> [--workers N] [--retries N] [--force] [--ffmpeg-jobs N]
+    python main.py stream <audio_file> [--window SECONDS] [--overlap SECONDS]
+    python main.py live (--stdin | --follow WAV | --listen PORT) [--format s16le|f32le] [--rate HZ]
+    python main.py enroll <folder> [--sub-centroids K] [--threads N]
+    python main.py relabel [--outputs DIR] [--threshold T] [--dry-run]
+    python main.py check-refs | speakers | config
 
 Only an audio path is required. All runtime settings (HF token, Whisper model,
 language, device, compute type, threshold) are read from the .env file via config.py.
+
+The `worker` command loads every model once and keeps serving jobs from a spool
+directory or a local socket (see src/worker.py). The `serve` command runs an HTTP
+job service with a bounded queue in front of a pool of warm worker processes
+(see src/service.py). The `batch` command fans many recordings out over a pool of
+worker processes (see src/batch.py). The `stream` command processes very long
+recordings window by window with flat memory use (see src/streaming.py). The `live`
+command emits speaker-labelled captions for live PCM audio (see src/live.py). The
+`relabel` command re-matches the transcripts already in the output folder against
+the current references, without decoding audio (see src/relabel.py).
+
+Heavy libraries (torch, whisperx, speechbrain, librosa) are only imported when a
+stage needs them, so argument errors and the helper commands (`check-refs`,
+`speakers`, `config`) return immediately.
 """
 import sys
 import os
+import argparse
 from dotenv import load_dotenv
 
 # load env first so config.py can read environment variables
@@ -16,37 +39,360 @@ load_dotenv()
 
 from config import (
     HF_TOKEN, WHISPER_MODEL, WHISPER_LANGUAGE, WHISPER_DEVICE, WHISPER_COMPUTE,
-    SIMILARITY_THRESHOLD
+    SIMILARITY_THRESHOLD, EMBED_MAX_BATCH_SAMPLES, EMBED_MAX_BATCH_ROWS,
+    EMBED_MIN_SECONDS, EMBED_MERGE_SECONDS, EMBED_MAX_SECONDS, EMBED_MERGE_GAP_SECONDS,
+    CONCURRENT_DIARIZATION, ASR_THREADS, ALIGN_THREADS, DIARIZE_THREADS,
+    WHISPER_BATCH_SIZE, WHISPER_CHUNK_SIZE, ASR_AUTOTUNE, ASR_TUNING_FILE,
+    MATCHER_BACKEND, INDEX_NPROBE, SPEAKER_ID_MODE, CLUSTER_MAX_SECONDS,
+    RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB,
+    STREAM_WINDOW_SECONDS, STREAM_OVERLAP_SECONDS, SPEAKER_LINK_THRESHOLD,
+    REFERENCE_HASH, REFERENCE_SYNC_THREADS, ENROLL_SUB_CENTROIDS,
+    METRICS_FILE, PROFILE_STAGES, PROFILER,
+    ECAPA_BACKEND, ECAPA_THREADS, ECAPA_INTEROP_THREADS,
+    AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_MB, FFMPEG_JOBS,
+    OUTPUT_FORMATS, OUTPUT_TOP_K
 )
-from src.pipeline import run_pipeline
 
 def print_usage():
     print("Usage: python main.py <audio_file>")
+    print("       python main.py worker [--spool DIR | --host HOST --port PORT]")
+    print("       python main.py serve [--host HOST] [--port PORT] [--workers N] [--max-queue N]")
+    print("       python main.py batch <dir|glob|manifest> [--workers N] [--retries N] [--force] [--ffmpeg-jobs N]")
+    print("       python main.py stream <audio_file> [--window SECONDS] [--overlap SECONDS]")
+    print("       python main.py live (--stdin | --follow WAV | --listen PORT) [--format s16le|f32le] [--rate HZ]")
+    print("       python main.py enroll <folder> [--sub-centroids K] [--threads N]")
+    print("       python main.py relabel [--outputs DIR] [--threshold T] [--dry-run]")
+    print("       python main.py check-refs | speakers | config")
     print("Example: python main.py meeting.m4a")
 
+def pipeline_options(autotune: bool = False):
+    """
+    run_pipeline keyword arguments built from config.py. Commands that transcribe pass
+    `autotune=True` so ASR_AUTOTUNE can size the WhisperX settings; nothing else probes.
+    """
+    options = dict(
+        ref_config_path=os.path.join("config", "references.json"),
+        output_dir="outputs",
+        hf_token=HF_TOKEN,
+        model_name=WHISPER_MODEL,
+        language=WHISPER_LANGUAGE,
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE,
+        similarity_threshold=float(SIMILARITY_THRESHOLD),
+        embed_max_batch_samples=int(EMBED_MAX_BATCH_SAMPLES),
+        embed_max_batch_rows=int(EMBED_MAX_BATCH_ROWS),
+        embed_min_seconds=float(EMBED_MIN_SECONDS),
+        embed_merge_seconds=float(EMBED_MERGE_SECONDS),
+        embed_max_seconds=float(EMBED_MAX_SECONDS),
+        embed_merge_gap_seconds=float(EMBED_MERGE_GAP_SECONDS),
+        concurrent_diarization=CONCURRENT_DIARIZATION.strip().lower() in ("1", "true", "yes"),
+        asr_threads=int(ASR_THREADS),
+        asr_batch_size=int(WHISPER_BATCH_SIZE),
+        asr_chunk_size=int(WHISPER_CHUNK_SIZE),
+        align_threads=int(ALIGN_THREADS),
+        diarize_threads=int(DIARIZE_THREADS),
+        matcher_backend=MATCHER_BACKEND,
+        index_nprobe=int(INDEX_NPROBE),
+        speaker_id_mode=SPEAKER_ID_MODE,
+        cluster_max_seconds=float(CLUSTER_MAX_SECONDS),
+        cache_dir=RESULT_CACHE_DIR or None,
+        cache_max_mb=int(RESULT_CACHE_MAX_MB),
+        reference_hash=REFERENCE_HASH,
+        reference_sync_threads=int(REFERENCE_SYNC_THREADS),
+        metrics_file=METRICS_FILE or None,
+        profile_stages=PROFILE_STAGES,
+        profiler=PROFILER,
+        ecapa_backend=ECAPA_BACKEND,
+        ecapa_threads=int(ECAPA_THREADS),
+        ecapa_interop_threads=int(ECAPA_INTEROP_THREADS),
+        audio_cache_dir=AUDIO_CACHE_DIR or None,
+        audio_cache_max_mb=int(AUDIO_CACHE_MAX_MB),
+        output_formats=OUTPUT_FORMATS,
+        output_top_k=int(OUTPUT_TOP_K)
+    )
+    if autotune and ASR_AUTOTUNE.strip().lower() in ("1", "true", "yes"):
+        from src.asr_tuning import autotune_asr
+        options.update(autotune_asr(WHISPER_MODEL, WHISPER_COMPUTE, WHISPER_DEVICE, path=ASR_TUNING_FILE))
+    return options
+
+def worker_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py worker",
+                                     description="Keep models warm and serve pipeline jobs.")
+    parser.add_argument("--spool", help="spool directory to watch for job files")
+    parser.add_argument("--host", default="127.0.0.1", help="socket host (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="socket port (default: 8765)")
+    args = parser.parse_args(argv)
+
+    from src.models import load_models
+    from src.worker import PipelineWorker, serve_spool, serve_socket
+
+    options = pipeline_options(autotune=True)
+    models = load_models(
+        model_name=options["model_name"],
+        language=options["language"],
+        device=options["device"],
+        compute_type=options["compute_type"],
+        hf_token=options["hf_token"],
+        asr_threads=options["asr_threads"],
+        ecapa_backend=options["ecapa_backend"],
+        ecapa_threads=options["ecapa_threads"],
+        ecapa_interop_threads=options["ecapa_interop_threads"]
+    )
+    worker = PipelineWorker(models, options)
+    try:
+        if args.spool:
+            serve_spool(worker, args.spool)
+        else:
+            serve_socket(worker, host=args.host, port=args.port)
+    except KeyboardInterrupt:
+        print(f"[worker] Stopped after {worker.jobs_done} jobs.")
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py serve",
+                                     description="HTTP job service with a queue and warm worker processes.")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP host (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8770, help="HTTP port (default: 8770)")
+    parser.add_argument("--workers", type=int, default=2, help="warm worker processes (default: 2)")
+    parser.add_argument("--max-queue", type=int, default=16,
+                        help="jobs allowed to wait for a worker before submissions get 429 (default: 16)")
+    parser.add_argument("--upload-dir", default=os.path.join(".cache", "uploads"),
+                        help="where uploaded audio is kept until its job finishes")
+    parser.add_argument("--max-upload-mb", type=int, default=2048, help="largest accepted upload (default: 2048)")
+    args = parser.parse_args(argv)
+
+    from src.service import serve_http
+
+    try:
+        serve_http(pipeline_options(autotune=True), host=args.host, port=args.port, workers=args.workers,
+                   max_queue=args.max_queue, upload_dir=args.upload_dir, max_upload_mb=args.max_upload_mb)
+    except KeyboardInterrupt:
+        print("[service] Stopped.")
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py batch",
+                                     description="Process many recordings with a pool of worker processes.")
+    parser.add_argument("inputs", help="directory, glob pattern, or manifest (.txt / .json)")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes (default: 2)")
+    parser.add_argument("--retries", type=int, default=1, help="retries per failed file (default: 1)")
+    parser.add_argument("--force", action="store_true", help="re-process files that already have outputs")
+    parser.add_argument("--ffmpeg-jobs", type=int, default=int(FFMPEG_JOBS),
+                        help="concurrent ffmpeg decodes ahead of the workers (default: FFMPEG_JOBS)")
+    args = parser.parse_args(argv)
+
+    from src.batch import collect_inputs, run_batch
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print(f"Error: no audio files found for: {args.inputs}")
+        sys.exit(1)
+    summary = run_batch(inputs, pipeline_options(autotune=True), workers=args.workers,
+                        retries=args.retries, force=args.force, ffmpeg_jobs=args.ffmpeg_jobs)
+    if summary["failed"]:
+        sys.exit(2)
+
+def stream_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py stream",
+                                     description="Process a long recording in windows with bounded memory.")
+    parser.add_argument("input_path", help="audio file")
+    parser.add_argument("--window", type=float, default=float(STREAM_WINDOW_SECONDS),
+                        help=f"window length in seconds, more than 10 (default: {STREAM_WINDOW_SECONDS})")
+    parser.add_argument("--overlap", type=float, default=float(STREAM_OVERLAP_SECONDS),
+                        help=f"left-context overlap in seconds (default: {STREAM_OVERLAP_SECONDS})")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.input_path):
+        print(f"Error: file not found: {args.input_path}")
+        sys.exit(1)
+
+    from src.streaming import run_streaming_pipeline
+
+    options = pipeline_options(autotune=True)
+    # whole-file options that do not apply to windowed processing
+    for key in ("speaker_id_mode", "cache_dir", "cache_max_mb", "metrics_file", "profile_stages", "profiler",
+                "audio_cache_dir", "audio_cache_max_mb"):
+        options.pop(key)
+    run_streaming_pipeline(
+        input_path=args.input_path,
+        window_seconds=args.window,
+        overlap_seconds=args.overlap,
+        link_threshold=float(SPEAKER_LINK_THRESHOLD),
+        **options
+    )
+
+def live_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py live",
+                                     description="Speaker-labelled captions for live audio.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--stdin", action="store_true", help="read raw PCM from stdin")
+    source.add_argument("--follow", metavar="WAV", help="tail a 16-bit WAV file that is being appended to")
+    source.add_argument("--listen", metavar="PORT", type=int, help="accept raw PCM on a local TCP port")
+    parser.add_argument("--host", default="127.0.0.1", help="host for --listen (default: 127.0.0.1)")
+    parser.add_argument("--format", default="s16le", choices=("s16le", "f32le"), help="raw PCM sample format")
+    parser.add_argument("--rate", type=int, default=16000, help="raw PCM sample rate (default: 16000)")
+    parser.add_argument("--output", help="also append final captions to this file")
+    args = parser.parse_args(argv)
+
+    from src.live import (build_live_captioner, run_live, print_caption,
+                          stdin_frames, follow_wav_frames, socket_frames)
+
+    out_f = open(args.output, "a", encoding="utf-8") if args.output else None
+
+    def on_caption(caption):
+        print_caption(caption)
+        if out_f is not None and caption["type"] == "final":
+            out_f.write(f"[{caption['speaker']}]: {caption['text']}\n")
+            out_f.flush()
+
+    options = pipeline_options()   # live captions use their own small ASR batches, no autotune
+    keys = ("ref_config_path", "model_name", "language", "device", "compute_type", "asr_threads",
+            "similarity_threshold", "matcher_backend", "index_nprobe", "reference_hash",
+            "reference_sync_threads", "ecapa_backend", "ecapa_threads", "ecapa_interop_threads")
+    captioner = build_live_captioner(on_caption=on_caption, **{k: options[k] for k in keys})
+
+    if args.stdin:
+        frames = stdin_frames(fmt=args.format, rate=args.rate)
+    elif args.follow:
+        frames = follow_wav_frames(args.follow)
+    else:
+        frames = socket_frames(host=args.host, port=args.listen, fmt=args.format, rate=args.rate)
+    try:
+        run_live(frames, captioner)
+    except KeyboardInterrupt:
+        captioner.flush()
+    finally:
+        if out_f is not None:
+            out_f.close()
+
+def enroll_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py enroll",
+                                     description="Enroll speakers from a folder of clips per speaker.")
+    parser.add_argument("folder", help="folder with one sub-folder of clips per speaker")
+    parser.add_argument("--sub-centroids", type=int, default=int(ENROLL_SUB_CENTROIDS),
+                        help="extra k-means centroids per speaker (default: ENROLL_SUB_CENTROIDS)")
+    parser.add_argument("--threads", type=int, default=int(REFERENCE_SYNC_THREADS),
+                        help="decode / hash threads (default: REFERENCE_SYNC_THREADS)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        print(f"Error: folder not found: {args.folder}")
+        sys.exit(1)
+
+    from src.speaker_verification import load_verification_model
+    from src.speaker_utils import enroll_directory
+
+    options = pipeline_options()
+    verifier = load_verification_model(device=options["device"], backend=options["ecapa_backend"],
+                                       threads=options["ecapa_threads"],
+                                       interop_threads=options["ecapa_interop_threads"])
+    _, keys = enroll_directory(
+        args.folder, verifier,
+        ref_config_path=options["ref_config_path"],
+        sub_centroids=args.sub_centroids,
+        hash_algo=options["reference_hash"],
+        threads=args.threads,
+        max_batch_samples=options["embed_max_batch_samples"],
+        max_batch_rows=options["embed_max_batch_rows"]
+    )
+    print(f"[enroll] Store holds {len(keys)} reference rows.")
+
+def check_refs_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py check-refs",
+                                     description="Validate references.json without loading any model.")
+    parser.parse_args(argv)
+
+    from src.speaker_utils import validate_references
+
+    ref_config_path = pipeline_options()["ref_config_path"]
+    errors, warnings, references = validate_references(ref_config_path)
+    for message in errors:
+        print(f"ERROR   {message}")
+    for message in warnings:
+        print(f"WARNING {message}")
+    print(f"{ref_config_path}: {len(references)} speakers, {len(errors)} errors, {len(warnings)} warnings")
+    if errors:
+        sys.exit(1)
+
+def speakers_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py speakers",
+                                     description="List configured and enrolled speakers.")
+    parser.parse_args(argv)
+
+    from src.speaker_utils import describe_speakers
+
+    rows = describe_speakers(pipeline_options()["ref_config_path"])
+    print(f"{'speaker':<24} {'status':<13} {'clips':>5} {'subs':>4}  reference")
+    for row in rows:
+        print(f"{row['name']:<24} {row['status']:<13} {row['clips']:>5} {row['sub_centroids']:>4}  "
+              f"{row['path'] or '-'}")
+    print(f"{sum(r['status'] == 'enrolled' for r in rows)} of {len(rows)} speakers enrolled")
+
+def relabel_main(argv):
+    options = pipeline_options()
+    parser = argparse.ArgumentParser(prog="python main.py relabel",
+                                     description="Re-match archived transcripts against the current references.")
+    parser.add_argument("--outputs", default=options["output_dir"], help="folder with *_result.txt + *_segments.npz")
+    parser.add_argument("--threshold", type=float, default=options["similarity_threshold"],
+                        help="similarity threshold (default: SIMILARITY_THRESHOLD)")
+    parser.add_argument("--dry-run", action="store_true", help="only report which transcripts would change")
+    args = parser.parse_args(argv)
+
+    from src.models import LazyModel, get_model
+    from src.relabel import relabel_outputs
+    from src.speaker_index import build_matcher
+    from src.speaker_utils import load_reference_matrix
+
+    # the verifier is only loaded if a reference changed since it was last embedded
+    verifier = LazyModel(lambda: get_model("verifier", device=options["device"], backend=options["ecapa_backend"],
+                                           threads=options["ecapa_threads"],
+                                           interop_threads=options["ecapa_interop_threads"]))
+    ref_names, ref_matrix = load_reference_matrix(options["ref_config_path"], verifier,
+                                                  hash_algo=options["reference_hash"],
+                                                  threads=options["reference_sync_threads"])
+    matcher = build_matcher(ref_names, ref_matrix, backend=options["matcher_backend"], nprobe=options["index_nprobe"])
+    relabel_outputs(args.outputs, matcher, threshold=args.threshold, dry_run=args.dry_run)
+
+def config_main(argv):
+    parser = argparse.ArgumentParser(prog="python main.py config",
+                                     description="Print the effective configuration (.env + defaults).")
+    parser.parse_args(argv)
+
+    import config
+    for name in sorted(n for n in dir(config) if n.isupper()):
+        value = getattr(config, name)
+        if name == "HF_TOKEN" and value:
+            value = value[:4] + "..." if len(value) > 8 else "***"
+        print(f"{name}={'' if value is None else value}")
+
+COMMANDS = {
+    "worker": worker_main,
+    "serve": serve_main,
+    "batch": batch_main,
+    "stream": stream_main,
+    "live": live_main,
+    "enroll": enroll_main,
+    "check-refs": check_refs_main,
+    "speakers": speakers_main,
+    "relabel": relabel_main,
+    "config": config_main,
+}
+
 def main():
     if len(sys.argv) < 2:
         print("Error: missing audio file path.")
         print_usage()
         sys.exit(1)
 
+    if sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
     input_path = sys.argv[1]
     if not os.path.exists(input_path):
         print(f"Error: file not found: {input_path}")
         sys.exit(1)
 
     # config options (read from .env via config.py)
-    run_pipeline(
-        input_path=input_path,
-        ref_config_path=os.path.join("config", "references.json"),
-        output_dir="outputs",
-        hf_token=HF_TOKEN,
-        model_name=WHISPER_MODEL,
-        language=WHISPER_LANGUAGE,
-        device=WHISPER_DEVICE,
-        compute_type=WHISPER_COMPUTE,
-        similarity_threshold=float(SIMILARITY_THRESHOLD)
-    )
+    from src.pipeline import run_pipeline
+    run_pipeline(input_path=input_path, **pipeline_options(autotune=True))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,173 @@
+"""
+Size WhisperX transcription to the machine.
+
+`model.transcribe` batches VAD chunks of up to `chunk_size` seconds, `batch_size` at a
+time, on a CTranslate2 model with `threads` CPU threads. The right values depend on
+the cores and memory available and on the model / compute type:
+
+  - probe_resources(): usable cores (CPU affinity and cgroup quota) and available
+    memory (MemAvailable, capped by the cgroup limit; free GPU memory on cuda)
+  - suggest_asr_settings(): the largest batch whose weights + activations fit in
+    that memory, and an ASR thread count that leaves cores for diarization
+  - autotune_asr(): the saved settings for this model / compute type / device, or a
+    fresh probe saved to `.cache/asr_tuning.json` on first run
+
+`python -m benchmarks.asr_sweep input.wav --save` measures the real-time factor of
+each setting instead and saves the fastest one, which autotune_asr then reuses.
+
+    settings = autotune_asr("large-v2", "int8", "cpu")
+    # {"asr_batch_size": 8, "asr_chunk_size": 30, "asr_threads": 12}
+"""
+
+import json
+import os
+import time
+
+ASR_TUNING_FILE = os.path.join(".cache", "asr_tuning.json")
+
+# approximate float16 weight size and per-batch-item activation memory (one 30 s window), MB
+MODEL_WEIGHTS_MB = {"tiny": 75, "base": 145, "small": 485, "medium": 1530, "large": 3090}
+ITEM_ACTIVATION_MB = {"tiny": 15, "base": 25, "small": 60, "medium": 120, "large": 200}
+# alignment + diarization + ECAPA models and the decoded audio, resident next to ASR
+OTHER_MODELS_MB = 2500
+MEMORY_HEADROOM = 0.8
+
+
+def _model_family(model_name: str) -> str:
+    name = model_name.lower().replace("distil-", "")
+    for family in MODEL_WEIGHTS_MB:
+        if name.startswith(family):
+            return family
+    return "large"
+
+
+def _cgroup_value(*paths):
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def _available_cores() -> int:
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cores = os.cpu_count() or 1
+    quota = _cgroup_value("/sys/fs/cgroup/cpu.max")   # "max 100000" or "<quota> <period>"
+    if quota and not quota.startswith("max"):
+        limit, period = (int(v) for v in quota.split()[:2])
+        cores = min(cores, max(1, limit // period))
+    return cores
+
+
+def _available_memory_mb():
+    available = None
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        try:
+            available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+        except (AttributeError, ValueError, OSError):
+            pass
+    limit = _cgroup_value("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    if limit and limit.isdigit() and int(limit) < 1 << 60:
+        usage = _cgroup_value("/sys/fs/cgroup/memory.current",
+                              "/sys/fs/cgroup/memory/memory.usage_in_bytes") or "0"
+        cgroup_free = (int(limit) - int(usage if usage.isdigit() else 0)) / 1024 ** 2
+        available = cgroup_free if available is None else min(available, cgroup_free)
+    return available
+
+
+def probe_resources(device: str = "cpu") -> dict:
+    """Usable CPU cores and available memory in MB (GPU memory on cuda; None if unknown)."""
+    resources = {"cores": _available_cores(), "memory_mb": _available_memory_mb(), "device": device}
+    if str(device).startswith("cuda"):
+        try:
+            import torch
+            free, _ = torch.cuda.mem_get_info()
+            resources["memory_mb"] = free / 1024 ** 2
+        except Exception as e:
+            print(f"[asr_tuning] Could not read GPU memory ({type(e).__name__}: {e})")
+    return resources
+
+
+def suggest_asr_settings(model_name: str, compute_type: str, device: str, resources: dict) -> dict:
+    """Batch size / chunk length / ASR threads for `resources` (see probe_resources)."""
+    family = _model_family(model_name)
+    weight_scale = 0.5 if compute_type.startswith("int8") else (2.0 if compute_type == "float32" else 1.0)
+    # CTranslate2 keeps activations in fp32 unless the compute type is float16
+    activation_scale = 1.0 if "float16" in compute_type else 2.0
+    weights = MODEL_WEIGHTS_MB[family] * weight_scale
+    per_item = ITEM_ACTIVATION_MB[family] * activation_scale
+    cores = resources["cores"]
+    on_gpu = str(device).startswith("cuda")
+
+    cap = 32 if on_gpu else max(4, min(32, cores // 2))
+    memory = resources.get("memory_mb")
+    if memory is None:
+        batch_size = min(16, cap)
+    else:
+        other = 0 if on_gpu else OTHER_MODELS_MB
+        budget = memory * MEMORY_HEADROOM - weights - other
+        batch_size = max(1, min(cap, int(budget // per_item)))
+        if budget < per_item:
+            print(f"[asr_tuning] Only {memory:.0f} MB available for '{model_name}' ({compute_type}); "
+                  f"using batch size 1, consider a smaller WHISPER_MODEL")
+
+    # diarization overlaps ASR (see stages.auto_thread_budgets): leave it a quarter of the cores
+    threads = 4 if on_gpu else max(1, min(32, cores * 3 // 4 if cores > 4 else cores))
+    return {"asr_batch_size": batch_size, "asr_chunk_size": 30, "asr_threads": threads}
+
+
+def tuning_key(model_name: str, compute_type: str, device: str) -> str:
+    return f"{model_name}|{compute_type}|{device}"
+
+
+def load_tuning(path: str = ASR_TUNING_FILE) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_tuning(key: str, settings: dict, path: str = ASR_TUNING_FILE):
+    """Store `settings` under `key`, keeping the entries for other models."""
+    tuning = load_tuning(path)
+    tuning[key] = dict(settings, created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(tuning, f, indent=2)
+    os.replace(tmp, path)
+
+
+def autotune_asr(model_name: str, compute_type: str, device: str, path: str = ASR_TUNING_FILE,
+                 retune: bool = False) -> dict:
+    """
+    asr_batch_size / asr_chunk_size / asr_threads for this model, compute type and device:
+    the saved entry when it was made on a machine with the same core count, otherwise a
+    fresh probe (saved for the next run).
+    """
+    key = tuning_key(model_name, compute_type, device)
+    cores = _available_cores()
+    entry = None if retune else load_tuning(path).get(key)
+    if entry and entry.get("cores") == cores:
+        settings = {k: entry[k] for k in ("asr_batch_size", "asr_chunk_size", "asr_threads")}
+        print(f"[asr_tuning] Using {entry.get('source', 'saved')} settings for {key}: {settings}")
+        return settings
+
+    resources = probe_resources(device)
+    settings = suggest_asr_settings(model_name, compute_type, device, resources)
+    save_tuning(key, dict(settings, source="probe", cores=resources["cores"],
+                          memory_mb=resources["memory_mb"]), path)
+    memory = "unknown" if resources["memory_mb"] is None else f"{resources['memory_mb']:.0f} MB"
+    print(f"[asr_tuning] Probed {resources['cores']} cores, {memory} available: {settings} (saved to {path})")
+    return settings
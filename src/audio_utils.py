@@ -1,22 +1,130 @@
+"""
+Audio decoding helpers shared by the pipeline stages.
+
+  - load_audio(): decode a whole recording once into a float32 mono buffer at 16 kHz
+    (soundfile for wav/flac/ogg, an ffmpeg pipe for everything else)
+  - slice_seconds(): zero-copy views of that buffer for segment embedding
+  - iter_audio_blocks(): the same decoding block by block, for streaming long inputs
+  - find_quiet_point(): the lowest-energy frame in a range, used to cut blocks in pauses
+
+Cached WAV conversion lives in src/conversion.py.
+"""
 import os
 import subprocess
+import numpy as np
+
+SAMPLE_RATE = 16000
+
 
-def ensure_wav(input_path, sr=16000):
+def _decode_with_soundfile(input_path, sr):
+    """Decode formats libsndfile understands (wav/flac/ogg) without spawning ffmpeg."""
+    import soundfile as sf
+
+    audio, file_sr = sf.read(input_path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    if file_sr != sr:
+        import librosa
+        audio = librosa.resample(audio, orig_sr=file_sr, target_sr=sr)
+    return audio
+
+
+def _decode_with_ffmpeg(input_path, sr, chunk_bytes=1 << 20):
     """
-    Ensure the audio file is in WAV format. 
-    If it's already .wav, return it.
-    Otherwise convert to WAV and return converted path.
+    Decode any ffmpeg-readable input straight to float32 PCM on stdout.
+    Reads into a single growing bytearray so the samples are never duplicated.
     """
-    base, ext = os.path.splitext(input_path)
-    if ext.lower() == ".wav":
-        return input_path  # no conversion needed
-    
-    output_path = f"{base}.wav"
-    subprocess.run([
-        "ffmpeg", "-y",
+    proc = subprocess.Popen([
+        "ffmpeg", "-nostdin", "-threads", "0",
         "-i", input_path,
+        "-f", "f32le",
+        "-ac", "1",   # mono
         "-ar", str(sr),
+        "-"
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    buf = bytearray()
+    while chunk := proc.stdout.read(chunk_bytes):
+        buf.extend(chunk)
+    if proc.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed to decode '{input_path}' (exit code {proc.returncode})")
+    return np.frombuffer(buf, dtype=np.float32)
+
+
+def load_audio(input_path, sr=SAMPLE_RATE):
+    """
+    Decode an audio file once into a contiguous float32 mono buffer at `sr` Hz.
+
+    This buffer is shared by every pipeline stage (transcription, alignment,
+    diarization and segment slicing), which only take views of it.
+    """
+    ext = os.path.splitext(input_path)[1].lower()
+    audio = None
+    if ext in (".wav", ".flac", ".ogg"):
+        try:
+            audio = _decode_with_soundfile(input_path, sr)
+        except Exception as e:
+            print(f"[audio_utils] soundfile could not decode '{input_path}' ({e}), falling back to ffmpeg...")
+    if audio is None:
+        audio = _decode_with_ffmpeg(input_path, sr)
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def slice_seconds(audio, start, end, sr=SAMPLE_RATE):
+    """Return a zero-copy view of `audio` between `start` and `end` seconds."""
+    return audio[max(int(start * sr), 0):max(int(end * sr), 0)]
+
+
+SOUNDFILE_EXTENSIONS = (".wav", ".flac", ".ogg")
+
+
+def iter_audio_blocks(input_path, sr=SAMPLE_RATE, block_seconds=10.0):
+    """
+    Yield consecutive float32 mono blocks of about `block_seconds` at `sr` Hz
+    without ever holding the whole recording in memory.
+    Uses soundfile for wav/flac/ogg and a streaming ffmpeg pipe for everything else.
+    """
+    ext = os.path.splitext(input_path)[1].lower()
+    if ext in SOUNDFILE_EXTENSIONS:
+        import soundfile as sf
+
+        with sf.SoundFile(input_path) as f:
+            blocksize = int(block_seconds * f.samplerate)
+            for block in f.blocks(blocksize=blocksize, dtype="float32", always_2d=True):
+                block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                if f.samplerate != sr:
+                    import librosa
+                    block = librosa.resample(block, orig_sr=f.samplerate, target_sr=sr)
+                yield np.ascontiguousarray(block, dtype=np.float32)
+        return
+
+    proc = subprocess.Popen([
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", input_path,
+        "-f", "f32le",
         "-ac", "1",   # mono
-        output_path
-    ], check=True)
-    return output_path
+        "-ar", str(sr),
+        "-"
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    block_bytes = int(block_seconds * sr) * 4
+    try:
+        while chunk := proc.stdout.read(block_bytes):
+            usable = len(chunk) - len(chunk) % 4
+            yield np.frombuffer(chunk[:usable], dtype=np.float32).copy()
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode '{input_path}' (exit code {proc.returncode})")
+
+
+def find_quiet_point(audio, lo, hi, sr=SAMPLE_RATE, frame_seconds=0.03):
+    """
+    Energy-based VAD helper: return the sample index in [lo, hi) at the centre of
+    the quietest `frame_seconds` frame, so chunk boundaries fall in pauses rather
+    than mid-word.
+    """
+    frame = max(1, int(frame_seconds * sr))
+    region = audio[lo:hi]
+    n_frames = len(region) // frame
+    if n_frames == 0:
+        return hi
+    energy = np.square(region[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    return lo + int(np.argmin(energy)) * frame + frame // 2
@@ -0,0 +1,276 @@
+"""
+Multi-file batch mode: fan recordings out over a pool of worker processes.
+
+Each worker process loads the models once (src.models.load_models) and then runs
+run_pipeline for every file it is handed. Inputs whose `<output_dir>/<base>_result.txt`
+already exists are skipped (unless force=True), failures are retried, and a JSON
+summary is written to `<output_dir>/batch_summary.json` at the end. `<base>` is the
+file name, plus a hash of the full path when two inputs share a file name. An output
+already written under either name is found again, whichever other files a later run
+includes (the `<base>_report.json` next to it records which input it came from).
+
+While the workers run, a bounded pool of `ffmpeg_jobs` ffmpeg processes decodes the
+inputs further down the queue into the conversion cache (src/conversion.py), so a
+worker reaching an m4a/mp3 file usually finds its PCM already decoded.
+
+Inputs can be given as:
+  - a directory (all audio files inside, non-recursive)
+  - a glob pattern, e.g. "recordings/**/*.m4a"
+  - a manifest: .txt with one path per line, or .json with a list of paths
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing as mp
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".aac", ".wma", ".mp4", ".webm")
+
+# per-process state, set by _init_worker
+_WORKER_MODELS = None
+_WORKER_OPTIONS = None
+
+
+def collect_inputs(spec: str) -> list:
+    """Resolve a directory, glob pattern or manifest file into a sorted list of audio paths."""
+    if os.path.isdir(spec):
+        paths = [os.path.join(spec, f) for f in os.listdir(spec)
+                 if f.lower().endswith(AUDIO_EXTENSIONS)]
+    elif spec.lower().endswith(".json") and os.path.isfile(spec):
+        with open(spec, "r", encoding="utf-8") as f:
+            paths = json.load(f)
+    elif spec.lower().endswith(".txt") and os.path.isfile(spec):
+        with open(spec, "r", encoding="utf-8") as f:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        paths = glob.glob(spec, recursive=True)
+    return sorted(dict.fromkeys(p for p in paths if os.path.isfile(p)))
+
+
+def _hashed_name(path: str, stem: str) -> str:
+    return f"{stem}_{hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]}"
+
+
+def _written_for(output_dir: str, name: str):
+    """Absolute input path recorded in `<name>_report.json`, or None if there is no readable report."""
+    try:
+        with open(os.path.join(output_dir, f"{name}_report.json"), "r", encoding="utf-8") as f:
+            input_path = json.load(f).get("input_path")
+    except (OSError, ValueError, AttributeError):
+        return None
+    return os.path.abspath(input_path) if isinstance(input_path, str) else None
+
+
+def output_names(inputs: list, output_dir: str = None) -> dict:
+    """
+    Output `<base>` for each input: its file name without extension, with a short hash of
+    the absolute path appended when another input has the same file name.
+
+    With `output_dir`, an input whose outputs already exist there under the other name
+    keeps that name: the hashed name always belongs to its input, the plain one when its
+    report names this input (or, without a report, when no other input shares the stem).
+    A plain name whose report names another input is never reused.
+    """
+    stems = {path: os.path.splitext(os.path.basename(path))[0] for path in inputs}
+    counts = {}
+    for stem in stems.values():
+        counts[stem] = counts.get(stem, 0) + 1
+    names = {path: stem if counts[stem] == 1 else _hashed_name(path, stem) for path, stem in stems.items()}
+    if output_dir is None:
+        return names
+
+    for path, stem in stems.items():
+        hashed = _hashed_name(path, stem)
+        if os.path.exists(output_path_for(path, output_dir, hashed)):
+            names[path] = hashed
+            continue
+        if not os.path.exists(output_path_for(path, output_dir, stem)):
+            continue
+        owner = _written_for(output_dir, stem)
+        if owner == os.path.abspath(path) or (owner is None and counts[stem] == 1):
+            names[path] = stem
+        else:
+            names[path] = hashed   # the plain name holds another input's outputs
+    return names
+
+
+def output_path_for(input_path: str, output_dir: str, output_name: str = None) -> str:
+    """Transcript path run_pipeline writes for `input_path` (see output_names)."""
+    base_name = output_name or os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, f"{base_name}_result.txt")
+
+
+def _init_worker(options: dict, threads: int):
+    """Process-pool initializer: pin this worker's share of the cores and load every model once."""
+    global _WORKER_MODELS, _WORKER_OPTIONS
+    import torch
+    from .models import load_models
+    from .stages import auto_thread_budgets
+
+    torch.set_num_threads(threads)
+    # every stage budget comes out of this worker's `threads` cores, not the whole machine
+    asr_threads = min(options.get("asr_threads") or threads, threads)
+    budgets = auto_thread_budgets(asr_threads, options.get("concurrent_diarization", True), cores=threads)
+    _WORKER_OPTIONS = dict(
+        options,
+        asr_threads=asr_threads,
+        align_threads=min(options.get("align_threads") or budgets["align"], threads),
+        diarize_threads=min(options.get("diarize_threads") or budgets["diarization"], threads),
+    )
+    _WORKER_MODELS = load_models(
+        model_name=options["model_name"],
+        language=options["language"],
+        device=options["device"],
+        compute_type=options["compute_type"],
+        hf_token=options.get("hf_token"),
+        asr_threads=asr_threads,
+        ecapa_backend=options.get("ecapa_backend", "eager"),
+        ecapa_threads=options.get("ecapa_threads", 0),
+        ecapa_interop_threads=options.get("ecapa_interop_threads", 0)
+    )
+
+
+def _worker_pid(delay: float = 0.0) -> int:
+    """Trivial task: returns once this worker process has loaded its models."""
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _run_one(input_path: str, overrides: dict = None) -> dict:
+    from .pipeline import run_pipeline
+
+    start = time.perf_counter()
+    try:
+        result = run_pipeline(input_path=input_path, models=_WORKER_MODELS,
+                              **dict(_WORKER_OPTIONS, **(overrides or {})))
+        return {"status": "ok", "output_file": result["output_file"],
+                "output_files": result.get("output_files"), "segments": result.get("segments"),
+                "seconds": time.perf_counter() - start,
+                "audio_cache": result["timings"].get("decode", {}).get("cache")}
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc(), "seconds": time.perf_counter() - start}
+
+
+def run_batch(
+    inputs: list,
+    options: dict,
+    workers: int = 2,
+    retries: int = 1,
+    force: bool = False,
+    summary_path: str = None,
+    ffmpeg_jobs: int = 2
+) -> dict:
+    """
+    Process `inputs` with `workers` processes, each holding its own warm models.
+
+    `options` are run_pipeline keyword arguments (as built by main.pipeline_options).
+    Each failed file is retried up to `retries` more times. Up to `ffmpeg_jobs` ffmpeg
+    processes pre-decode queued inputs into options["audio_cache_dir"] (0 disables this).
+    Returns the summary dict that is also written to `summary_path` (default: <output_dir>/batch_summary.json).
+    """
+    output_dir = options.get("output_dir", "outputs")
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = summary_path or os.path.join(output_dir, "batch_summary.json")
+
+    files = {path: {"status": "pending", "attempts": 0} for path in inputs}
+    names = output_names(inputs, output_dir)
+    pending = []
+    for path in inputs:
+        if not force and os.path.exists(output_path_for(path, output_dir, names[path])):
+            files[path]["status"] = "skipped"
+        else:
+            pending.append(path)
+    skipped = len(inputs) - len(pending)
+
+    workers = max(1, min(workers, len(pending) or 1))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"[batch] {len(inputs)} inputs: {len(pending)} to process, {skipped} already done. "
+          f"{workers} workers x {threads} threads.")
+
+    started = time.time()
+    wall_start = time.perf_counter()
+    prefetch = None
+    if ffmpeg_jobs and options.get("audio_cache_dir") and len(pending) > workers:
+        from .conversion import AudioConverter
+
+        converter = AudioConverter(options["audio_cache_dir"], jobs=ffmpeg_jobs,
+                                   max_bytes=options.get("audio_cache_max_mb", 4096) * 1024 * 1024)
+        # the first `workers` files are decoded by the workers themselves
+        prefetch = threading.Thread(target=converter.convert_many, args=(pending[workers:],),
+                                    name="ffmpeg-prefetch", daemon=True)
+        prefetch.start()
+    # spawn keeps torch / CUDA state out of the children
+    ctx = mp.get_context("spawn")
+    executor = None
+    for attempt in range(1, retries + 2):
+        if not pending:
+            break
+        if attempt > 1:
+            print(f"[batch] Retry {attempt - 1}/{retries}: {len(pending)} files")
+        failed = []
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                           initializer=_init_worker, initargs=(options, threads))
+        futures = {executor.submit(_run_one, path, {"output_name": names[path]}): path for path in pending}
+        try:
+            for future in as_completed(futures):
+                path = futures[future]
+                outcome = future.result()
+                entry = files[path]
+                entry["attempts"] += 1
+                entry.update(outcome)
+                if outcome["status"] == "ok":
+                    entry.pop("error", None)
+                    entry.pop("traceback", None)
+                    print(f"[batch] OK   {path} ({outcome['seconds']:.1f}s)")
+                else:
+                    failed.append(path)
+                    print(f"[batch] FAIL {path}: {outcome['error']}")
+        except BrokenProcessPool as e:
+            # a worker died (e.g. OOM-killed); everything unfinished counts as a failed attempt
+            print(f"[batch] Worker pool crashed ({e}); restarting workers")
+            for future, path in futures.items():
+                if files[path]["status"] != "ok" and path not in failed:
+                    files[path]["attempts"] += 1
+                    files[path].update({"status": "error", "error": "worker process crashed"})
+                    failed.append(path)
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = None
+        pending = failed
+    if executor is not None:
+        executor.shutdown()
+    if prefetch is not None:
+        prefetch.join()
+
+    wall = time.perf_counter() - wall_start
+    ok = sum(1 for e in files.values() if e["status"] == "ok")
+    summary = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "wall_s": wall,
+        "workers": workers,
+        "threads_per_worker": threads,
+        "total": len(inputs),
+        "ok": ok,
+        "failed": sum(1 for e in files.values() if e["status"] == "error"),
+        "skipped": skipped,
+        "audio_cache_hits": sum(1 for e in files.values() if e.get("audio_cache") == "hit"),
+        "audio_conversions": sum(1 for e in files.values() if e.get("audio_cache") == "miss"),
+        "prefetch_convert_s": converter.stats["convert_seconds"] if prefetch is not None else 0.0,
+        "files_per_min": 60.0 * ok / wall if wall > 0 else 0.0,
+        "files": files,
+    }
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"[batch] Done in {wall:.1f}s: {summary['ok']} ok, {summary['failed']} failed, "
+          f"{skipped} skipped ({summary['files_per_min']:.2f} files/min). Summary: {summary_path}")
+    print(f"[batch] Audio cache: {summary['audio_cache_hits']} hits, {summary['audio_conversions']} decoded "
+          f"by workers, {summary['prefetch_convert_s']:.1f}s of ffmpeg prefetch")
+    return summary
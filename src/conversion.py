@@ -0,0 +1,242 @@
+"""
+Cached, parallel audio conversion.
+
+Decoding a long m4a/mp3 through ffmpeg (and resampling wav/flac at another rate)
+takes seconds to minutes per run. The AudioConverter keeps the decoded 16 kHz mono
+float32 PCM in a content-keyed cache directory, so an unchanged recording is
+decoded once and then just read back:
+
+  - the cache key is the SHA1 of the input's bytes (the same value as
+    ResultCache.audio_key) plus the sample rate and format, so renamed or copied
+    files hit and edited files miss
+  - the SHA1 itself is remembered per path by size / mtime / inode in
+    `<cache_dir>/index.json`, so a hit does not even re-read the input. The index is
+    written once per load / to_wav / convert_many call (not per file), merged with
+    what other processes wrote meanwhile, and pruned of inputs that no longer exist
+    and of inputs whose cached files were all evicted
+  - inputs that soundfile reads natively at the target rate are never cached
+  - entries are written atomically and evicted LRU beyond `max_bytes`
+  - nothing is ever written next to the source file (read-only mounts work)
+
+    converter = AudioConverter(".cache/audio", jobs=4)
+    audio = converter.load("meeting.m4a")           # float32 buffer, cached after the first run
+    converter.convert_many(paths)                    # warm the cache with up to `jobs` ffmpeg processes
+    wav = converter.to_wav("meeting.m4a")            # 16-bit WAV file in the cache, for tools that need a path
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from .audio_utils import load_audio, SAMPLE_RATE, SOUNDFILE_EXTENSIONS
+from .result_cache import ResultCache, evict_lru
+from .speaker_utils import file_signature
+
+CONVERSION_CACHE_DIR = os.path.join(".cache", "audio")
+INDEX_FILE = "index.json"
+
+
+class AudioConverter:
+    def __init__(self, cache_dir: str = CONVERSION_CACHE_DIR, max_bytes: int = 4 * 1024 ** 3, jobs: int = 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.jobs = max(1, jobs)
+        self.stats = {"hits": 0, "misses": 0, "uncached": 0, "convert_seconds": 0.0}
+        self._index = None
+        self._updates = {}   # index entries changed since the last save_index
+        self._batch_depth = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ----------------------------
+    # keys
+    # ----------------------------
+    def _read_index(self) -> dict:
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_index(self) -> dict:
+        if self._index is None:
+            self._index = self._read_index()
+        return self._index
+
+    @contextmanager
+    def _batched_index(self):
+        """Defer index writes to the end of the outermost batched call."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                outermost = self._batch_depth == 0
+            if outermost:
+                self.save_index()
+
+    def save_index(self):
+        """
+        Write pending index changes in one go: merged into the on-disk index (which other
+        processes may have updated), dropping inputs that are gone and inputs whose cached
+        files were all evicted.
+        """
+        with self._lock:
+            if not self._updates:
+                return
+            index = self._read_index()
+            index.update(self._updates)
+            before = len(index)
+            index = {
+                source: entry for source, entry in index.items()
+                if os.path.exists(source) and (
+                    not entry.get("files")
+                    or any(os.path.exists(os.path.join(self.cache_dir, f)) for f in entry["files"]))
+            }
+            payload = json.dumps(index).encode("utf-8")
+            ResultCache._write_atomic(os.path.join(self.cache_dir, INDEX_FILE), lambda f: f.write(payload))
+            self._index, self._updates = index, {}
+        if len(index) < before:
+            print(f"[conversion] Pruned {before - len(index)} stale index entries")
+
+    def content_hash(self, path: str) -> str:
+        """SHA1 of the file's bytes, re-read only when its size / mtime / inode changed."""
+        abs_path = os.path.abspath(path)
+        signature = file_signature(path)
+        with self._lock:
+            entry = self._load_index().get(abs_path)
+        if entry and entry["signature"] == signature:
+            return entry["sha1"]
+        digest = ResultCache.audio_key(path)
+        with self._batched_index(), self._lock:
+            self._index[abs_path] = self._updates[abs_path] = {"signature": signature, "sha1": digest}
+        return digest
+
+    def _entry_path(self, path: str, sr: int, suffix: str) -> str:
+        key = ResultCache.make_key(self.content_hash(path), sr, suffix)
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def _remember(self, path: str, entry: str):
+        """Record that `entry` caches `path`, so the index entry is pruned once it is evicted."""
+        abs_path = os.path.abspath(path)
+        name = os.path.relpath(entry, self.cache_dir).replace(os.sep, "/")
+        with self._lock:
+            record = self._load_index().get(abs_path)
+            if record is not None and name not in record.setdefault("files", []):
+                record["files"].append(name)
+                self._updates[abs_path] = record
+
+    @staticmethod
+    def needs_conversion(path: str, sr: int = SAMPLE_RATE) -> bool:
+        """False for wav/flac/ogg already at `sr` (soundfile reads those faster than the cache)."""
+        if os.path.splitext(path)[1].lower() not in SOUNDFILE_EXTENSIONS:
+            return True
+        try:
+            import soundfile as sf
+            return sf.info(path).samplerate != sr
+        except Exception:
+            return True
+
+    def _hit(self, entry: str, path: str) -> bool:
+        hit = os.path.exists(entry)
+        with self._lock:
+            self.stats["hits" if hit else "misses"] += 1
+        if hit:
+            os.utime(entry)  # refresh LRU position
+            self._remember(path, entry)
+            print(f"[conversion] cache hit for '{path}'")
+        return hit
+
+    def _converted(self, path: str, seconds: float):
+        with self._lock:
+            self.stats["convert_seconds"] += seconds
+        print(f"[conversion] converted '{path}' in {seconds:.1f}s")
+
+    # ----------------------------
+    # conversion
+    # ----------------------------
+    def load(self, path: str, sr: int = SAMPLE_RATE, status: dict = None) -> np.ndarray:
+        """
+        Decode `path` to a float32 mono buffer at `sr`, from the cache when possible.
+        `status`, if given, gets "cache" = "hit" | "miss" | None (not cached).
+        """
+        if not self.needs_conversion(path, sr):
+            with self._lock:
+                self.stats["uncached"] += 1
+            if status is not None:
+                status["cache"] = None
+            return load_audio(path, sr=sr)
+        with self._batched_index():
+            entry = self._entry_path(path, sr, ".f32")
+            if self._hit(entry, path):
+                if status is not None:
+                    status["cache"] = "hit"
+                return np.fromfile(entry, dtype=np.float32)
+            if status is not None:
+                status["cache"] = "miss"
+            start = time.perf_counter()
+            audio = load_audio(path, sr=sr)   # decoded in memory, then persisted
+            ResultCache._write_atomic(entry, lambda f: audio.tofile(f))
+            self._remember(path, entry)
+            self._converted(path, time.perf_counter() - start)
+            evict_lru(self.cache_dir, self.max_bytes, skip=(INDEX_FILE,), label="conversion")
+            return audio
+
+    def to_wav(self, path: str, sr: int = SAMPLE_RATE) -> str:
+        """Path of a 16-bit mono WAV at `sr` for `path`, transcoded into the cache once."""
+        if os.path.splitext(path)[1].lower() == ".wav" and not self.needs_conversion(path, sr):
+            return path
+        with self._batched_index():
+            entry = self._entry_path(path, sr, ".wav")
+            if self._hit(entry, path):
+                return entry
+            start = time.perf_counter()
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            tmp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+            subprocess.run([
+                "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+                "-i", path,
+                "-ar", str(sr),
+                "-ac", "1",   # mono
+                "-f", "wav", tmp
+            ], check=True)
+            os.replace(tmp, entry)
+            self._remember(path, entry)
+            self._converted(path, time.perf_counter() - start)
+            evict_lru(self.cache_dir, self.max_bytes, skip=(INDEX_FILE,), label="conversion")
+            return entry
+
+    def convert_many(self, paths: list, sr: int = SAMPLE_RATE, wav: bool = False) -> dict:
+        """
+        Warm the cache for many inputs with at most `jobs` ffmpeg processes at a time
+        (decoded buffers are not kept). Returns {path: error message} for failures.
+        """
+        def convert(path):
+            if wav:
+                self.to_wav(path, sr)
+            elif self.needs_conversion(path, sr) and not os.path.exists(self._entry_path(path, sr, ".f32")):
+                self.load(path, sr)
+
+        errors = {}
+        # one index write for the whole batch, when the last conversion is done
+        with self._batched_index(), ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for path, future in [(p, pool.submit(convert, p)) for p in paths]:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[path] = f"{type(e).__name__}: {e}"
+                    print(f"[conversion] could not convert '{path}': {errors[path]}")
+        return errors
+
+    def print_stats(self):
+        s = self.stats
+        print(f"[conversion] {s['hits']} cache hits, {s['misses']} conversions "
+              f"({s['convert_seconds']:.1f}s), {s['uncached']} read directly")
@@ -0,0 +1,252 @@
+"""
+Optional CPU-optimized backends for the ECAPA speaker-embedding model.
+
+SpeechBrain's encode_batch is feature extraction (fbank + mean/var norm) followed by
+the ECAPA-TDNN embedding network. The features stay in eager PyTorch; the network
+can be swapped for:
+  - "eager":            the original fp32 module (default)
+  - "int8":             torch dynamic int8 quantization; this only covers nn.Linear layers,
+                        and SpeechBrain's ECAPA-TDNN is built from Conv1d, so the backend
+                        is refused (eager is used) when no layer was quantized
+  - "torchscript":      a traced TorchScript graph
+  - "torchscript-int8": traced after dynamic quantization
+  - "onnx":             an ONNX export run with onnxruntime (optional dependency)
+  - "onnx-int8":        the ONNX export with onnxruntime dynamic quantization (covers Conv)
+
+Exported graphs are cached under .cache/ecapa/ keyed by model weights, backend and
+library versions. After each export the backend is checked against the fp32 model
+(cosine agreement on random inputs). If it falls below the threshold, or the export
+fails, the eager model is used instead. `threads` / `interop_threads` set the
+intra-/inter-op CPU threads used for embedding.
+
+    verifier = optimize_verifier(load_verification_model("cpu"), backend="onnx-int8", threads=4)
+    verifier.encode_batch(wavs, wav_lens)   # same call and output shape as SpeechBrain
+"""
+
+import copy
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .stages import torch_threads
+
+ECAPA_BACKENDS = ("eager", "int8", "torchscript", "torchscript-int8", "onnx", "onnx-int8")
+ECAPA_CACHE_DIR = os.path.join(".cache", "ecapa")
+# minimum cosine agreement with the fp32 model for an export to be used
+PARITY_THRESHOLD = {"int8": 0.98, "torchscript-int8": 0.98, "onnx-int8": 0.98}
+DEFAULT_PARITY_THRESHOLD = 0.999
+
+
+class OptimizedVerifier:
+    """encode_batch-compatible wrapper: eager feature extraction + an optimized embedding network."""
+
+    def __init__(self, base, embed_fn, backend: str = "eager", threads: int = 0):
+        self.base = base
+        self.embed_fn = embed_fn
+        self.backend = backend
+        self.threads = threads
+
+    @property
+    def mods(self):
+        return self.base.mods
+
+    @property
+    def device(self):
+        return self.base.device
+
+    def encode_batch(self, wavs, wav_lens=None):
+        import torch
+
+        with torch_threads(self.threads), torch.no_grad():
+            if wavs.dim() == 1:
+                wavs = wavs.unsqueeze(0)
+            if wav_lens is None:
+                wav_lens = torch.ones(wavs.shape[0])
+            wavs = wavs.to(self.base.device).float()
+            wav_lens = wav_lens.to(self.base.device).float()
+            feats = self.base.mods.compute_features(wavs)
+            feats = self.base.mods.mean_var_norm(feats, wav_lens)
+            return self.embed_fn(feats, wav_lens)
+
+
+def _cache_key(base, backend: str) -> str:
+    """Weights checksum + backend + library versions."""
+    import torch
+
+    h = hashlib.sha1(backend.encode("utf-8"))
+    h.update(torch.__version__.encode("utf-8"))
+    for name, tensor in base.mods.embedding_model.state_dict().items():
+        h.update(name.encode("utf-8"))
+        h.update(tensor.detach().cpu().numpy().tobytes())
+    try:
+        import onnxruntime
+        if backend.startswith("onnx"):
+            h.update(onnxruntime.__version__.encode("utf-8"))
+    except ImportError:
+        pass
+    return h.hexdigest()[:16]
+
+
+def _example_features(base, seconds=(3.0, 2.0), sr: int = 16000, seed: int = 0):
+    """Random waveforms -> (feats, wav_lens) to trace / export the embedding network with."""
+    import torch
+
+    rng = np.random.default_rng(seed)
+    longest = int(max(seconds) * sr)
+    wavs = torch.zeros(len(seconds), longest)
+    for i, s in enumerate(seconds):
+        wavs[i, :int(s * sr)] = torch.from_numpy(rng.standard_normal(int(s * sr)).astype(np.float32) * 0.1)
+    wav_lens = torch.tensor([s / max(seconds) for s in seconds], dtype=torch.float32)
+    with torch.no_grad():
+        feats = base.mods.compute_features(wavs)
+        feats = base.mods.mean_var_norm(feats, wav_lens)
+    return feats, wav_lens
+
+
+def _quantized_module(base):
+    import torch
+
+    module = copy.deepcopy(base.mods.embedding_model).eval()
+    quantized = torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+    count = sum(1 for m in quantized.modules() if isinstance(m, torch.ao.nn.quantized.dynamic.Linear))
+    print(f"[ecapa] Dynamic int8 quantization replaced {count} nn.Linear layers")
+    if count == 0:
+        # nothing would run in int8: the "quantized" model is the fp32 one under another name
+        raise RuntimeError("the embedding network has no nn.Linear layers to quantize "
+                           "(try onnx-int8, which also quantizes Conv)")
+    return quantized
+
+
+def _build_torchscript(base, backend, path):
+    import torch
+
+    if not os.path.exists(path):
+        module = _quantized_module(base) if backend.endswith("int8") else base.mods.embedding_model.eval()
+        feats, wav_lens = _example_features(base)
+        with torch.no_grad():
+            traced = torch.jit.trace(module, (feats, wav_lens), check_trace=False)
+        torch.jit.save(traced, path)
+    graph = torch.jit.load(path, map_location="cpu")
+    return lambda feats, wav_lens: graph(feats, wav_lens)
+
+
+def _build_onnx(base, backend, path, threads, interop_threads):
+    import torch
+    import onnxruntime as ort
+
+    if not os.path.exists(path):
+        feats, wav_lens = _example_features(base)
+        fp32_path = path.replace("-int8", "") if backend.endswith("int8") else path
+        if not os.path.exists(fp32_path):
+            torch.onnx.export(
+                base.mods.embedding_model.eval(), (feats, wav_lens), fp32_path,
+                input_names=["feats", "wav_lens"], output_names=["embeddings"],
+                dynamic_axes={"feats": {0: "batch", 1: "frames"}, "wav_lens": {0: "batch"},
+                              "embeddings": {0: "batch"}},
+                opset_version=17,
+            )
+        if backend.endswith("int8"):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    if interop_threads:
+        options.inter_op_num_threads = interop_threads
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def embed(feats, wav_lens):
+        out = session.run(None, {"feats": feats.cpu().numpy(), "wav_lens": wav_lens.cpu().numpy()})[0]
+        return torch.from_numpy(out)
+
+    return embed
+
+
+def embedding_parity(reference, candidate, seconds=(1.5, 4.0, 7.0), seed: int = 1) -> dict:
+    """
+    Cosine agreement between two encode_batch implementations on random waveforms of
+    different lengths (batched, with padding). Returns min / mean cosine.
+    """
+    import torch
+
+    rng = np.random.default_rng(seed)
+    sr = 16000
+    longest = int(max(seconds) * sr)
+    wavs = torch.zeros(len(seconds), longest)
+    for i, s in enumerate(seconds):
+        wavs[i, :int(s * sr)] = torch.from_numpy(rng.standard_normal(int(s * sr)).astype(np.float32) * 0.1)
+    wav_lens = torch.tensor([s / max(seconds) for s in seconds], dtype=torch.float32)
+    with torch.no_grad():
+        a = reference.encode_batch(wavs, wav_lens).reshape(len(seconds), -1).cpu().numpy()
+        b = candidate.encode_batch(wavs, wav_lens).reshape(len(seconds), -1).cpu().numpy()
+    cos = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-9)
+    return {"min_cosine": float(cos.min()), "mean_cosine": float(cos.mean())}
+
+
+def optimize_verifier(base, backend: str = "eager", threads: int = 0, interop_threads: int = 0,
+                      cache_dir: str = ECAPA_CACHE_DIR):
+    """
+    Wrap a SpeechBrain verifier with the requested backend (see module docstring).
+    Falls back to eager (still honouring `threads`) if the backend is unavailable,
+    fails to export, or disagrees with the fp32 model.
+    """
+    import torch
+
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(int(interop_threads))
+        except RuntimeError as e:
+            # only settable before the first inter-op parallel work in the process
+            print(f"[ecapa] Could not set inter-op threads ({e})")
+
+    eager = OptimizedVerifier(base, lambda feats, wav_lens: base.mods.embedding_model(feats, wav_lens),
+                              "eager", threads)
+    if backend in (None, "", "eager"):
+        return eager
+    if backend not in ECAPA_BACKENDS:
+        print(f"[ecapa] Unknown backend '{backend}', using eager")
+        return eager
+    if str(base.device) != "cpu":
+        print(f"[ecapa] Backend '{backend}' is CPU-only, using eager on {base.device}")
+        return eager
+
+    os.makedirs(cache_dir, exist_ok=True)
+    key = _cache_key(base, backend)
+    meta_path = os.path.join(cache_dir, f"{backend}-{key}.json")
+    try:
+        if backend.startswith("onnx"):
+            path = os.path.join(cache_dir, f"{backend}-{key}.onnx")
+            cached = os.path.exists(path)
+            embed_fn = _build_onnx(base, backend, path, threads, interop_threads)
+        elif backend.startswith("torchscript"):
+            path = os.path.join(cache_dir, f"{backend}-{key}.pt")
+            cached = os.path.exists(path)
+            embed_fn = _build_torchscript(base, backend, path)
+        else:
+            path, cached = None, False
+            quantized = _quantized_module(base)
+            embed_fn = lambda feats, wav_lens: quantized(feats, wav_lens)  # noqa: E731
+    except Exception as e:
+        print(f"[ecapa] Backend '{backend}' unavailable ({type(e).__name__}: {e}), using eager")
+        return eager
+
+    candidate = OptimizedVerifier(base, embed_fn, backend, threads)
+    if cached and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            parity = json.load(f)
+    else:
+        parity = embedding_parity(eager, candidate)
+        if path is not None:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(parity, f)
+    threshold = PARITY_THRESHOLD.get(backend, DEFAULT_PARITY_THRESHOLD)
+    if parity["min_cosine"] < threshold:
+        print(f"[ecapa] Backend '{backend}' disagrees with fp32 (min cosine {parity['min_cosine']:.4f} "
+              f"< {threshold}), using eager")
+        return eager
+    source = f"cached {path}" if cached else (path or "in memory")
+    print(f"[ecapa] Using '{backend}' embedding backend ({source}, min cosine {parity['min_cosine']:.4f})")
+    return candidate
@@ -0,0 +1,136 @@
+"""
+Bulk speaker enrollment from many clips per speaker.
+
+A reference in config/references.json may be a single audio file or a folder of
+clips. Every clip is decoded (and resampled to 16 kHz) on a thread pool, all clips
+are embedded together in length-bucketed ECAPA batches (speaker_verification.embed_waveforms),
+and each speaker is stored as:
+  - one centroid row under its name (mean of its unit-normalised clip embeddings), and
+  - optionally up to `sub_centroids` spherical k-means centroids under "<name>#1", "<name>#2", ...
+    for speakers whose clips vary (different mics, rooms, moods).
+
+Matching maps "<name>#k" rows back to <name> (see matching.speaker_of), so the
+per-segment cost grows with the number of centroids, not the number of clips.
+
+    python main.py enroll path/to/speakers --sub-centroids 3
+
+where path/to/speakers/<Name>/*.wav holds each speaker's clips.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .audio_utils import load_audio, SAMPLE_RATE
+from .matching import SUBCENTROID_SEP, normalize_rows
+from .speaker_index import _spherical_kmeans
+from .speaker_verification import embed_waveforms
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".m4a", ".aac", ".opus", ".webm")
+
+
+def list_clips(path: str) -> list:
+    """Audio clips for one reference: the file itself, or every audio file under a folder (sorted)."""
+    if not os.path.isdir(path):
+        return [path]
+    clips = []
+    for root, _, files in os.walk(path):
+        clips.extend(os.path.join(root, f) for f in files if f.lower().endswith(AUDIO_EXTENSIONS))
+    return sorted(clips)
+
+
+def collect_speaker_folders(root: str) -> dict:
+    """
+    {name: path} for an enrollment folder: each sub-folder is a speaker named after
+    the folder, each loose audio file a single-clip speaker named after its stem.
+    """
+    speakers = {}
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        if os.path.isdir(path):
+            if list_clips(path):
+                speakers[entry] = path
+        elif entry.lower().endswith(AUDIO_EXTENSIONS):
+            speakers[os.path.splitext(entry)[0]] = path
+    return speakers
+
+
+def speaker_centroids(embeddings, sub_centroids: int = 0):
+    """
+    Return (centroid (D,), subs (K, D)) for one speaker's clip embeddings (N, D).
+    Sub-centroids need at least two clips per cluster; with fewer clips K shrinks
+    (and is 0 below four clips).
+    """
+    unit = normalize_rows(np.asarray(embeddings).reshape(len(embeddings), -1))
+    centroid = normalize_rows(unit.mean(axis=0, keepdims=True))[0]
+    k = min(sub_centroids, len(unit) // 2)
+    if k < 2:
+        return centroid, np.zeros((0, unit.shape[1]), dtype=np.float32)
+    return centroid, _spherical_kmeans(unit, k)
+
+
+def sub_centroid_key(name: str, i: int) -> str:
+    return f"{name}{SUBCENTROID_SEP}{i}"
+
+
+def enroll_speakers(
+    store,
+    clips_by_name: dict,
+    verifier,
+    sub_centroids=0,
+    meta_by_name: dict = None,
+    threads: int = 4,
+    max_batch_samples: int = 16000 * 120,
+    max_batch_rows: int = 64,
+    chunk_clips: int = 512
+):
+    """
+    Embed {name: [clip paths]} and write centroids (+ sub-centroids) into `store`.
+
+    `sub_centroids` is an int or {name: int}. Speakers are processed in groups of
+    about `chunk_clips` clips so decoded audio never has to fit in memory at once.
+    Previous rows of a re-enrolled speaker (including old sub-centroids) are
+    replaced. Returns (clips embedded, seconds of audio embedded).
+    """
+    meta_by_name = meta_by_name or {}
+    names = list(clips_by_name)
+    old_subs = {}
+    for key in store.names():
+        speaker = store.get(key).get("speaker")
+        if speaker in clips_by_name:
+            old_subs.setdefault(speaker, []).append(key)
+    total, audio_seconds = 0, 0.0
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        lo = 0
+        while lo < len(names):
+            # take whole speakers until the group holds ~chunk_clips clips
+            hi, count = lo, 0
+            while hi < len(names) and (hi == lo or count + len(clips_by_name[names[hi]]) <= chunk_clips):
+                count += len(clips_by_name[names[hi]])
+                hi += 1
+            group = names[lo:hi]
+            paths = [p for n in group for p in clips_by_name[n]]
+            waveforms = list(pool.map(lambda p: load_audio(p, sr=SAMPLE_RATE), paths))
+            audio_seconds += sum(len(w) for w in waveforms) / SAMPLE_RATE
+            embs = np.asarray(embed_waveforms(
+                verifier, waveforms, target_sr=SAMPLE_RATE, max_batch_samples=max_batch_samples,
+                max_batch_rows=max_batch_rows, label="reference clips"
+            )).reshape(len(paths), -1)
+            del waveforms
+
+            start = 0
+            for name in group:
+                n = len(clips_by_name[name])
+                k = sub_centroids.get(name, 0) if isinstance(sub_centroids, dict) else sub_centroids
+                centroid, subs = speaker_centroids(embs[start:start + n], k)
+                start += n
+                for key in old_subs.get(name, ()):
+                    store.delete(key)
+                meta = dict(meta_by_name.get(name, {}), clips=n, sub_centroids=k, subs=len(subs))
+                store.put(name, centroid, **meta)
+                for i, sub in enumerate(subs, start=1):
+                    store.put(sub_centroid_key(name, i), sub, speaker=name)
+            total += len(paths)
+            lo = hi
+    return total, audio_seconds
@@ -0,0 +1,241 @@
+"""
+Speaker identification: turn whisperx segments + embeddings into speaker names.
+
+Modes:
+  - "cluster": embed each diarized speaker (SPEAKER_00, ...) once from its best
+    regions, match the clusters and propagate the name to all of that cluster's
+    segments. Segments without a diarization label fall back to per-segment matching.
+  - "segment": embed and match every segment independently.
+
+The work is split in two so the expensive half can be cached:
+  compute_speaker_embeddings(...) -> embeddings dict (ECAPA work, cacheable)
+  assign_speakers(embeddings, segments, matcher, ...) -> (segment_infos, labels, top_names, top_scores)
+identify_speakers(...) runs both.
+
+Segments embedded individually go through plan_segment_windows first: consecutive
+segments of the same diarized speaker are merged into one window (up to
+`merge_seconds`, only across pauses of at most `merge_gap_seconds` and never across
+another speaker's segment), windows are trimmed to `max_seconds`, and segments shorter than
+`min_seconds` ("yeah", "okay") are not embedded at all but share the row of the
+nearest window of the same diarized speaker (else the nearest window in time).
+"""
+
+import numpy as np
+
+from .speaker_verification import embed_waveforms, embed_speaker_clusters
+from .profiling import timed
+
+IDENTIFICATION_MODES = ("cluster", "segment")
+
+
+def plan_segment_windows(segments, indices, min_seconds: float = 1.0, merge_seconds: float = 8.0,
+                         max_seconds: float = 15.0, merge_gap_seconds: float = 1.5) -> dict:
+    """
+    Decide what to embed for the segments at `indices` (transcript order).
+    Two segments are merged only if no segment of another speaker lies between them in
+    `segments` and the pause between them is at most `merge_gap_seconds`.
+    Returns {"windows": [[segment indices], ...], "inherit": {index: window no},
+    "baseline_seconds": audio one-embedding-per-segment would use,
+    "embedded_seconds": audio the windows use after trimming}. 0 disables a limit.
+    """
+    def duration(i):
+        return max(0.0, segments[i].get("end", 0.0) - segments[i].get("start", 0.0))
+
+    def contiguous(a, b, speaker):
+        # skipped short fragments of the same speaker may sit in between; anyone else may not
+        if any(segments[j].get("speaker") != speaker for j in range(a + 1, b)):
+            return False
+        gap = segments[b].get("start", 0.0) - segments[a].get("end", 0.0)
+        return not merge_gap_seconds or gap <= merge_gap_seconds
+
+    indices = [i for i in indices if duration(i) >= 1e-3]   # empty segments cannot be embedded
+    short = {i for i in indices if min_seconds and duration(i) < min_seconds}
+    if len(short) == len(indices):
+        short = set()   # nothing long enough to inherit from: embed everything
+    windows, current, current_seconds = [], [], 0.0
+    for i in indices:
+        if i in short:
+            continue
+        speaker = segments[i].get("speaker")
+        if (current and merge_seconds and speaker is not None
+                and segments[current[-1]].get("speaker") == speaker
+                and contiguous(current[-1], i, speaker)
+                and current_seconds + duration(i) <= merge_seconds):
+            current.append(i)
+            current_seconds += duration(i)
+            continue
+        if current:
+            windows.append(current)
+        current, current_seconds = [i], duration(i)
+    if current:
+        windows.append(current)
+
+    inherit = {}
+    if short and windows:
+        mids = np.asarray([(segments[w[0]]["start"] + segments[w[-1]]["end"]) / 2 for w in windows])
+        speakers = [segments[w[0]].get("speaker") for w in windows]
+        for i in short:
+            mid = (segments[i]["start"] + segments[i]["end"]) / 2
+            same = [n for n, s in enumerate(speakers) if s is not None and s == segments[i].get("speaker")]
+            candidates = same or range(len(windows))
+            inherit[i] = min(candidates, key=lambda n: abs(mids[n] - mid))
+
+    embedded = sum(min(sum(duration(i) for i in w), max_seconds or float("inf")) for w in windows)
+    return {
+        "windows": windows,
+        "inherit": inherit,
+        "baseline_seconds": sum(duration(i) for i in indices),
+        "embedded_seconds": embedded,
+    }
+
+
+def _window_audio(full_audio, sr, segments, window, max_seconds: float = 0.0, target_sr: int = 16000):
+    """Concatenate a window's segments at `target_sr`; keep the centre `max_seconds` if it is longer."""
+    audio = np.concatenate([full_audio[max(int(segments[i]["start"] * sr), 0):max(int(segments[i]["end"] * sr), 0)]
+                            for i in window])
+    limit = int(max_seconds * sr) if max_seconds else 0
+    if limit and len(audio) > limit:
+        lo = (len(audio) - limit) // 2
+        audio = audio[lo:lo + limit]
+    if sr != target_sr:
+        import librosa
+        audio = librosa.resample(audio, orig_sr=sr, target_sr=target_sr)
+    return audio
+
+
+def compute_speaker_embeddings(
+    verifier,
+    full_audio,
+    sr,
+    segments,
+    mode: str = "cluster",
+    cluster_max_seconds: float = 30.0,
+    max_batch_samples: int = 16000 * 120,
+    max_batch_rows: int = 64,
+    timings: dict = None,
+    min_seconds: float = 1.0,
+    merge_seconds: float = 8.0,
+    max_seconds: float = 15.0,
+    merge_gap_seconds: float = 1.5
+) -> dict:
+    """
+    Run ECAPA for the given mode. Returns a dict with:
+      mode, cluster_ids (list of diarization labels), cluster_embeddings (C, ...),
+      segment_indices (indices into `segments`), segment_embeddings (S, ...).
+    Individually embedded segments are planned with plan_segment_windows
+    (`min_seconds` / `merge_seconds` / `max_seconds` / `merge_gap_seconds`); merged and inheriting
+    segments repeat their window's row in segment_embeddings.
+    """
+    timings = timings if timings is not None else {}
+    batch_opts = dict(max_batch_samples=max_batch_samples, max_batch_rows=max_batch_rows)
+
+    if mode not in IDENTIFICATION_MODES:
+        print(f"[identification] Unknown mode '{mode}', using per-segment matching")
+        mode = "segment"
+
+    cluster_ids, cluster_embs = [], np.zeros((0,))
+    fallback = list(range(len(segments)))
+    if mode == "cluster":
+        with timed("embedding", timings):
+            cluster_ids, cluster_embs = embed_speaker_clusters(
+                verifier, full_audio, sr, segments, max_seconds=cluster_max_seconds, **batch_opts
+            )
+        known = set(cluster_ids)
+        fallback = [i for i, s in enumerate(segments) if s.get("speaker") not in known]
+        if fallback:
+            print(f"[identification] {len(fallback)} segments without a diarized speaker, embedding individually")
+
+    # per-segment path (whole transcript in "segment" mode, unlabeled leftovers in "cluster" mode)
+    segment_indices, segment_embs = [], np.zeros((0,))
+    if fallback:
+        with timed("embedding.plan", timings) as plan_record:
+            plan = plan_segment_windows(segments, fallback, min_seconds=min_seconds,
+                                        merge_seconds=merge_seconds, max_seconds=max_seconds,
+                                        merge_gap_seconds=merge_gap_seconds)
+            saved = plan["baseline_seconds"] - plan["embedded_seconds"]
+            plan_record.update(
+                segments=len(fallback), windows=len(plan["windows"]), inherited=len(plan["inherit"]),
+                baseline_seconds=plan["baseline_seconds"], embedded_seconds=plan["embedded_seconds"],
+                saved_seconds=saved,
+            )
+        print(f"[identification] {len(fallback)} segments -> {len(plan['windows'])} embedding windows, "
+              f"{len(plan['inherit'])} short segments inherit a label; "
+              f"{plan['embedded_seconds']:.1f}s embedded instead of {plan['baseline_seconds']:.1f}s "
+              f"({saved:.1f}s saved)")
+        with timed("embedding.segments" if mode == "cluster" else "embedding", timings) as record:
+            record["audio_seconds"] = plan["embedded_seconds"]
+            waveforms = [_window_audio(full_audio, sr, segments, w, max_seconds) for w in plan["windows"]]
+            window_embs = embed_waveforms(verifier, waveforms, 16000, label="segment windows", **batch_opts)
+        rows = {i: n for n, w in enumerate(plan["windows"]) for i in w}
+        rows.update(plan["inherit"])
+        segment_indices = sorted(rows)
+        segment_embs = window_embs[[rows[i] for i in segment_indices]] if len(segment_indices) \
+            else np.zeros((0,))
+
+    return {
+        "mode": mode,
+        "cluster_ids": list(cluster_ids),
+        "cluster_embeddings": cluster_embs,
+        "segment_indices": segment_indices,
+        "segment_embeddings": segment_embs,
+    }
+
+
+def assign_speakers(embeddings: dict, segments, matcher, threshold: float = 0.37, top_k: int = 1,
+                    timings: dict = None):
+    """
+    Match precomputed embeddings (from compute_speaker_embeddings) and label segments.
+    Returns (segment_infos, labels, top_names, top_scores), one entry per identified
+    segment in transcript order.
+    """
+    timings = timings if timings is not None else {}
+    with timed("matching", timings):
+        cluster_results = {}
+        if len(embeddings["cluster_ids"]):
+            labels, names, scores = matcher.match(embeddings["cluster_embeddings"], threshold=threshold,
+                                                  top_k=top_k)
+            for cid, label, cand, score in zip(embeddings["cluster_ids"], labels, names, scores):
+                cluster_results[cid] = (label, cand, score)
+                print(f"[identification] {cid} -> {label} ({score[0]:.3f})" if len(score) else
+                      f"[identification] {cid} -> {label}")
+
+        segment_results = {}
+        if len(embeddings["segment_indices"]):
+            labels, names, scores = matcher.match(embeddings["segment_embeddings"], threshold=threshold,
+                                                  top_k=top_k)
+            for idx, label, cand, score in zip(embeddings["segment_indices"], labels, names, scores):
+                segment_results[int(idx)] = (label, cand, score)
+
+        infos, labels, top_names, top_scores = [], [], [], []
+        for i, seg in enumerate(segments):
+            r = segment_results.get(i) or cluster_results.get(seg.get("speaker"))
+            if r is None:
+                continue  # empty segment that could not be embedded
+            infos.append(seg)
+            labels.append(r[0])
+            top_names.append(r[1])
+            top_scores.append(r[2])
+    return infos, labels, top_names, top_scores
+
+
+def identify_speakers(
+    verifier,
+    matcher,
+    full_audio,
+    sr,
+    segments,
+    threshold: float = 0.37,
+    mode: str = "cluster",
+    cluster_max_seconds: float = 30.0,
+    top_k: int = 1,
+    max_batch_samples: int = 16000 * 120,
+    max_batch_rows: int = 64,
+    timings: dict = None,
+    **plan_options
+):
+    """Embed and match in one call; see compute_speaker_embeddings / assign_speakers."""
+    embeddings = compute_speaker_embeddings(
+        verifier, full_audio, sr, segments, mode=mode, cluster_max_seconds=cluster_max_seconds,
+        max_batch_samples=max_batch_samples, max_batch_rows=max_batch_rows, timings=timings, **plan_options
+    )
+    return assign_speakers(embeddings, segments, matcher, threshold=threshold, top_k=top_k, timings=timings)
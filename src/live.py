@@ -0,0 +1,301 @@
+"""
+Real-time speaker-labelled captions from live PCM audio.
+
+Sources (all 16-bit little-endian PCM unless `fmt="f32le"`):
+  - stdin:   raw frames piped in, e.g. `ffmpeg -i mic ... -f s16le -ac 1 -ar 16000 - | python main.py live --stdin`
+  - follow:  a WAV file that another process keeps appending to
+  - listen:  a local TCP socket; the first client's byte stream is consumed
+
+LiveCaptioner runs an incremental energy VAD over the incoming frames. While
+someone is speaking it emits a "partial" caption every `partial_interval` seconds;
+when the utterance ends (or hits `max_utterance` seconds) it emits a "final" one.
+Each caption is transcribed with the warm WhisperX ASR model and labelled by
+embedding the utterance (or the most recent `embed_window` seconds of it) with
+ECAPA and matching it against the cached reference embeddings. Diarization and
+alignment are skipped to keep latency to a few seconds.
+"""
+
+import collections
+import queue
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .audio_utils import SAMPLE_RATE
+
+_EOF = object()
+# the noise floor is the quietest frame of the last NOISE_WINDOW seconds, starting at and
+# never above these fractions of vad_threshold: a stream that opens mid-utterance cannot
+# learn the speech level as "background"
+NOISE_WINDOW = 2.0
+NOISE_FLOOR_START = 1 / 3
+NOISE_FLOOR_MAX = 2 / 3
+
+
+# ----------------------------
+# PCM sources
+# ----------------------------
+def _decode_pcm(raw: bytes, fmt: str) -> np.ndarray:
+    if fmt == "f32le":
+        return np.frombuffer(raw[:len(raw) - len(raw) % 4], dtype="<f4").astype(np.float32)
+    return np.frombuffer(raw[:len(raw) - len(raw) % 2], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _resampled(frames, rate, sr):
+    if rate == sr:
+        yield from frames
+        return
+    import librosa
+    for block in frames:
+        yield librosa.resample(block, orig_sr=rate, target_sr=sr)
+
+
+def stdin_frames(fmt="s16le", rate=SAMPLE_RATE, sr=SAMPLE_RATE, block_seconds=0.1):
+    """Yield float32 blocks read from stdin until EOF."""
+    bytes_per_sample = 4 if fmt == "f32le" else 2
+    size = int(block_seconds * rate) * bytes_per_sample
+
+    def raw():
+        stream = sys.stdin.buffer
+        while chunk := stream.read(size):
+            yield _decode_pcm(chunk, fmt)
+    yield from _resampled(raw(), rate, sr)
+
+
+def follow_wav_frames(path, sr=SAMPLE_RATE, block_seconds=0.1, idle_timeout=10.0, poll=0.05):
+    """
+    Tail a 16-bit PCM WAV file that is still being written. Stops after
+    `idle_timeout` seconds without new data.
+    """
+    with open(path, "rb") as f:
+        header = f.read(4096)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"not a WAV file: {path}")
+        channels = int.from_bytes(header[22:24], "little")
+        rate = int.from_bytes(header[24:28], "little")
+        bits = int.from_bytes(header[34:36], "little")
+        data_at = header.find(b"data")
+        if bits != 16 or data_at < 0:
+            raise ValueError("only 16-bit PCM WAV files can be followed")
+        f.seek(data_at + 8)
+
+        frame_bytes = 2 * channels
+        size = int(block_seconds * rate) * frame_bytes
+
+        def raw():
+            pending = b""
+            idle_since = time.monotonic()
+            while True:
+                chunk = f.read(size)
+                if not chunk:
+                    if time.monotonic() - idle_since > idle_timeout:
+                        return
+                    time.sleep(poll)
+                    continue
+                idle_since = time.monotonic()
+                pending += chunk
+                usable = len(pending) - len(pending) % frame_bytes
+                block = _decode_pcm(pending[:usable], "s16le")
+                pending = pending[usable:]
+                if channels > 1:
+                    block = block.reshape(-1, channels).mean(axis=1)
+                yield block
+        yield from _resampled(raw(), rate, sr)
+
+
+def socket_frames(host="127.0.0.1", port=8766, fmt="s16le", rate=SAMPLE_RATE, sr=SAMPLE_RATE,
+                  block_seconds=0.1):
+    """Accept one TCP client and yield its PCM stream until it disconnects."""
+    bytes_per_sample = 4 if fmt == "f32le" else 2
+    size = int(block_seconds * rate) * bytes_per_sample
+    with socket.create_server((host, port)) as server:
+        print(f"[live] Waiting for PCM stream on {host}:{port}...", file=sys.stderr)
+        conn, addr = server.accept()
+        print(f"[live] Client connected: {addr}", file=sys.stderr)
+
+        def raw():
+            pending = b""
+            with conn:
+                while chunk := conn.recv(size):
+                    pending += chunk
+                    usable = len(pending) - len(pending) % bytes_per_sample
+                    yield _decode_pcm(pending[:usable], fmt)
+                    pending = pending[usable:]
+        yield from _resampled(raw(), rate, sr)
+
+
+# ----------------------------
+# Captioner
+# ----------------------------
+class LiveCaptioner:
+    """Incremental VAD + ASR + speaker matching over a stream of float32 blocks."""
+
+    def __init__(self, asr_model, verifier, matcher, threshold=0.37, on_caption=None, sr=SAMPLE_RATE,
+                 vad_threshold=0.01, min_silence=0.6, max_utterance=15.0, partial_interval=2.0,
+                 embed_window=6.0, min_embed_seconds=1.0, frame_seconds=0.03, batch_size=8):
+        self.asr = asr_model
+        self.verifier = verifier
+        self.matcher = matcher
+        self.threshold = threshold
+        self.on_caption = on_caption or print_caption
+        self.sr = sr
+        self.frame = int(frame_seconds * sr)
+        self.vad_threshold = vad_threshold
+        self.min_silence = min_silence
+        self.max_utterance = max_utterance
+        self.partial_interval = partial_interval
+        self.embed_window = embed_window
+        self.min_embed_seconds = min_embed_seconds
+        self.batch_size = batch_size
+
+        self.position = 0            # samples consumed so far
+        self.noise_floor = vad_threshold * NOISE_FLOOR_START
+        self._recent_rms = collections.deque(maxlen=max(1, int(NOISE_WINDOW / frame_seconds)))
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._utterance = []         # speech frames of the current utterance
+        self._utt_start = None
+        self._silence = 0.0
+        self._last_partial = 0.0
+        self._speaker = ("Unknown", 0.0)
+
+    # -- VAD ------------------------------------------------------------
+    def _is_speech(self, frame) -> bool:
+        rms = float(np.sqrt(np.mean(np.square(frame)) + 1e-12))
+        if self._recent_rms:
+            self.noise_floor = min(min(self._recent_rms), self.vad_threshold * NOISE_FLOOR_MAX)
+        self._recent_rms.append(rms)
+        return rms > max(self.vad_threshold, 3.0 * self.noise_floor)
+
+    def feed(self, block: np.ndarray):
+        """Consume a block of samples; emits captions through `on_caption`."""
+        self._pending = np.concatenate([self._pending, np.asarray(block, dtype=np.float32)])
+        n_frames = len(self._pending) // self.frame
+        for i in range(n_frames):
+            frame = self._pending[i * self.frame:(i + 1) * self.frame]
+            speech = self._is_speech(frame)
+            self.position += self.frame
+            if speech:
+                if self._utt_start is None:
+                    self._utt_start = self.position - self.frame
+                    self._last_partial = 0.0
+                self._silence = 0.0
+            elif self._utt_start is not None:
+                self._silence += self.frame / self.sr
+            if self._utt_start is None:
+                continue
+            self._utterance.append(frame)
+            duration = len(self._utterance) * self.frame / self.sr
+            if self._silence >= self.min_silence or duration >= self.max_utterance:
+                self._finish()
+            elif duration - self._last_partial >= self.partial_interval:
+                self._last_partial = duration
+                self._emit("partial")
+        self._pending = self._pending[n_frames * self.frame:].copy()
+
+    def flush(self):
+        """Finish any utterance still open at end of stream."""
+        if self._utt_start is not None:
+            self._finish()
+
+    # -- recognition ----------------------------------------------------
+    def _identify(self, audio):
+        import torch
+
+        window = audio[-int(self.embed_window * self.sr):]
+        if len(window) < self.min_embed_seconds * self.sr:
+            return self._speaker
+        with torch.no_grad():
+            emb = self.verifier.encode_batch(torch.as_tensor(window).unsqueeze(0))
+        labels, _, scores = self.matcher.match(emb.detach().cpu().numpy(), threshold=self.threshold)
+        self._speaker = (labels[0], float(scores[0][0]) if scores.shape[1] else 0.0)
+        return self._speaker
+
+    def _transcribe(self, audio) -> str:
+        result = self.asr.transcribe(audio, batch_size=self.batch_size)
+        return " ".join(s.get("text", "").strip() for s in result.get("segments", [])).strip()
+
+    def _emit(self, kind):
+        audio = np.concatenate(self._utterance)
+        speaker, score = self._identify(audio)
+        text = self._transcribe(audio)
+        if not text:
+            return
+        self.on_caption({
+            "type": kind,
+            "speaker": speaker,
+            "score": score,
+            "text": text,
+            "start": self._utt_start / self.sr,
+            "end": self.position / self.sr,
+            "emitted_at": time.time(),
+        })
+
+    def _finish(self):
+        self._emit("final")
+        self._utterance = []
+        self._utt_start = None
+        self._silence = 0.0
+        self._speaker = ("Unknown", 0.0)
+
+
+def print_caption(caption: dict):
+    tag = "" if caption["type"] == "final" else "[partial]"
+    print(f"{tag}[{caption['speaker']}]: {caption['text']}", flush=True)
+
+
+def run_live(frames, captioner: LiveCaptioner, max_queue_seconds=60.0):
+    """
+    Read `frames` on a background thread and feed the captioner from a queue, so
+    slow recognition never blocks the audio source. When recognition falls behind,
+    queued blocks are merged and processed together.
+    """
+    q = queue.Queue(maxsize=max(1, int(max_queue_seconds / 0.1)))
+
+    def reader():
+        try:
+            for block in frames:
+                q.put(block)
+        finally:
+            q.put(_EOF)
+
+    threading.Thread(target=reader, name="live-reader", daemon=True).start()
+    while True:
+        item = q.get()
+        blocks = [item]
+        while item is not _EOF:
+            try:
+                item = q.get_nowait()
+            except queue.Empty:
+                break
+            blocks.append(item)
+        done = blocks[-1] is _EOF
+        audio = [b for b in blocks if b is not _EOF]
+        if audio:
+            captioner.feed(np.concatenate(audio))
+        if done:
+            break
+    captioner.flush()
+
+
+def build_live_captioner(ref_config_path="config/references.json", model_name="large-v2", language="en",
+                         device="cpu", compute_type="int8", asr_threads=4, similarity_threshold=0.37,
+                         matcher_backend="exact", index_nprobe=8, reference_hash="sha1",
+                         reference_sync_threads=4, ecapa_backend="eager", ecapa_threads=0,
+                         ecapa_interop_threads=0, on_caption=None, **options):
+    """Load the ASR + ECAPA models and the reference cache and return a ready LiveCaptioner."""
+    from .models import get_model
+    from .speaker_utils import load_reference_matrix
+    from .speaker_index import build_matcher
+
+    asr = get_model("asr", model_name=model_name, language=language, device=device,
+                    compute_type=compute_type, threads=asr_threads)
+    verifier = get_model("verifier", device=device, backend=ecapa_backend, threads=ecapa_threads,
+                         interop_threads=ecapa_interop_threads)
+    ref_names, ref_matrix = load_reference_matrix(ref_config_path, verifier, hash_algo=reference_hash,
+                                                  threads=reference_sync_threads)
+    matcher = build_matcher(ref_names, ref_matrix, backend=matcher_backend, nprobe=index_nprobe)
+    return LiveCaptioner(asr, verifier, matcher, threshold=similarity_threshold, on_caption=on_caption,
+                         **options)
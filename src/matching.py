@@ -0,0 +1,126 @@
+"""
+Vectorized speaker matching.
+
+SpeakerMatcher keeps the reference embeddings as one L2-normalised (R, D) float32
+matrix, so scoring N segment embeddings against every reference is a single
+(N, D) @ (D, R) product instead of N * R Python-level cosine_similarity calls.
+
+Usage:
+    matcher = SpeakerMatcher.from_dict(ref_embeddings)       # {name: embedding}
+    labels, top_names, top_scores = matcher.match(segment_embeddings, threshold=0.37, top_k=3)
+
+Reference rows named "<name>#<k>" are extra sub-centroids of <name> (see enrollment.py);
+match() reports them as <name> and lists each speaker at most once in the top-k.
+"""
+
+from collections import Counter
+
+import numpy as np
+
+UNKNOWN = "Unknown"
+SUBCENTROID_SEP = "#"
+
+
+def speaker_of(key: str) -> str:
+    """Speaker name for a reference row key ("Amit#2" -> "Amit")."""
+    return key.split(SUBCENTROID_SEP, 1)[0]
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """Return a float32 copy of `matrix` (N, D) with unit-length rows."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / (norms + 1e-9)
+
+
+class SpeakerMatcher:
+    """Cosine matcher over a pre-normalised reference matrix."""
+
+    def __init__(self, names, matrix, normalized: bool = False):
+        self.names = list(names)
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(len(self.names), -1) \
+            if len(self.names) else np.zeros((0, 0), dtype=np.float32)
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+
+    @classmethod
+    def from_dict(cls, reference_embeddings: dict):
+        """Build from {name: embedding} as returned by load_reference_embeddings."""
+        names = list(reference_embeddings.keys())
+        if not names:
+            return cls([], np.zeros((0, 0), dtype=np.float32), normalized=True)
+        matrix = np.stack([np.asarray(reference_embeddings[n], dtype=np.float32).ravel() for n in names])
+        return cls(names, matrix)
+
+    def __len__(self):
+        return len(self.names)
+
+    def scores(self, embeddings) -> np.ndarray:
+        """Cosine similarity of every embedding against every reference, shape (N, R)."""
+        queries = normalize_rows(np.asarray(embeddings).reshape(len(embeddings), -1))
+        return queries @ self.matrix.T
+
+    def top_k(self, embeddings, k: int = 1, chunk_elements: int = 1 << 24):
+        """
+        Return (indices (N, k), scores (N, k)) of the k best references per embedding,
+        best first. Rows are scored in chunks so the (chunk, R) score block stays
+        under `chunk_elements` floats even for very large rosters.
+        """
+        n = len(embeddings)
+        k = min(k, len(self.names))
+        indices = np.zeros((n, k), dtype=np.int64)
+        top_scores = np.zeros((n, k), dtype=np.float32)
+        if n == 0 or k == 0:
+            return indices, top_scores
+
+        embeddings = np.asarray(embeddings).reshape(n, -1)
+        rows = max(1, chunk_elements // max(1, len(self.names)))
+        for lo in range(0, n, rows):
+            block = self.scores(embeddings[lo:lo + rows])
+            if k < block.shape[1]:
+                part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            else:
+                part = np.broadcast_to(np.arange(block.shape[1]), block.shape)
+            part_scores = np.take_along_axis(block, part, axis=1)
+            order = np.argsort(-part_scores, axis=1)
+            indices[lo:lo + rows] = np.take_along_axis(part, order, axis=1)
+            top_scores[lo:lo + rows] = np.take_along_axis(part_scores, order, axis=1)
+        return indices, top_scores
+
+    def match(self, embeddings, threshold: float = 0.37, top_k: int = 1):
+        """
+        Match every embedding at once.
+        Returns (labels, top_names, top_scores): labels[i] is the best name or "Unknown"
+        when its score is below `threshold`; top_names[i] / top_scores[i] are the k best
+        candidates, best first.
+        """
+        n = len(embeddings)
+        if n == 0 or not self.names:
+            return [UNKNOWN] * n, [[] for _ in range(n)], np.zeros((n, 0), dtype=np.float32)
+
+        top_k = max(1, top_k)
+        names = np.asarray([speaker_of(n) for n in self.names], dtype=object)
+        rows_per_speaker = max(Counter(names.tolist()).values())
+        indices, top_scores = self.top_k(embeddings, top_k * rows_per_speaker)
+        if rows_per_speaker > 1:
+            indices, top_scores = self._dedupe(names, indices, top_scores, top_k)
+        accepted = top_scores[:, 0] >= threshold
+        labels = np.where(accepted, names[indices[:, 0]], UNKNOWN).tolist()
+        top_names = names[indices].tolist()
+        return labels, top_names, top_scores
+
+    @staticmethod
+    def _dedupe(names, indices, top_scores, k):
+        """Keep each speaker's best row only, then the first k speakers per query."""
+        k = min(k, len(set(names.tolist())))
+        out_idx = np.zeros((len(indices), k), dtype=np.int64)
+        out_scores = np.zeros((len(indices), k), dtype=np.float32)
+        for qi, (row, scores) in enumerate(zip(indices, top_scores)):
+            seen, col = set(), 0
+            for idx, score in zip(row, scores):
+                if names[idx] not in seen:
+                    seen.add(names[idx])
+                    out_idx[qi, col], out_scores[qi, col] = idx, score
+                    col += 1
+                    if col == k:
+                        break
+        return out_idx, out_scores
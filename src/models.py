@@ -0,0 +1,156 @@
+"""
+Model residency: load the WhisperX ASR, alignment, diarization and ECAPA
+models once and hand the same instances to every pipeline run.
+
+Usage:
+    models = load_models(model_name="large-v2", device="cpu", ...)
+    run_pipeline("a.wav", models=models)
+    run_pipeline("b.wav", models=models)   # no model loading the second time
+
+Every handle comes from the process-wide ModelRegistry: a model is built (and its
+heavy library imported) the first time a stage asks for it, and shared after that.
+
+    asr = get_model("asr", model_name="large-v2", language="en", device="cpu", compute_type="int8", threads=4)
+"""
+
+import threading
+import time
+
+
+def _load_asr(**settings):
+    from .transcription import load_asr_model
+    return load_asr_model(**settings)
+
+
+def _load_alignment(**settings):
+    from .transcription import load_alignment_model
+    return load_alignment_model(**settings)
+
+
+def _load_diarizer(**settings):
+    from .transcription import load_diarization_pipeline
+    return load_diarization_pipeline(**settings)
+
+
+def _load_verifier(**settings):
+    from .speaker_verification import load_verification_model
+    return load_verification_model(**settings)
+
+
+MODEL_LOADERS = {
+    "asr": _load_asr,
+    "alignment": _load_alignment,
+    "diarizer": _load_diarizer,
+    "verifier": _load_verifier,
+}
+
+
+class ModelRegistry:
+    """Process-wide cache of model handles keyed by kind + settings, built on first request."""
+
+    def __init__(self, loaders: dict = None):
+        self.loaders = dict(loaders or MODEL_LOADERS)
+        self._models = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, **settings):
+        """Return the shared handle for `kind` built with `settings`, loading it if needed."""
+        key = (kind, tuple(sorted(settings.items())))
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+            lock = self._locks.setdefault(key, threading.Lock())
+        # per-model lock: concurrent stages can load different models at the same time
+        with lock:
+            if key not in self._models:
+                self._models[key] = self.loaders[kind](**settings)
+        return self._models[key]
+
+    def loaded(self) -> list:
+        """Kinds of the models built so far (one entry per distinct settings)."""
+        return [kind for kind, _ in self._models]
+
+    def clear(self, kind: str = None):
+        """Drop cached handles (all, or one kind) so their memory can be released."""
+        with self._lock:
+            for key in [k for k in self._models if kind is None or k[0] == kind]:
+                del self._models[key]
+
+
+registry = ModelRegistry()
+
+
+def get_model(kind: str, **settings):
+    """Shorthand for registry.get(kind, **settings)."""
+    return registry.get(kind, **settings)
+
+
+class PipelineModels:
+    """Container for warm model handles. Any handle left as None is loaded on demand by the stage."""
+
+    def __init__(self, asr=None, align_model=None, align_metadata=None, diarizer=None, verifier=None,
+                 model_name=None, language=None, device=None, compute_type=None):
+        self.asr = asr
+        self.align_model = align_model
+        self.align_metadata = align_metadata
+        self.diarizer = diarizer
+        self.verifier = verifier
+        # settings the handles were built with (jobs must not ask for different ones)
+        self.model_name = model_name
+        self.language = language
+        self.device = device
+        self.compute_type = compute_type
+
+
+def load_models(
+    model_name: str = "large-v2",
+    language: str = "en",
+    device: str = "cpu",
+    compute_type: str = "int8",
+    hf_token: str = None,
+    asr_threads: int = 4,
+    ecapa_backend: str = "eager",
+    ecapa_threads: int = 0,
+    ecapa_interop_threads: int = 0
+) -> PipelineModels:
+    """Load every model used by run_pipeline (via the registry) and return them in a PipelineModels."""
+    start = time.perf_counter()
+    asr = get_model("asr", model_name=model_name, language=language, device=device,
+                    compute_type=compute_type, threads=asr_threads)
+    align_model, align_metadata = get_model("alignment", language=language, device=device)
+    diarizer = get_model("diarizer", hf_token=hf_token, device=device)
+    verifier = get_model("verifier", device=device, backend=ecapa_backend, threads=ecapa_threads,
+                         interop_threads=ecapa_interop_threads)
+    print(f"[models] All models loaded in {time.perf_counter() - start:.1f}s")
+
+    return PipelineModels(
+        asr=asr,
+        align_model=align_model,
+        align_metadata=align_metadata,
+        diarizer=diarizer,
+        verifier=verifier,
+        model_name=model_name,
+        language=language,
+        device=device,
+        compute_type=compute_type,
+    )
+
+
+class LazyModel:
+    """Proxy that builds the wrapped model on first attribute access (e.g. a verifier that may not be needed)."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._model = None
+
+    def get(self):
+        if self._model is None:
+            self._model = self._loader()
+        return self._model
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
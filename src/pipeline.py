@@ -66,19 +66,38 @@
 
 
 """
-High-level pipeline orchestration: conversion -> transcription -> embeddings -> matching -> write file.
+High-level pipeline orchestration: decode -> transcription -> embeddings -> matching -> write file.
+
+Transcripts and speaker embeddings are cached by audio content (see result_cache.py),
+so re-running a recording after changing only the threshold or the reference roster
+re-runs nothing but matching.
+
+Every stage is instrumented (profiling.timed): wall / CPU time, RSS change, audio-seconds
+and real-time factor go to `<output_dir>/<base>_report.json`, and optionally to a
+Prometheus text file.
 """
 
 import os
-import librosa
-from .audio_utils import ensure_wav
+from importlib import metadata
+from .audio_utils import load_audio, SAMPLE_RATE
 from .transcription import transcribe_and_assign_speakers
-from .speaker_verification import (
-    load_verification_model,
-    embed_segments,
-    match_speaker
-)
-from .speaker_utils import load_reference_embeddings   # <-- NEW
+from .speaker_verification import ECAPA_SOURCE
+from .identification import compute_speaker_embeddings, assign_speakers
+from .speaker_utils import load_reference_matrix
+from .speaker_index import build_matcher
+from .models import LazyModel, get_model
+from .result_cache import ResultCache
+from .conversion import AudioConverter
+from .relabel import sidecar_path, write_sidecar
+from .writers import open_writers, segment_record
+from .profiling import (timed, print_timings, finalize_timings, write_report, write_prometheus,
+                        configure_profiling)
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
 
 def run_pipeline(
     input_path: str,
@@ -89,47 +108,222 @@ def run_pipeline(
     language: str = "en",
     device: str = "cpu",
     compute_type: str = "int8",
-    similarity_threshold: float = 0.37
+    similarity_threshold: float = 0.37,
+    embed_max_batch_samples: int = 16000 * 120,
+    embed_max_batch_rows: int = 64,
+    embed_min_seconds: float = 1.0,
+    embed_merge_seconds: float = 8.0,
+    embed_max_seconds: float = 15.0,
+    embed_merge_gap_seconds: float = 1.5,
+    models=None,
+    concurrent_diarization: bool = True,
+    asr_threads: int = 4,
+    asr_batch_size: int = 16,
+    asr_chunk_size: int = 30,
+    align_threads: int = 0,
+    diarize_threads: int = 0,
+    matcher_backend: str = "exact",
+    index_nprobe: int = 8,
+    speaker_id_mode: str = "cluster",
+    cluster_max_seconds: float = 30.0,
+    cache_dir: str = os.path.join(".cache", "results"),
+    cache_max_mb: int = 2048,
+    reference_hash: str = "sha1",
+    reference_sync_threads: int = 4,
+    metrics_file: str = None,
+    profile_stages=None,
+    profiler: str = "cprofile",
+    ecapa_backend: str = "eager",
+    ecapa_threads: int = 0,
+    ecapa_interop_threads: int = 0,
+    audio_cache_dir: str = os.path.join(".cache", "audio"),
+    audio_cache_max_mb: int = 4096,
+    output_formats="txt",
+    output_top_k: int = 3,
+    output_name: str = None
 ):
-    # 1) Ensure WAV exists (converted file will be <basename>.wav)
-    print(f"[pipeline] Ensuring WAV for '{input_path}'...")
-    wav_path = ensure_wav(input_path, sr=16000)
+    """
+    Run the full pipeline on one input file.
+
+    `models` is an optional src.models.PipelineModels holding warm model handles
+    (e.g. from the long-lived worker); any missing handle is loaded for this run.
+    Diarization runs concurrently with ASR + alignment unless `concurrent_diarization`
+    is False; the *_threads arguments are the per-stage CPU thread budgets (0 = auto).
+    `asr_batch_size` / `asr_chunk_size` size WhisperX batching (see asr_tuning.py).
+    `matcher_backend` selects exact matching or the persisted IVF speaker index.
+    `speaker_id_mode` is "cluster" (one embedding per diarized speaker, built from up
+    to `cluster_max_seconds` of its audio) or "segment" (embed every segment).
+    Segments embedded individually are first planned (identification.plan_segment_windows):
+    shorter than `embed_min_seconds` are skipped, consecutive same-speaker segments are merged
+    up to `embed_merge_seconds` across pauses of at most `embed_merge_gap_seconds`, and windows
+    are trimmed to `embed_max_seconds`.
+    `cache_dir` enables the stage-level result cache (None disables it).
+    `reference_hash` / `reference_sync_threads` control how changed reference files
+    are detected and re-embedded (see speaker_utils.sync_reference_store).
+    `metrics_file` additionally writes the stage metrics in Prometheus text format;
+    `profile_stages` (e.g. "transcription.asr,embedding" or "all") runs those stages under
+    `profiler` ("cprofile" or "sample"), writing to `<output_dir>/profiles/`.
+    `ecapa_backend` / `ecapa_threads` / `ecapa_interop_threads` select the speaker-embedding
+    backend and its CPU threads when the verifier is loaded here (see ecapa_backends.py).
+    `audio_cache_dir` keeps decoded PCM of inputs that need ffmpeg or resampling, keyed by
+    content (see conversion.py; None decodes every run).
+    `output_formats` adds jsonl / srt / vtt / parquet / arrow files next to the .txt, with
+    timings, words, score and the `output_top_k` best candidates per segment (see writers.py).
+    `output_name` is the `<base>` of every output file (default: the input's file name).
+    Returns a dict with the output path, report path, segment count, per-stage timings
+    and the (start, end, speaker) label of every written segment.
+    """
+    timings = {}
+    configure_profiling(profile_stages, profiler, out_dir=os.path.join(output_dir, "profiles"))
+    cache = ResultCache(cache_dir, max_bytes=cache_max_mb * 1024 * 1024) if cache_dir else None
+    converter = AudioConverter(audio_cache_dir, max_bytes=audio_cache_max_mb * 1024 * 1024) \
+        if audio_cache_dir else None
+
+    # 1) Decode lazily: on a full cache hit the audio is never needed
+    audio = None
+
+    def get_audio():
+        nonlocal audio
+        if audio is None:
+            # decode once into a shared 16 kHz mono float32 buffer (no intermediate WAV)
+            print(f"[pipeline] Decoding '{input_path}' to {SAMPLE_RATE} Hz mono...")
+            with timed("decode", timings) as record:
+                if converter is not None:
+                    audio = converter.load(input_path, sr=SAMPLE_RATE, status=record)
+                else:
+                    audio = load_audio(input_path, sr=SAMPLE_RATE)
+                record["audio_seconds"] = len(audio) / SAMPLE_RATE
+            print(
+                f"[pipeline] Decoded {len(audio) / SAMPLE_RATE:.1f}s of audio "
+                f"({audio.nbytes / (1024 * 1024):.1f} MB buffer)"
+            )
+        return audio
 
     # 2) Output filepath
     os.makedirs(output_dir, exist_ok=True)
-    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    base_name = output_name or os.path.splitext(os.path.basename(input_path))[0]
     output_file = os.path.join(output_dir, f"{base_name}_result.txt")
+    report_file = os.path.join(output_dir, f"{base_name}_report.json")
 
-    # 3) Transcription + diarization + alignment
-    print("[pipeline] Transcribing & diarizing...")
-    result = transcribe_and_assign_speakers(
-        wav_path,
-        model_name=model_name,
-        language=language,
-        device=device,
-        compute_type=compute_type,
-        hf_token=hf_token
-    )
+    # 3) Transcription + diarization + alignment (all read the shared buffer)
+    transcript_key = embeddings_key = None
+    result = None
+    if cache is not None:
+        with timed("cache_lookup", timings):
+            transcript_key = cache.make_key(
+                converter.content_hash(input_path) if converter is not None else cache.audio_key(input_path),
+                "transcript", model_name, language, device, compute_type, asr_chunk_size,
+                _package_version("whisperx")
+            )
+            result = cache.load_transcript(transcript_key)
+    if result is None:
+        print("[pipeline] Transcribing & diarizing...")
+        with timed("transcription", timings):
+            result = transcribe_and_assign_speakers(
+                get_audio(),
+                model_name=model_name,
+                language=language,
+                device=device,
+                compute_type=compute_type,
+                hf_token=hf_token,
+                models=models,
+                concurrent_diarization=concurrent_diarization,
+                asr_threads=asr_threads,
+                asr_batch_size=asr_batch_size,
+                asr_chunk_size=asr_chunk_size,
+                align_threads=align_threads,
+                diarize_threads=diarize_threads,
+                timings=timings
+            )
+        if cache is not None:
+            cache.save_transcript(transcript_key, result)
+    segments = result.get("segments", [])
+
+    # 4) Speaker verification model (only built if references or segments need embedding)
+    if models is not None and models.verifier is not None:
+        verifier = models.verifier
+        embedding_backend = getattr(verifier, "backend", "eager")
+    else:
+        embedding_backend = ecapa_backend or "eager"
+
+        def load_verifier():
+            with timed("load_verifier", timings):
+                return get_model("verifier", device=device, backend=ecapa_backend, threads=ecapa_threads,
+                                 interop_threads=ecapa_interop_threads)
 
-    # 4) Load speaker verification model
-    verifier = load_verification_model(device=device)
+        verifier = LazyModel(load_verifier)
 
-    # 5) Load (or update) reference embeddings with caching
-    ref_embeddings = load_reference_embeddings(ref_config_path, verifier)
+    # 5) Load (or update) reference embeddings with caching, and build the matcher
+    with timed("references", timings):
+        ref_names, ref_matrix = load_reference_matrix(
+            ref_config_path, verifier, hash_algo=reference_hash, threads=reference_sync_threads,
+            timings=timings
+        )
+        matcher = build_matcher(ref_names, ref_matrix, backend=matcher_backend, nprobe=index_nprobe)
 
-    # 6) Load full audio waveform for slicing per segment
-    print("[pipeline] Loading full audio for segment slicing...")
-    full_audio, sr = librosa.load(wav_path, sr=None)
+    # 6) Embed (per diarized cluster or per segment); cached independently of matching
+    embeddings = None
+    if cache is not None:
+        embeddings_key = cache.make_key(
+            transcript_key, "embeddings", speaker_id_mode, cluster_max_seconds, ECAPA_SOURCE,
+            embedding_backend, embed_min_seconds, embed_merge_seconds, embed_max_seconds,
+            embed_merge_gap_seconds
+        )
+        embeddings = cache.load_embeddings(embeddings_key)
+    if embeddings is None:
+        embeddings = compute_speaker_embeddings(
+            verifier, get_audio(), SAMPLE_RATE, segments,
+            mode=speaker_id_mode,
+            cluster_max_seconds=cluster_max_seconds,
+            max_batch_samples=embed_max_batch_samples,
+            max_batch_rows=embed_max_batch_rows,
+            timings=timings,
+            min_seconds=embed_min_seconds,
+            merge_seconds=embed_merge_seconds,
+            max_seconds=embed_max_seconds,
+            merge_gap_seconds=embed_merge_gap_seconds
+        )
+        if cache is not None:
+            cache.save_embeddings(embeddings_key, embeddings)
 
-    # 7) Embed all segments in batch
-    segment_infos, all_embeddings = embed_segments(verifier, full_audio, sr, result.get("segments", []))
+    # 7) Match against the references
+    segment_infos, labels, top_names, top_scores = assign_speakers(
+        embeddings, segments, matcher, threshold=similarity_threshold, top_k=output_top_k, timings=timings
+    )
 
-    # 8) Match embeddings to references and write output
+    # 8) Write output
     print(f"[pipeline] Writing results to '{output_file}' ...")
-    with open(output_file, "w", encoding="utf-8") as out_f:
-        for seg, emb in zip(segment_infos, all_embeddings):
-            speaker = match_speaker(emb, ref_embeddings, threshold=similarity_threshold)
-            text = seg.get("text", "").strip()
-            out_f.write(f"[{speaker}]: {text}\n")
+    with timed("writing", timings):
+        with open_writers(output_formats, output_dir, base_name) as writers:
+            for n, (seg, speaker, names, scores) in enumerate(zip(segment_infos, labels, top_names, top_scores)):
+                writers.write(segment_record(n, seg, speaker, names, scores))
+            # embeddings + segment metadata, so `main.py relabel` can re-match without re-running ASR
+            write_sidecar(sidecar_path(output_file), embeddings, segments, segment_infos, labels, top_scores,
+                          threshold=similarity_threshold, top_k=output_top_k)
+
+    if cache is not None:
+        cache.flush_stats()
+
+    # 9) Metrics: RTF is relative to the whole recording unless a stage reported its own audio
+    if audio is not None:
+        duration = len(audio) / SAMPLE_RATE
+    else:
+        duration = max((seg.get("end", 0.0) for seg in segments), default=0.0)
+    finalize_timings(timings, duration)
+    print_timings(timings)
+    write_report(report_file, timings, audio_seconds=duration, input_path=input_path,
+                 output_file=output_file, segments=len(segment_infos), model_name=model_name,
+                 device=device, compute_type=compute_type, speaker_id_mode=speaker_id_mode)
+    if metrics_file:
+        write_prometheus(metrics_file, timings, job=base_name)
+    print(f"[pipeline] Done. Transcript written to: {output_file} (report: {report_file})")
 
-    print(f"[pipeline] Done. Transcript written to: {output_file}")
+    return {
+        "input_path": input_path,
+        "output_file": output_file,
+        "output_files": writers.paths,
+        "report_file": report_file,
+        "segments": len(segment_infos),
+        "timings": timings,
+        "labels": [(seg.get("start"), seg.get("end"), speaker) for seg, speaker in zip(segment_infos, labels)],
+    }
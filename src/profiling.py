@@ -0,0 +1,306 @@
+"""
+Stage instrumentation: timing, CPU, memory and throughput for every pipeline stage.
+
+Functions:
+  - peak_rss_mb(): process peak resident set size in MB (None if unavailable)
+  - current_rss_mb(): current resident set size in MB (Linux only, None elsewhere)
+  - cuda_peak_mb(device): peak CUDA allocation since the last reset (None on CPU)
+  - timed(stage, timings, audio_seconds): record wall time, CPU time, RSS change, process
+      RSS high-water mark, audio-seconds and real-time factor for a stage into `timings[stage]`
+  - finalize_timings(timings, audio_seconds): fill in audio-seconds / RTF for stages that
+      did not set their own
+  - print_timings(timings): per-stage summary table
+  - write_report(path, timings, **info) / write_prometheus(path, timings, job): per-job JSON
+      report and Prometheus text-format metrics (node_exporter textfile collector)
+  - configure_profiling(stages, mode, out_dir): opt-in cProfile or sampling profiler around
+      the named stages (e.g. "transcription.asr", or "all")
+
+CPU time is process-wide (it includes native thread pools such as CTranslate2 and
+torch), so stages that run concurrently each see the other's CPU time too. The same
+goes for memory: `rss_delta_mb` is the change in current RSS across the stage, and
+`peak_rss_mb` is the process high-water mark (ru_maxrss) when the stage ended, which
+never goes down and so belongs to whichever stage first reached it.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+def peak_rss_mb():
+    """Return the process peak RSS in MB, or None where `resource` is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux
+    if sys.platform == "darwin":
+        peak /= 1024
+    return peak / 1024
+
+
+def current_rss_mb():
+    """Return the current RSS in MB from /proc/self/statm, or None where that is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def cuda_peak_mb(device, reset: bool = False):
+    """Return peak CUDA memory allocated on `device` in MB, or None when not on CUDA."""
+    try:
+        import torch
+    except ImportError:
+        return None
+    if not str(device).startswith("cuda") or not torch.cuda.is_available():
+        return None
+    peak = torch.cuda.max_memory_allocated(device) / (1024 * 1024)
+    if reset:
+        torch.cuda.reset_peak_memory_stats(device)
+    return peak
+
+
+def format_mb(value) -> str:
+    """Render an optional MB value for log lines."""
+    return "n/a" if value is None else f"{value:.1f} MB"
+
+
+# ----------------------------
+# Opt-in profilers
+# ----------------------------
+_PROFILING = {"stages": set(), "mode": "cprofile", "out_dir": os.path.join(".cache", "profiles")}
+_active = threading.local()   # a profiled stage already covers the stages nested inside it
+PROFILER_MODES = ("cprofile", "sample")
+
+
+def configure_profiling(stages=None, mode: str = "cprofile", out_dir: str = None):
+    """
+    Profile the given stages (iterable or comma-separated string; "all" = every stage)
+    with cProfile (.prof files, readable with pstats/snakeviz) or the built-in sampling
+    profiler (.folded stacks for flamegraph.pl / speedscope). Empty disables profiling.
+    """
+    if isinstance(stages, str):
+        stages = [s.strip() for s in stages.split(",")]
+    _PROFILING["stages"] = {s for s in (stages or ()) if s}
+    if mode not in PROFILER_MODES:
+        print(f"[profiling] Unknown profiler '{mode}', using cprofile")
+        mode = "cprofile"
+    _PROFILING["mode"] = mode
+    if out_dir:
+        _PROFILING["out_dir"] = out_dir
+
+
+def _profile_path(stage: str, ext: str) -> str:
+    os.makedirs(_PROFILING["out_dir"], exist_ok=True)
+    return os.path.join(_PROFILING["out_dir"], f"{stage}-{time.strftime('%Y%m%d-%H%M%S')}.{ext}")
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds into folded-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def _profiled(stage: str):
+    """Run the body under the configured profiler if `stage` was selected."""
+    selected = _PROFILING["stages"]
+    if not selected or ("all" not in selected and stage not in selected) or getattr(_active, "stage", None):
+        yield
+        return
+    _active.stage = stage
+    try:
+        with _run_profiler(stage):
+            yield
+    finally:
+        _active.stage = None
+
+
+@contextmanager
+def _run_profiler(stage: str):
+    if _PROFILING["mode"] == "sample":
+        sampler = StackSampler(threading.get_ident()).start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            path = _profile_path(stage, "folded")
+            sampler.write(path)
+            print(f"[profiling] {stage}: {sum(sampler.stacks.values())} samples -> {path}")
+        return
+
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # only one cProfile can be active at a time (e.g. overlapping stages on Python 3.12+)
+        print(f"[profiling] Not profiling {stage}: {e}")
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = _profile_path(stage, "prof")
+        profiler.dump_stats(path)
+        print(f"[profiling] {stage}: cProfile stats -> {path}")
+
+
+# ----------------------------
+# Stage records
+# ----------------------------
+@contextmanager
+def timed(stage: str, timings: dict, audio_seconds: float = None):
+    """
+    Record a pipeline stage into `timings[stage]`: wall seconds, process CPU seconds,
+    RSS change, process RSS high-water mark, audio-seconds processed and real-time
+    factor (wall / audio seconds).
+    Yields the record, so a stage that only learns its audio length while running can
+    set record["audio_seconds"] itself.
+    """
+    record = {"audio_seconds": audio_seconds}
+    start, cpu_start = time.perf_counter(), time.process_time()
+    rss_start = current_rss_mb()
+    try:
+        with _profiled(stage):
+            yield record
+    finally:
+        rss_end = current_rss_mb()
+        record.update(
+            seconds=time.perf_counter() - start,
+            cpu_seconds=time.process_time() - cpu_start,
+            rss_delta_mb=None if rss_start is None or rss_end is None else rss_end - rss_start,
+            peak_rss_mb=peak_rss_mb(),
+        )
+        record["rtf"] = _rtf(record)
+        timings[stage] = record
+
+
+def _rtf(record):
+    audio = record.get("audio_seconds")
+    return record["seconds"] / audio if audio else None
+
+
+def finalize_timings(timings: dict, audio_seconds: float):
+    """Stages that did not report their own audio length processed the whole recording."""
+    for record in timings.values():
+        if record.get("audio_seconds") is None:
+            record["audio_seconds"] = audio_seconds
+        record["rtf"] = _rtf(record)
+    return timings
+
+
+def _top_level(timings: dict):
+    return [stage for stage in timings if "." not in stage]
+
+
+def print_timings(timings: dict, prefix: str = "[pipeline]"):
+    """
+    Print a per-stage summary of the records collected by `timed`.
+    Dotted names (e.g. "transcription.asr") are sub-stages: they are listed under
+    their parent and not added to the total, since they may overlap in time.
+    """
+    top_level = _top_level(timings)
+    total = sum(timings[stage]["seconds"] for stage in top_level)
+    print(f"{prefix} Stage timings (total {total:.2f}s):")
+    for stage in top_level:
+        rows = [(stage, stage)] + [
+            ("  " + sub.split(".", 1)[1], sub) for sub in timings if sub.startswith(stage + ".")
+        ]
+        for label, key in rows:
+            t = timings[key]
+            cpu = f"   cpu {t['cpu_seconds']:8.2f}s" if "cpu_seconds" in t else ""
+            rtf = f"   RTF {t['rtf']:.3f}" if t.get("rtf") is not None else ""
+            delta = t.get("rss_delta_mb")
+            rss = f"   RSS {'n/a' if delta is None else f'{delta:+.1f} MB'}"
+            print(f"{prefix}   {label:<18} {t['seconds']:8.2f}s{cpu}{rss}   "
+                  f"RSS high-water {format_mb(t['peak_rss_mb'])}{rtf}")
+
+
+def summarize_timings(timings: dict, audio_seconds: float = None) -> dict:
+    """Whole-job totals over the top-level stages."""
+    top_level = _top_level(timings)
+    wall = sum(timings[s]["seconds"] for s in top_level)
+    peaks = [t["peak_rss_mb"] for t in timings.values() if t.get("peak_rss_mb") is not None]
+    return {
+        "wall_seconds": wall,
+        "cpu_seconds": sum(timings[s].get("cpu_seconds", 0.0) for s in top_level),
+        "peak_rss_mb": max(peaks) if peaks else None,
+        "audio_seconds": audio_seconds,
+        "rtf": wall / audio_seconds if audio_seconds else None,
+    }
+
+
+def write_report(path: str, timings: dict, audio_seconds: float = None, **info):
+    """Write the per-job JSON report: job info, totals and every stage record."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    report = dict(info, created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  totals=summarize_timings(timings, audio_seconds), stages=timings)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+PROMETHEUS_METRICS = (
+    ("seconds", "speaker_id_stage_seconds", "Wall-clock seconds spent in a pipeline stage."),
+    ("cpu_seconds", "speaker_id_stage_cpu_seconds", "Process CPU seconds during a pipeline stage."),
+    ("rss_delta_mb", "speaker_id_stage_rss_delta_megabytes", "Change in process RSS across a stage."),
+    ("peak_rss_mb", "speaker_id_stage_peak_rss_megabytes",
+     "Process RSS high-water mark since start (ru_maxrss) when a stage ended; not per stage."),
+    ("audio_seconds", "speaker_id_stage_audio_seconds", "Seconds of audio processed by a stage."),
+    ("rtf", "speaker_id_stage_rtf", "Real-time factor (wall seconds per audio second) of a stage."),
+)
+
+
+def write_prometheus(path: str, timings: dict, job: str = ""):
+    """Atomically write the stage records in Prometheus text exposition format."""
+    lines = []
+    for key, metric, help_text in PROMETHEUS_METRICS:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for stage, record in timings.items():
+            if record.get(key) is not None:
+                job_label = job.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{metric}{{job="{job_label}",stage="{stage}"}} {record[key]:.6g}')
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
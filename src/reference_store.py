@@ -0,0 +1,217 @@
+"""
+Compact, memory-mappable reference embedding store.
+
+Replaces the pickled `{name: {hash, embedding}}` dict in refs/embeddings.npy with:
+  - refs/embeddings.f32   contiguous (rows, D) matrix of unit-normalised embeddings,
+                          opened read-only with np.memmap (float32 or float16);
+                          refs/embeddings.<n>.f32 after the n-th compaction
+  - refs/embeddings.json  small index: name -> {row, hash, mtime, ...}, dim, dtype,
+                          total rows, tombstoned rows and the matrix file in use
+
+Adding a speaker appends one row in place; changing or deleting one tombstones its
+old row. Once tombstones exceed a quarter of the file it is compacted. Load time
+and memory stay near-constant as the roster grows (only the JSON index is parsed),
+and matchers can use `matrix()` directly: for a compacted store it is the memmap
+itself, with no copy.
+
+Compaction writes a new matrix file and only then replaces the index that points to
+it, so a crash at any point leaves a matching index / matrix pair on disk.
+"""
+
+import glob
+import json
+import os
+
+import numpy as np
+
+REFS_DIR = "refs"
+MATRIX_FILE = "embeddings.f32"
+INDEX_FILE = "embeddings.json"
+
+
+class ReferenceStore:
+    def __init__(self, directory: str = REFS_DIR, dtype: str = "float32", compact_ratio: float = 0.25):
+        self.directory = directory
+        self.matrix_path = os.path.join(directory, MATRIX_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.compact_ratio = compact_ratio
+        self.entries = {}      # name -> metadata dict (includes "row")
+        self.dim = None
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.deleted = set()
+        self.generation = 0
+        self._mm = None
+        self._load_index()
+
+    # ----------------------------
+    # index I/O
+    # ----------------------------
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self.entries = index["entries"]
+            self.dim = index["dim"]
+            self.dtype = np.dtype(index["dtype"])
+            self.rows = index["rows"]
+            self.deleted = set(index["deleted"])
+            self.generation = index.get("generation", 0)
+            self.matrix_path = os.path.join(self.directory, index.get("matrix", MATRIX_FILE))
+            expected = self.rows * (self.dim or 0) * self.dtype.itemsize
+            if os.path.getsize(self.matrix_path) < expected:
+                raise ValueError("matrix file is shorter than the index says")
+        except Exception as e:
+            print(f"[reference_store] Store invalid ({e}), resetting...")
+            self.entries, self.dim, self.rows, self.deleted = {}, None, 0, set()
+            self.generation, self.matrix_path = 0, os.path.join(self.directory, MATRIX_FILE)
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "dtype": self.dtype.name,
+                "rows": self.rows,
+                "deleted": sorted(self.deleted),
+                "generation": self.generation,
+                "matrix": os.path.basename(self.matrix_path),
+                "entries": self.entries,
+            }, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    # ----------------------------
+    # reads
+    # ----------------------------
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def names(self) -> list:
+        """Live names in row order."""
+        return sorted(self.entries, key=lambda n: self.entries[n]["row"])
+
+    def get(self, name: str) -> dict:
+        return self.entries.get(name)
+
+    def _memmap(self):
+        if self._mm is None and self.rows:
+            self._mm = np.memmap(self.matrix_path, dtype=self.dtype, mode="r", shape=(self.rows, self.dim))
+        return self._mm
+
+    def embedding(self, name: str) -> np.ndarray:
+        """Read-only row view for one speaker."""
+        return self._memmap()[self.entries[name]["row"]]
+
+    def matrix(self, names=None):
+        """
+        Return (names, matrix) for `names` (default: all live names, row order).
+        Zero-copy when the requested rows are exactly the file's rows in order;
+        otherwise the rows are gathered into a new array.
+        """
+        names = self.names() if names is None else [n for n in names if n in self.entries]
+        if not names:
+            return [], np.zeros((0, self.dim or 0), dtype=np.float32)
+        rows = [self.entries[n]["row"] for n in names]
+        mm = self._memmap()
+        if rows == list(range(self.rows)):
+            return names, mm
+        return names, mm[rows]
+
+    def as_dict(self) -> dict:
+        """{name: embedding row view} for callers that expect the old dict shape."""
+        return {name: self.embedding(name) for name in self.names()}
+
+    # ----------------------------
+    # writes
+    # ----------------------------
+    def put(self, name: str, embedding, **meta):
+        """Append (or replace) a speaker's embedding; the previous row, if any, is tombstoned."""
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        vec = vec / (np.linalg.norm(vec) + 1e-9)
+        if self.dim is None:
+            self.dim = int(vec.shape[0])
+        elif vec.shape[0] != self.dim:
+            raise ValueError(f"embedding for {name} has dim {vec.shape[0]}, store has {self.dim}")
+        if name in self.entries:
+            self.deleted.add(self.entries[name]["row"])
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._mm = None
+        end = self.rows * self.dim * self.dtype.itemsize
+        if os.path.exists(self.matrix_path) and os.path.getsize(self.matrix_path) > end:
+            # drop bytes left behind by an interrupted append
+            os.truncate(self.matrix_path, end)
+        with open(self.matrix_path, "ab") as f:
+            f.write(vec.astype(self.dtype).tobytes())
+        self.entries[name] = dict(meta, row=self.rows)
+        self.rows += 1
+
+    def update_meta(self, name: str, **meta):
+        """Update a speaker's metadata (e.g. file stat) without touching its embedding."""
+        self.entries[name].update(meta)
+
+    def delete(self, name: str):
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self.deleted.add(entry["row"])
+
+    def compact(self):
+        """
+        Rewrite the matrix without tombstoned rows (keeping row order) into the next
+        generation's file, switch the index to it, then delete the old file.
+        """
+        names = self.names()
+        generation = self.generation + 1
+        stem, ext = os.path.splitext(MATRIX_FILE)
+        new_path = os.path.join(self.directory, f"{stem}.{generation}{ext}")
+        tmp = new_path + ".tmp"
+        rows = {}
+        if names:
+            mm = self._memmap()
+            out = np.memmap(tmp, dtype=self.dtype, mode="w+", shape=(len(names), self.dim))
+            for new_row, name in enumerate(names):
+                out[new_row] = mm[self.entries[name]["row"]]
+                rows[name] = new_row
+            out.flush()
+            # release both mappings before touching the files (required on Windows)
+            del out, mm
+        else:
+            open(tmp, "wb").close()
+        self._mm = None
+        os.replace(tmp, new_path)
+
+        old_path, old_rows = self.matrix_path, self.rows
+        for name, row in rows.items():
+            self.entries[name]["row"] = row
+        self.matrix_path, self.generation = new_path, generation
+        self.rows, self.deleted = len(names), set()
+        # the index switch is the commit point: until it lands, the old pair is intact
+        self._save_index()
+        # the previous generation, and any left by a compaction that crashed before its switch
+        for path in glob.glob(os.path.join(self.directory, f"{stem}*{ext}")):
+            if path != new_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        print(f"[reference_store] Compacted store: {old_rows} -> {len(names)} rows")
+
+    def commit(self):
+        """Compact if tombstones exceed the threshold, then persist the index."""
+        if self.deleted and len(self.deleted) > self.compact_ratio * max(self.rows, 1):
+            self.compact()
+        else:
+            self._save_index()
+
+    def import_legacy(self, legacy_cache: dict):
+        """Import entries from the old pickled {name: {hash, embedding}} cache."""
+        for name, entry in legacy_cache.items():
+            if isinstance(entry, dict) and "embedding" in entry:
+                self.put(name, entry["embedding"], hash=entry.get("hash"))
+        print(f"[reference_store] Imported {len(legacy_cache)} speakers from legacy cache")
@@ -0,0 +1,242 @@
+"""
+Incremental re-labelling of past transcripts.
+
+Every run_pipeline call leaves a compact sidecar next to its transcript,
+`<output_dir>/<base>_segments.npz`, holding what matching needs:
+
+  - embeddings (Q, D) float32: the query rows that were matched (one per diarized
+    cluster, plus one per individually embedded segment)
+  - labels (Q,) / scores (Q,): the speaker and top-1 cosine each row was given
+  - rows (N,) int32: the query row that labels each transcript line
+  - start / end (N,) float32, the line texts and their aligned words (UTF-8 blobs +
+    offsets) and diarized speakers
+  - threshold / top_k: the similarity threshold the labels were made with and how
+    many candidates the outputs list
+
+When the roster changes (someone new enrolled), `relabel_outputs` loads every
+sidecar, stacks all query rows into one matrix and matches it against the updated
+references in a single vectorized pass, then regenerates every output file
+(`<base>_result.txt` and whichever of .jsonl / .srt / .vtt / .parquet / .arrow exist)
+of the transcripts whose labels actually changed. No audio is decoded and no model
+runs, unless the reference store itself needs re-embedding.
+
+    python main.py relabel [--outputs DIR] [--threshold 0.4] [--dry-run]
+"""
+
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from .writers import OUTPUT_FORMATS, open_writers, segment_record
+
+SIDECAR_SUFFIX = "_segments.npz"
+RESULT_SUFFIX = "_result.txt"
+
+
+def sidecar_path(output_file: str) -> str:
+    """`outputs/<base>_result.txt` -> `outputs/<base>_segments.npz`."""
+    base = output_file[:-len(RESULT_SUFFIX)] if output_file.endswith(RESULT_SUFFIX) \
+        else os.path.splitext(output_file)[0]
+    return base + SIDECAR_SUFFIX
+
+
+def result_path(sidecar: str) -> str:
+    return sidecar[:-len(SIDECAR_SUFFIX)] + RESULT_SUFFIX
+
+
+def _write_atomic(path: str, write):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def write_sidecar(path: str, embeddings: dict, segments, segment_infos, labels, top_scores,
+                  threshold: float, top_k: int = 1):
+    """
+    Save the sidecar for one run. `embeddings` is compute_speaker_embeddings' output and
+    (segment_infos, labels, top_scores) come from assign_speakers for `segments`;
+    `top_k` is the number of candidates the run's outputs list.
+    """
+    cluster_embs = np.asarray(embeddings["cluster_embeddings"], dtype=np.float32)
+    segment_embs = np.asarray(embeddings["segment_embeddings"], dtype=np.float32)
+    n_clusters = len(embeddings["cluster_ids"])
+    cluster_row = {cid: i for i, cid in enumerate(embeddings["cluster_ids"])}
+    segment_row = {int(idx): n_clusters + i for i, idx in enumerate(embeddings["segment_indices"])}
+    parts = [m.reshape(len(m), -1) for m in (cluster_embs, segment_embs) if len(m)]
+    matrix = np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+    # same precedence as assign_speakers: a segment's own embedding, else its cluster's
+    position = {id(seg): i for i, seg in enumerate(segments)}
+    rows = []
+    for seg in segment_infos:
+        row = segment_row.get(position[id(seg)])
+        rows.append(row if row is not None else cluster_row[seg.get("speaker")])
+
+    row_labels = [""] * len(matrix)
+    row_scores = np.full(len(matrix), np.nan, dtype=np.float32)
+    for row, label, scores in zip(rows, labels, top_scores):
+        row_labels[row] = label
+        if len(scores):
+            row_scores[row] = scores[0]
+
+    _save_sidecar(path, {
+        "embeddings": matrix,
+        "labels": row_labels,
+        "scores": row_scores,
+        "rows": np.asarray(rows, dtype=np.int32),
+        "start": np.asarray([seg.get("start", np.nan) for seg in segment_infos], dtype=np.float32),
+        "end": np.asarray([seg.get("end", np.nan) for seg in segment_infos], dtype=np.float32),
+        "texts": [seg.get("text", "").strip() for seg in segment_infos],
+        "diarized": [seg.get("speaker") or "" for seg in segment_infos],
+        "words": [json.dumps(segment_record(0, seg, "")["words"], ensure_ascii=False) for seg in segment_infos],
+        "threshold": threshold,
+        "top_k": top_k,
+    })
+
+
+def _pack(strings) -> dict:
+    """Strings as one UTF-8 blob + offsets (keeps the .npz pickle-free)."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(s) for s in encoded])
+    return {"bytes": np.frombuffer(b"".join(encoded), dtype=np.uint8), "offsets": offsets}
+
+
+def _unpack(blob, offsets) -> list:
+    blob = blob.tobytes()
+    return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+PACKED_FIELDS = ("texts", "words")
+
+
+def _save_sidecar(path: str, sidecar: dict):
+    """Write a sidecar dict (as returned by load_sidecar)."""
+    packed = {}
+    for field in PACKED_FIELDS:
+        if field in sidecar:
+            blob = _pack(sidecar[field])
+            # "text_bytes" / "text_offsets" predate the words field
+            prefix = "text" if field == "texts" else field
+            packed[f"{prefix}_bytes"], packed[f"{prefix}_offsets"] = blob["bytes"], blob["offsets"]
+    arrays = {k: v for k, v in sidecar.items()
+              if k not in PACKED_FIELDS + ("labels", "diarized", "threshold", "top_k")}
+    if "diarized" in sidecar:
+        arrays["diarized"] = np.asarray(sidecar["diarized"], dtype=str)
+    _write_atomic(path, lambda f: np.savez_compressed(
+        f,
+        labels=np.asarray(sidecar["labels"], dtype=str),
+        threshold=np.float32(sidecar["threshold"]),
+        top_k=np.int32(sidecar.get("top_k", 1)),
+        **packed,
+        **arrays
+    ))
+
+
+def load_sidecar(path: str) -> dict:
+    with np.load(path, allow_pickle=False) as data:
+        sidecar = {key: data[key] for key in data.files}
+    sidecar["texts"] = _unpack(sidecar.pop("text_bytes"), sidecar.pop("text_offsets"))
+    sidecar["labels"] = sidecar["labels"].tolist()
+    sidecar["top_k"] = int(sidecar.get("top_k", 1))
+    # sidecars written before these fields existed regenerate outputs without them
+    if "words_bytes" in sidecar:
+        sidecar["words"] = _unpack(sidecar.pop("words_bytes"), sidecar.pop("words_offsets"))
+    if "diarized" in sidecar:
+        sidecar["diarized"] = sidecar["diarized"].tolist()
+    return sidecar
+
+
+def output_formats_of(sidecar: str) -> list:
+    """Formats of the outputs that exist next to `sidecar` (txt always included)."""
+    base = sidecar[:-len(SIDECAR_SUFFIX)]
+    return ["txt"] + [fmt for fmt in OUTPUT_FORMATS if fmt != "txt" and os.path.exists(f"{base}_result.{fmt}")]
+
+
+def rewrite_outputs(sidecar_file: str, sidecar: dict, labels, top_names, top_scores) -> dict:
+    """
+    Regenerate every output of one transcript from its sidecar with new row labels and
+    top-k candidates (per query row). Files are written to a temporary directory and
+    moved into place one by one. Returns {format: path}.
+    """
+    output_dir = os.path.dirname(sidecar_file) or "."
+    base_name = os.path.basename(sidecar_file)[:-len(SIDECAR_SUFFIX)]
+    n = len(sidecar["texts"])
+    diarized = sidecar.get("diarized") or [""] * n
+    words = sidecar.get("words") or ["[]"] * n
+    k = sidecar["top_k"]
+    tmp_dir = tempfile.mkdtemp(prefix=".relabel-", dir=output_dir)
+    try:
+        with open_writers(output_formats_of(sidecar_file), tmp_dir, base_name) as writers:
+            for i, row in enumerate(sidecar["rows"]):
+                seg = {"start": sidecar["start"][i], "end": sidecar["end"][i], "text": sidecar["texts"][i],
+                       "speaker": diarized[i] or None, "words": json.loads(words[i])}
+                writers.write(segment_record(i, seg, labels[row], top_names[row][:k], top_scores[row][:k]))
+        paths = {}
+        for fmt, tmp_path in writers.paths.items():
+            paths[fmt] = os.path.join(output_dir, os.path.basename(tmp_path))
+            os.replace(tmp_path, paths[fmt])
+        return paths
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def relabel_outputs(output_dir: str, matcher, threshold: float = 0.37, dry_run: bool = False) -> dict:
+    """
+    Re-match every sidecar under `output_dir` against `matcher` in one pass and regenerate
+    every output (and the sidecar) of the transcripts whose labels changed. Returns a summary
+    dict with the list of changed transcripts and how many lines changed in each.
+    """
+    start = time.perf_counter()
+    paths = sorted(glob.glob(os.path.join(output_dir, "*" + SIDECAR_SUFFIX)))
+    sidecars = []
+    for path in paths:
+        try:
+            sidecars.append((path, load_sidecar(path)))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[relabel] Skipping unreadable sidecar '{path}': {e}")
+    loaded = time.perf_counter()
+
+    with_rows = [(path, s) for path, s in sidecars if len(s["embeddings"])]
+    new_labels, new_names, new_top = [], [], np.zeros((0, 0), dtype=np.float32)
+    if with_rows:
+        matrix = np.concatenate([s["embeddings"].reshape(len(s["embeddings"]), -1) for _, s in with_rows])
+        top_k = max(s["top_k"] for _, s in with_rows)
+        new_labels, new_names, new_top = matcher.match(matrix, threshold=threshold, top_k=top_k)
+    matched = time.perf_counter()
+
+    changed = {}
+    lo = 0
+    for path, sidecar in with_rows:
+        hi = lo + len(sidecar["embeddings"])
+        labels, names, top = new_labels[lo:hi], new_names[lo:hi], new_top[lo:hi]
+        scores = top[:, 0] if top.shape[1] else np.full(hi - lo, np.nan, dtype=np.float32)
+        lo = hi
+        old = [sidecar["labels"][r] for r in sidecar["rows"]]
+        new = [labels[r] for r in sidecar["rows"]]
+        lines = sum(1 for a, b in zip(old, new) if a != b)
+        if not lines:
+            continue
+        transcript = result_path(path)
+        changed[transcript] = lines
+        if dry_run:
+            continue
+        rewrite_outputs(path, sidecar, labels, names, top)
+        _save_sidecar(path, dict(sidecar, labels=labels, scores=scores, threshold=threshold))
+
+    done = time.perf_counter()
+    rows = sum(len(s["embeddings"]) for _, s in with_rows)
+    verb = "would rewrite" if dry_run else "rewrote"
+    print(f"[relabel] {len(sidecars)} transcripts, {rows} query rows: loaded in {loaded - start:.2f}s, "
+          f"matched in {matched - loaded:.2f}s, {verb} {len(changed)} in {done - matched:.2f}s")
+    for transcript, lines in list(changed.items())[:20]:
+        print(f"[relabel]   {transcript}: {lines} lines changed")
+    if len(changed) > 20:
+        print(f"[relabel]   ... and {len(changed) - 20} more")
+    return {"transcripts": len(sidecars), "rows": rows, "changed": changed, "seconds": done - start}
@@ -0,0 +1,183 @@
+"""
+Content-addressed, stage-level result cache.
+
+Entries are keyed by the SHA1 of the input audio bytes plus the parameters that
+affect each stage, so re-running a recording with only a new SIMILARITY_THRESHOLD
+or an updated references.json skips ASR, alignment, diarization and ECAPA and
+only re-runs matching.
+
+Stages:
+  - "transcript": aligned + diarized whisperx result (JSON)
+      key: audio hash, whisper model, language, device, compute type
+  - "embeddings": output of identification.compute_speaker_embeddings (.npz)
+      key: transcript key, identification mode, cluster seconds, ECAPA model + backend,
+           segment planning limits
+
+The cache directory is capped at `max_bytes`; least-recently-used entries (by
+mtime, refreshed on every hit) are evicted first. Hit/miss counts are kept per
+stage for the current process and cumulatively in `<cache_dir>/stats.json`.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+STATS_FILE = "stats.json"
+
+
+def _to_builtin(value):
+    """json.dump fallback for numpy scalars / arrays inside whisperx results."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str = os.path.join(".cache", "results"), max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ----------------------------
+    # keys
+    # ----------------------------
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Stable key for an ordered list of JSON-serialisable parts."""
+        return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def audio_key(path: str) -> str:
+        """SHA1 of the audio file contents (the recording's identity, independent of its name)."""
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    # ----------------------------
+    # stats
+    # ----------------------------
+    def _count(self, stage: str, hit: bool):
+        entry = self.stats.setdefault(stage, {"hits": 0, "misses": 0})
+        entry["hits" if hit else "misses"] += 1
+
+    def _lookup(self, stage: str, path: str) -> bool:
+        hit = os.path.exists(path)
+        self._count(stage, hit)
+        if hit:
+            os.utime(path)  # refresh LRU position
+        print(f"[result_cache] {stage}: {'hit' if hit else 'miss'}")
+        return hit
+
+    def flush_stats(self):
+        """Merge this process's counters into the cumulative stats file and print them."""
+        path = os.path.join(self.cache_dir, STATS_FILE)
+        totals = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    totals = json.load(f)
+            except (OSError, ValueError):
+                totals = {}
+        for stage, counts in self.stats.items():
+            entry = totals.setdefault(stage, {"hits": 0, "misses": 0})
+            entry["hits"] += counts["hits"]
+            entry["misses"] += counts["misses"]
+        self._write_atomic(path, lambda f: f.write(json.dumps(totals, indent=2).encode("utf-8")))
+        for stage, counts in totals.items():
+            lookups = counts["hits"] + counts["misses"]
+            rate = counts["hits"] / lookups if lookups else 0.0
+            print(f"[result_cache] {stage}: {counts['hits']} hits / {counts['misses']} misses "
+                  f"({rate:.0%} hit rate, all runs)")
+        self.stats = {}
+
+    # ----------------------------
+    # I/O
+    # ----------------------------
+    @staticmethod
+    def _write_atomic(path: str, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+
+    def load_transcript(self, key: str):
+        path = self._path(key, ".transcript.json")
+        if not self._lookup("transcript", path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_transcript(self, key: str, result: dict):
+        payload = json.dumps(result, default=_to_builtin).encode("utf-8")
+        self._write_atomic(self._path(key, ".transcript.json"), lambda f: f.write(payload))
+        self.evict()
+
+    def load_embeddings(self, key: str):
+        path = self._path(key, ".embeddings.npz")
+        if not self._lookup("embeddings", path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return {
+                "mode": str(data["mode"]),
+                "cluster_ids": data["cluster_ids"].tolist(),
+                "cluster_embeddings": data["cluster_embeddings"],
+                "segment_indices": data["segment_indices"].tolist(),
+                "segment_embeddings": data["segment_embeddings"],
+            }
+
+    def save_embeddings(self, key: str, embeddings: dict):
+        self._write_atomic(self._path(key, ".embeddings.npz"), lambda f: np.savez(
+            f,
+            mode=np.asarray(embeddings["mode"]),
+            cluster_ids=np.asarray(embeddings["cluster_ids"], dtype=str),
+            cluster_embeddings=np.asarray(embeddings["cluster_embeddings"]),
+            segment_indices=np.asarray(embeddings["segment_indices"], dtype=np.int64),
+            segment_embeddings=np.asarray(embeddings["segment_embeddings"]),
+        ))
+        self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in max_bytes."""
+        evict_lru(self.cache_dir, self.max_bytes, skip=(STATS_FILE,), label="result_cache")
+
+
+def evict_lru(cache_dir: str, max_bytes: int, skip=(), label: str = "result_cache"):
+    """Delete the least-recently-used files (by mtime) under `cache_dir` until it fits in `max_bytes`."""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if name in skip or name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    if total <= max_bytes:
+        return
+    entries.sort()
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    print(f"[{label}] Evicted {removed} entries (cache now {total / (1024 * 1024):.1f} MB)")
@@ -0,0 +1,515 @@
+"""
+Local HTTP job service: accept recordings over HTTP, run them on a pool of warm
+pipeline worker processes, and let clients poll for the results.
+
+Endpoints (JSON in and out unless noted):
+  POST /jobs                         {"input_path": "meeting.m4a", "options": {...}, "id": optional}
+  POST /jobs?filename=meeting.m4a    raw audio body, saved to upload_dir until the job finishes
+                                     -> 202 {"id", "status": "queued", "queue_depth"}
+                                     (409 if a job with that id exists)
+  GET  /jobs/<id>                    status, queue wait, run time
+  GET  /jobs/<id>/result[?wait=S]    200 with the transcript and output files once finished
+                                     (500 if the job failed), 202 while queued / running;
+                                     `wait` holds the request up to S seconds for the job to end
+  GET  /metrics[?format=prometheus]  queue depth, running / completed / failed / rejected jobs and
+                                     queue-wait / run / end-to-end latency percentiles
+  GET  /health                       200 once every worker has loaded its models, 503 before
+
+Backpressure: at most `max_queue` jobs wait for a worker. Further submissions get a
+429 with a Retry-After estimated from recent run times, instead of the service
+buffering unbounded work (uploads are refused before their body is read).
+
+Each of the `workers` processes loads the models once (batch._init_worker) and runs
+one job at a time, so at most `workers` jobs run concurrently. Outputs are named after
+the job id (`<output_dir>/<id>_result.txt`, ...), so jobs never overwrite each other.
+Clients may only override the options in SERVICE_JOB_OPTIONS, which change the result
+(threshold, identification mode, matcher, top-k, output formats) and are type- and
+range-checked at submit time (400 otherwise). Paths and resource budgets (threads,
+ECAPA batch sizes) stay as the pool was started with.
+
+    python main.py serve --workers 2 --max-queue 16 --port 8770
+    curl -X POST localhost:8770/jobs -d '{"input_path": "meeting.m4a"}'
+    curl --data-binary @meeting.m4a 'localhost:8770/jobs?filename=meeting.m4a'
+    curl 'localhost:8770/jobs/<id>/result?wait=60'
+"""
+
+import asyncio
+import collections
+import json
+import math
+import multiprocessing as mp
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from .batch import AUDIO_EXTENSIONS, _init_worker, _run_one, _worker_pid
+from .writers import OUTPUT_FORMATS
+
+UPLOAD_DIR = os.path.join(".cache", "uploads")
+MAX_HEADER_BYTES = 64 * 1024
+MAX_JSON_BYTES = 1024 * 1024
+READ_CHUNK = 1 << 16
+LATENCY_WINDOW = 1000   # finished jobs kept for latency percentiles
+MAX_WAIT_SECONDS = 300
+# job ids name the output files, so they must be safe file names
+JOB_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+STATUS_TEXT = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+# ----------------------------
+# per-job options
+# ----------------------------
+def _number(low: float, high: float, integer: bool = False):
+    def check(value):
+        kinds = (int,) if integer else (int, float)
+        if isinstance(value, bool) or not isinstance(value, kinds) or not low <= value <= high:
+            raise ValueError(f"must be {'an integer' if integer else 'a number'} in [{low}, {high}]")
+        return value
+    return check
+
+
+def _choice(*choices):
+    def check(value):
+        if value not in choices:
+            raise ValueError(f"must be one of {', '.join(choices)}")
+        return value
+    return check
+
+
+def _formats(value):
+    formats = value.split(",") if isinstance(value, str) else value
+    if not isinstance(formats, list) or not all(isinstance(f, str) and f.strip() in OUTPUT_FORMATS
+                                                for f in formats):
+        raise ValueError(f"must be a list of {', '.join(OUTPUT_FORMATS)}")
+    return [f.strip() for f in formats]
+
+
+# options an HTTP client may set per job, with their checks; everything else (paths,
+# thread and batch budgets) is fixed by the server
+SERVICE_JOB_OPTIONS = {
+    "similarity_threshold": _number(-1.0, 1.0),
+    "speaker_id_mode": _choice("cluster", "segment"),
+    "cluster_max_seconds": _number(1.0, 120.0),
+    "matcher_backend": _choice("exact", "ivf"),
+    "output_top_k": _number(1, 10, integer=True),
+    "output_formats": _formats,
+}
+
+
+class JobService:
+    """Bounded job queue in front of a pool of warm worker processes."""
+
+    def __init__(self, options: dict, workers: int = 2, max_queue: int = 16, upload_dir: str = UPLOAD_DIR,
+                 max_upload_mb: int = 2048, max_history: int = 10000, keep_uploads: bool = False):
+        self.options = dict(options)
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.upload_dir = upload_dir
+        self.max_upload_bytes = max_upload_mb * 1024 * 1024
+        self.max_history = max_history
+        self.keep_uploads = keep_uploads
+        self.jobs = collections.OrderedDict()
+        self.counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)   # (finished, queue_wait, run, total)
+        self.running = 0
+        self.workers_ready = 0
+        self.started = time.time()
+        self.queue = None
+        self.executor = None
+        self._tasks = []
+
+    # ----------------------------
+    # worker pool
+    # ----------------------------
+    def _new_executor(self) -> ProcessPoolExecutor:
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # spawn keeps torch / CUDA state out of the children
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(self.options, threads))
+
+    async def start(self):
+        """Create the queue and worker pool; models load in the background while requests are accepted."""
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.executor = self._new_executor()
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._warm_up(self.executor)))
+
+    async def _warm_up(self, executor):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        print(f"[service] Starting {self.workers} workers (loading models)...")
+        # a worker that finished loading may pick up several pings, so ping until every pid has answered
+        seen = set()
+        while len(seen) < self.workers and executor is self.executor:
+            try:
+                pids = await asyncio.gather(*[loop.run_in_executor(executor, _worker_pid, 0.2)
+                                              for _ in range(self.workers)])
+            except BrokenProcessPool:
+                print("[service] A worker failed to start")
+                return
+            seen.update(pids)
+            self.workers_ready = len(seen)
+        print(f"[service] {self.workers_ready}/{self.workers} workers ready in {time.perf_counter() - start:.1f}s")
+
+    def _restart_workers(self, broken):
+        if broken is not self.executor:
+            return   # another job already replaced the pool
+        print("[service] Worker pool crashed; restarting workers")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.workers_ready = 0
+        self.executor = self._new_executor()
+        self._tasks.append(asyncio.create_task(self._warm_up(self.executor)))
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job["status"] = "running"
+            job["started"] = time.time()
+            self.running += 1
+            executor = self.executor
+            try:
+                outcome = await loop.run_in_executor(executor, _run_one, job["input_path"],
+                                                     dict(job["options"], output_name=job["id"]))
+            except BrokenProcessPool as e:
+                # a worker died (e.g. OOM-killed): fail this job, keep serving
+                outcome = {"status": "error", "error": f"worker process crashed ({e})"}
+                self._restart_workers(executor)
+            except Exception as e:
+                outcome = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+            self._finish(job, outcome)
+
+    # ----------------------------
+    # jobs
+    # ----------------------------
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up (a worker finishing), from recent run times."""
+        runs = [run for _, _, run, _ in self.latencies]
+        mean_run = sum(runs) / len(runs) if runs else 60.0
+        return max(1, math.ceil(mean_run / self.workers))
+
+    def _reject(self, reason: str):
+        self.counts["rejected"] += 1
+        raise HTTPError(429, reason, {"Retry-After": str(self.retry_after())})
+
+    def submit(self, input_path: str, options: dict = None, job_id: str = None, upload: bool = False) -> dict:
+        """
+        Queue one job; raises HTTPError 400 for an invalid id or option value, 409 for
+        an id already in use and 429 when the queue is full.
+        """
+        if job_id is None:
+            job_id = uuid.uuid4().hex
+        elif not isinstance(job_id, str) or not JOB_ID_PATTERN.fullmatch(job_id):
+            raise HTTPError(400, "job id must be 1-64 letters, digits, '-' or '_'")
+        if job_id in self.jobs:
+            raise HTTPError(409, f"job {job_id} already exists")
+        if options is not None and not isinstance(options, dict):
+            raise HTTPError(400, "options must be a JSON object")
+        allowed = {}
+        for name, value in (options or {}).items():
+            if name in SERVICE_JOB_OPTIONS:
+                try:
+                    allowed[name] = SERVICE_JOB_OPTIONS[name](value)
+                except ValueError as e:
+                    raise HTTPError(400, f"option {name} {e}")
+        ignored = sorted(set(options or {}) - set(allowed))
+        if ignored:
+            print(f"[service] Job {job_id}: ignoring non-overridable options {ignored}")
+        job = {
+            "id": job_id, "status": "queued", "input_path": input_path, "options": allowed,
+            "upload": upload, "submitted": time.time(), "done": asyncio.Event(),
+        }
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._reject(f"queue full ({self.max_queue} jobs waiting)")
+        self.jobs[job_id] = job
+        self.counts["submitted"] += 1
+        self._trim_history()
+        response = {"id": job_id, "status": "queued", "queue_depth": self.queue.qsize()}
+        if ignored:
+            response["ignored_options"] = ignored
+        return response
+
+    def _finish(self, job: dict, outcome: dict):
+        job["finished"] = time.time()
+        job["queue_wait_s"] = job["started"] - job["submitted"]
+        job["run_s"] = job["finished"] - job["started"]
+        job["latency_s"] = job["finished"] - job["submitted"]
+        if outcome["status"] == "ok":
+            job["status"] = "ok"
+            job["result"] = {k: outcome.get(k) for k in ("output_file", "output_files", "segments")}
+            self.counts["completed"] += 1
+        else:
+            job["status"] = "error"
+            job["error"] = outcome["error"]
+            self.counts["failed"] += 1
+            print(f"[service] Job {job['id']} failed: {outcome['error']}")
+        self.latencies.append((job["finished"], job["queue_wait_s"], job["run_s"], job["latency_s"]))
+        if job["upload"] and not self.keep_uploads:
+            try:
+                os.remove(job["input_path"])
+            except OSError:
+                pass
+        job["done"].set()
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs beyond `max_history` (queued / running ones are kept)."""
+        excess = len(self.jobs) - self.max_history
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self.jobs.items() if job["done"].is_set()][:excess]:
+            del self.jobs[job_id]
+
+    @staticmethod
+    def describe(job: dict) -> dict:
+        return {k: v for k, v in job.items() if k not in ("done", "options", "result")}
+
+    def result(self, job: dict):
+        """(status code, payload) for GET /jobs/<id>/result."""
+        if not job["done"].is_set():
+            return 202, self.describe(job)
+        if job["status"] != "ok":
+            return 500, self.describe(job)
+        payload = dict(self.describe(job), **job["result"])
+        try:
+            with open(job["result"]["output_file"], "r", encoding="utf-8") as f:
+                payload["transcript"] = f.read()
+        except (OSError, TypeError):
+            payload["transcript"] = None
+        return 200, payload
+
+    # ----------------------------
+    # metrics
+    # ----------------------------
+    def metrics(self) -> dict:
+        now = time.time()
+        columns = list(zip(*self.latencies)) if self.latencies else [(), (), (), ()]
+
+        def percentiles(values):
+            return {f"p{q}": float(np.percentile(values, q)) if values else None for q in (50, 95, 99)}
+
+        window = now - min(columns[0]) if columns[0] else 0.0
+        return {
+            "uptime_s": now - self.started,
+            "workers": self.workers,
+            "workers_ready": self.workers_ready,
+            "queue_depth": self.queue.qsize(),
+            "max_queue": self.max_queue,
+            "running": self.running,
+            **self.counts,
+            "jobs_per_min": 60.0 * len(columns[0]) / window if window > 0 else None,
+            "queue_wait_s": percentiles(columns[1]),
+            "run_s": percentiles(columns[2]),
+            "latency_s": percentiles(columns[3]),
+        }
+
+    def prometheus(self) -> str:
+        m = self.metrics()
+        lines = [
+            "# HELP service_queue_depth Jobs waiting for a worker", "# TYPE service_queue_depth gauge",
+            f"service_queue_depth {m['queue_depth']}",
+            "# HELP service_running_jobs Jobs running on a worker", "# TYPE service_running_jobs gauge",
+            f"service_running_jobs {m['running']}",
+            "# HELP service_workers_ready Worker processes with models loaded", "# TYPE service_workers_ready gauge",
+            f"service_workers_ready {m['workers_ready']}",
+            "# HELP service_jobs_total Jobs by outcome", "# TYPE service_jobs_total counter",
+        ]
+        lines += [f'service_jobs_total{{outcome="{k}"}} {m[k]}' for k in self.counts]
+        lines += ["# HELP service_latency_seconds Recent job latency quantiles",
+                  "# TYPE service_latency_seconds gauge"]
+        for kind in ("queue_wait", "run", "latency"):
+            for name, value in m[f"{kind}_s"].items():
+                if value is not None:
+                    quantile = int(name[1:]) / 100
+                    lines.append(f'service_latency_seconds{{kind="{kind}",quantile="{quantile}"}} {value:.6g}')
+        return "\n".join(lines) + "\n"
+
+    # ----------------------------
+    # HTTP
+    # ----------------------------
+    async def handle(self, reader, writer):
+        """One request per connection: parse, dispatch, respond, close."""
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            try:
+                status, payload, headers = await self._dispatch(head, reader)
+            except HTTPError as e:
+                status, payload, headers = e.status, {"error": e.message}, e.headers
+            except Exception as e:
+                print(f"[service] Request failed: {type(e).__name__}: {e}")
+                status, payload, headers = 500, {"error": f"{type(e).__name__}: {e}"}, {}
+            await self._respond(writer, status, payload, headers)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status: int, payload, headers: dict):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload, default=str).encode("utf-8"), "application/json"
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}", f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}", "Connection: close"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _dispatch(self, head: bytes, reader):
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts == ["health"]:
+            ready = self.workers_ready == self.workers
+            return (200 if ready else 503), {"status": "ok" if ready else "loading",
+                                             "workers_ready": self.workers_ready, "workers": self.workers}, {}
+        if parts == ["metrics"]:
+            if query.get("format") == "prometheus":
+                return 200, self.prometheus(), {}
+            return 200, self.metrics(), {}
+        if parts == ["jobs"]:
+            if method != "POST":
+                raise HTTPError(405, "use POST to submit a job")
+            return 202, await self._submit_request(headers, query, reader), {}
+        if len(parts) in (2, 3) and parts[0] == "jobs" and (len(parts) == 2 or parts[2] == "result"):
+            if method != "GET":
+                raise HTTPError(405, "use GET to read a job")
+            job = self.jobs.get(parts[1])
+            if job is None:
+                raise HTTPError(404, f"unknown job {parts[1]}")
+            if len(parts) == 2:
+                return 200, self.describe(job), {}
+            try:
+                wait = float(query.get("wait", 0) or 0)
+            except ValueError:
+                raise HTTPError(400, "wait must be a number of seconds")
+            if not math.isfinite(wait) or wait < 0:
+                raise HTTPError(400, "wait must be a number of seconds")
+            wait = min(wait, MAX_WAIT_SECONDS)
+            if wait > 0 and not job["done"].is_set():
+                try:
+                    await asyncio.wait_for(job["done"].wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+            status, payload = self.result(job)
+            return status, payload, {}
+        raise HTTPError(404, f"no route for {method} {url.path}")
+
+    async def _submit_request(self, headers: dict, query: dict, reader) -> dict:
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length required")
+        length = headers["content-length"]
+        if not length.isdigit():
+            raise HTTPError(400, f"invalid Content-Length: {length!r}")
+        length = int(length)
+        if "filename" not in query:
+            if length > MAX_JSON_BYTES:
+                raise HTTPError(413, "JSON body too large")
+            try:
+                request = json.loads(await reader.readexactly(length) or b"{}")
+            except asyncio.IncompleteReadError:
+                raise HTTPError(400, "body ended before Content-Length bytes")
+            except ValueError as e:
+                raise HTTPError(400, f"invalid JSON: {e}")
+            if not isinstance(request, dict):
+                raise HTTPError(400, "request body must be a JSON object")
+            input_path = request.get("input_path")
+            if not isinstance(input_path, str) or not os.path.isfile(input_path):
+                raise HTTPError(400, f"file not found: {input_path}")
+            return self.submit(os.path.abspath(input_path), request.get("options"), request.get("id"))
+
+        # raw upload: refuse before reading the body if it cannot be queued
+        if self.queue.full():
+            self._reject(f"queue full ({self.max_queue} jobs waiting)")
+        if length > self.max_upload_bytes:
+            raise HTTPError(413, f"upload larger than {self.max_upload_bytes // (1024 * 1024)} MB")
+        ext = os.path.splitext(os.path.basename(query.get("filename", "")))[1].lower()
+        if ext not in AUDIO_EXTENSIONS:
+            raise HTTPError(400, f"?filename= must name an audio file ({', '.join(AUDIO_EXTENSIONS)})")
+        job_id = uuid.uuid4().hex
+        path = await self._save_upload(reader, length, os.path.join(self.upload_dir, job_id + ext))
+        try:
+            return self.submit(path, job_id=job_id, upload=True)
+        except HTTPError:
+            os.remove(path)   # the queue filled up while the body was streaming in
+            raise
+
+    async def _save_upload(self, reader, length: int, path: str) -> str:
+        """Stream the request body to `path` in chunks (never held in memory)."""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        try:
+            with open(path, "wb") as f:
+                remaining = length
+                while remaining:
+                    chunk = await reader.read(min(READ_CHUNK, remaining))
+                    if not chunk:
+                        raise HTTPError(400, "upload ended before Content-Length bytes")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return path
+
+    def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _serve(service: JobService, host: str, port: int):
+    await service.start()
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_HEADER_BYTES)
+    print(f"[service] Listening on http://{host}:{port} "
+          f"({service.workers} workers, queue up to {service.max_queue} jobs; Ctrl+C to stop)...")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.shutdown()
+
+
+def serve_http(options: dict, host: str = "127.0.0.1", port: int = 8770, workers: int = 2, max_queue: int = 16,
+               upload_dir: str = UPLOAD_DIR, max_upload_mb: int = 2048):
+    """Run the HTTP job service until interrupted. `options` are run_pipeline keyword arguments."""
+    service = JobService(options, workers=workers, max_queue=max_queue, upload_dir=upload_dir,
+                         max_upload_mb=max_upload_mb)
+    asyncio.run(_serve(service, host, port))
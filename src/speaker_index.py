@@ -0,0 +1,269 @@
+"""
+Approximate nearest-neighbour speaker index for large enrolled rosters (pure NumPy).
+
+IVFIndex partitions the L2-normalised reference embeddings into `nlist` cells with
+spherical k-means. A query scores the cell centroids, visits the `nprobe` best cells
+and ranks only the members of those cells, so cost grows with N / nlist * nprobe
+instead of N. It subclasses SpeakerMatcher, so `match(...)` / `top_k(...)` work the
+same as the exact matcher and the two are interchangeable in the pipeline.
+
+The index is built from the reference embedding cache, persisted next to it as
+`refs/speaker_index.npz`, and kept in sync incrementally (add / update / remove)
+when references.json changes:
+
+    index = load_speaker_index(ref_embeddings)             # {name: embedding}
+    labels, top_names, top_scores = index.match(segment_embeddings, threshold=0.37, top_k=3)
+"""
+
+import os
+import numpy as np
+
+from .matching import SpeakerMatcher, normalize_rows
+
+# persisted next to the reference embedding store (refs/embeddings.f32)
+INDEX_FILE = os.path.join("refs", "speaker_index.npz")
+
+
+def _spherical_kmeans(vectors, nlist, iterations=15, seed=0, max_train=None):
+    """Cluster unit vectors by cosine similarity; returns unit-length centroids (nlist, D)."""
+    rng = np.random.default_rng(seed)
+    train = vectors
+    if max_train is not None and len(vectors) > max_train:
+        train = vectors[rng.choice(len(vectors), max_train, replace=False)]
+    centroids = train[rng.choice(len(train), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(train @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, train)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # re-seed empty cells with random training points
+            sums[empty] = train[rng.choice(len(train), int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex(SpeakerMatcher):
+    """Inverted-file cosine index over unit-normalised speaker embeddings."""
+
+    def __init__(self, names=(), matrix=None, nlist=None, nprobe=8, normalized=False):
+        matrix = np.zeros((0, 0), dtype=np.float32) if matrix is None else matrix
+        super().__init__(names, matrix, normalized=normalized)
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int64)
+        self.trained_size = 0
+        self.dirty = False
+        if len(self.names):
+            self.train()
+
+    # ------------------------------------------------------------------
+    # building
+    # ------------------------------------------------------------------
+    @staticmethod
+    def default_nlist(n):
+        return max(1, min(int(4 * np.sqrt(n)), n // 16 or 1))
+
+    def train(self):
+        """(Re)cluster the current references and rebuild the inverted lists."""
+        n = len(self.names)
+        nlist = min(self.nlist or self.default_nlist(n), max(n, 1))
+        if n == 0:
+            self.centroids = None
+            self.assignments = np.zeros(0, dtype=np.int64)
+        else:
+            self.centroids = _spherical_kmeans(self.matrix, nlist, max_train=nlist * 64)
+            self.assignments = self._assign(self.matrix)
+        self.trained_size = n
+        self._pack()
+        self.dirty = True
+
+    def _assign(self, vectors, chunk=8192):
+        out = np.empty(len(vectors), dtype=np.int64)
+        for lo in range(0, len(vectors), chunk):
+            out[lo:lo + chunk] = np.argmax(vectors[lo:lo + chunk] @ self.centroids.T, axis=1)
+        return out
+
+    def _pack(self):
+        """Store members of each cell contiguously so a probe is one slice."""
+        if self.centroids is None:
+            self._order = np.zeros(0, dtype=np.int64)
+            self._offsets = np.zeros(1, dtype=np.int64)
+            self._packed = self.matrix
+            return
+        self._order = np.argsort(self.assignments, kind="stable")
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._packed = self.matrix[self._order]
+
+    def add(self, names, vectors):
+        """Add (or replace) references. Retrains once the roster has grown 4x since training."""
+        names = list(names)
+        vectors = normalize_rows(np.asarray(vectors).reshape(len(names), -1))
+        replaced = [n for n in names if n in self._positions()]
+        if replaced:
+            self.remove(replaced)
+        if not len(self.names):
+            self.names = names
+            self.matrix = vectors
+            self.train()
+            return
+        self.names.extend(names)
+        self.matrix = np.concatenate([self.matrix, vectors])
+        if len(self.names) > 4 * max(self.trained_size, 16):
+            self.train()
+            return
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        self._pack()
+        self.dirty = True
+
+    def remove(self, names):
+        """Drop references by name (unknown names are ignored)."""
+        drop = set(names)
+        keep = np.array([n not in drop for n in self.names], dtype=bool)
+        if keep.all():
+            return
+        self.names = [n for n, k in zip(self.names, keep) if k]
+        self.matrix = self.matrix[keep]
+        self.assignments = self.assignments[keep]
+        if not self.names:
+            self.centroids = None
+        self._pack()
+        self.dirty = True
+
+    def _positions(self):
+        return {n: i for i, n in enumerate(self.names)}
+
+    def sync(self, reference_embeddings: dict, atol: float = 1e-5) -> bool:
+        """
+        Bring the index in line with {name: embedding}: add new names, replace changed
+        vectors and remove names that are gone. Returns True if anything changed.
+        """
+        positions = self._positions()
+        removed = [n for n in self.names if n not in reference_embeddings]
+        added, changed = [], []
+        for name, emb in reference_embeddings.items():
+            if name not in positions:
+                added.append(name)
+            else:
+                vec = normalize_rows(np.asarray(emb).reshape(1, -1))[0]
+                if vec.shape != self.matrix[positions[name]].shape or \
+                        not np.allclose(vec, self.matrix[positions[name]], atol=atol):
+                    changed.append(name)
+        if removed:
+            self.remove(removed)
+        updates = added + changed
+        if updates:
+            self.add(updates, np.stack([np.asarray(reference_embeddings[n]).ravel() for n in updates]))
+        if removed or updates:
+            print(f"[speaker_index] Synced index: +{len(added)} new, ~{len(changed)} changed, "
+                  f"-{len(removed)} removed ({len(self.names)} total)")
+        return bool(removed or updates)
+
+    # ------------------------------------------------------------------
+    # querying
+    # ------------------------------------------------------------------
+    def top_k(self, embeddings, k: int = 1, chunk_elements: int = 1 << 24):
+        """Approximate top-k (indices into self.names, scores), best first."""
+        n = len(embeddings)
+        k = min(k, len(self.names))
+        indices = np.zeros((n, k), dtype=np.int64)
+        top_scores = np.zeros((n, k), dtype=np.float32)
+        if n == 0 or k == 0:
+            return indices, top_scores
+
+        queries = normalize_rows(np.asarray(embeddings).reshape(n, -1))
+        cell_scores = queries @ self.centroids.T
+        cell_order = np.argsort(-cell_scores, axis=1)
+        for qi in range(n):
+            # visit nprobe cells, and keep going if they hold fewer than k members
+            spans, found = [], 0
+            for probed, cell in enumerate(cell_order[qi]):
+                lo, hi = self._offsets[cell], self._offsets[cell + 1]
+                if hi > lo:
+                    spans.append((lo, hi))
+                    found += hi - lo
+                if probed + 1 >= self.nprobe and found >= k:
+                    break
+            rows = np.concatenate([np.arange(lo, hi) for lo, hi in spans])
+            scores = self._packed[rows] @ queries[qi]
+            best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+            best = best[np.argsort(-scores[best])]
+            indices[qi] = self._order[rows[best]]
+            top_scores[qi] = scores[best]
+        return indices, top_scores
+
+    # ------------------------------------------------------------------
+    # persistence
+    # ------------------------------------------------------------------
+    def save(self, path: str = INDEX_FILE):
+        """Atomically write the index as a (pickle-free) .npz file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                names=np.asarray(self.names, dtype=str),
+                matrix=self.matrix,
+                centroids=self.centroids if self.centroids is not None else np.zeros((0, 0), np.float32),
+                assignments=self.assignments,
+                params=np.asarray([self.nlist or 0, self.nprobe, self.trained_size], dtype=np.int64),
+            )
+        os.replace(tmp, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(nprobe=int(data["params"][1]))
+            index.nlist = int(data["params"][0]) or None
+            index.trained_size = int(data["params"][2])
+            index.names = data["names"].tolist()
+            index.matrix = data["matrix"].astype(np.float32)
+            index.centroids = data["centroids"] if data["centroids"].size else None
+            index.assignments = data["assignments"].astype(np.int64)
+        index._pack()
+        return index
+
+
+def load_speaker_index(reference_embeddings: dict, path: str = INDEX_FILE, nprobe: int = 8,
+                       nlist: int = None) -> IVFIndex:
+    """
+    Load the persisted index (or build it), sync it with the current reference
+    embeddings and save it back if anything changed.
+    """
+    index = None
+    if os.path.exists(path):
+        try:
+            index = IVFIndex.load(path)
+            index.nprobe = nprobe
+        except Exception as e:
+            print(f"[speaker_index] Failed to load index ({e}), rebuilding...")
+    if index is None:
+        print(f"[speaker_index] Building index for {len(reference_embeddings)} speakers...")
+        names = list(reference_embeddings)
+        matrix = np.stack([np.asarray(reference_embeddings[n]).ravel() for n in names]) if names else None
+        index = IVFIndex(names, matrix, nlist=nlist, nprobe=nprobe)
+    else:
+        index.sync(reference_embeddings)
+    if index.dirty:
+        index.save(path)
+    return index
+
+
+MATCHER_BACKENDS = ("exact", "ivf")
+
+
+def build_matcher(names, matrix, backend: str = "exact", nprobe: int = 8):
+    """
+    Return the matcher for `backend` over unit-normalised reference rows (as returned
+    by speaker_utils.load_reference_matrix): "exact" uses the matrix as-is (no copy),
+    "ivf" syncs and uses the persisted IVFIndex.
+    """
+    if backend == "ivf":
+        return load_speaker_index(dict(zip(names, matrix)), nprobe=nprobe)
+    if backend != "exact":
+        print(f"[speaker_index] Unknown matcher backend '{backend}', using exact search")
+    return SpeakerMatcher(names, matrix, normalized=True)
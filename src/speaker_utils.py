@@ -80,26 +80,31 @@
 """
 Speaker utilities:
 - Manage reference embeddings with caching (add, update, prune).
-- Safe load/save of cache to prevent corruption.
+- Embeddings live in a memory-mappable ReferenceStore (refs/embeddings.f32 +
+  refs/embeddings.json); a legacy pickled refs/embeddings.npy is imported once.
+- A reference may be one file or a folder of clips (see enrollment.py); changed
+  references are embedded together in length-bucketed batches.
 """
-import shutil
 import os
 import json
+import wave
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import librosa
-import torch
+from .reference_store import ReferenceStore, REFS_DIR
+from .enrollment import list_clips, enroll_speakers, collect_speaker_folders, AUDIO_EXTENSIONS
+from .matching import SUBCENTROID_SEP
+from .profiling import timed
 
 # Paths (relative to project root)
-REFS_DIR = "refs"
-CACHE_FILE = os.path.join(REFS_DIR, "embeddings.npy")
+CACHE_FILE = os.path.join(REFS_DIR, "embeddings.npy")   # legacy pickled cache
 
 
 # ----------------------------
-# Safe cache I/O
+# Legacy cache I/O
 # ----------------------------
 def load_cache() -> dict:
-    """Safely load cached embeddings, return {} if invalid/corrupt."""
+    """Safely load the legacy pickled cache, return {} if missing/invalid/corrupt."""
     if not os.path.exists(CACHE_FILE):
         return {}
     try:
@@ -114,41 +119,66 @@ def load_cache() -> dict:
         return {}
 
 
-# def save_cache(cache: dict):
-#     """Atomically save cache to avoid corruption."""
-#     os.makedirs(REFS_DIR, exist_ok=True)
-#     tmp_file = CACHE_FILE + ".tmp"
-#     np.save(tmp_file, cache, allow_pickle=True)
-#     os.replace(tmp_file, CACHE_FILE)
-
-def save_cache(cache: dict):
-    """Atomically save cache to avoid corruption (Windows-safe)."""
-    os.makedirs(REFS_DIR, exist_ok=True)
-
-    # Use .npy explicitly
-    tmp_file = os.path.join(REFS_DIR, "embeddings_tmp.npy")
-    
-    # Save cache to temp file
-    np.save(tmp_file, cache, allow_pickle=True)
-    
-    # Move temp file to final location
-    shutil.move(tmp_file, os.path.join(REFS_DIR, "embeddings.npy"))
+def open_store(directory: str = REFS_DIR) -> ReferenceStore:
+    """Open the reference store, importing the legacy pickled cache on first use."""
+    store = ReferenceStore(directory)
+    legacy = os.path.join(directory, "embeddings.npy")
+    if len(store) == 0 and os.path.exists(legacy) and directory == REFS_DIR:
+        store.import_legacy(load_cache())
+        store.commit()
+        os.replace(legacy, legacy + ".migrated")
+    return store
 
 
 # ----------------------------
 # Embedding helpers
 # ----------------------------
-def file_hash(path: str) -> str:
-    """Return SHA1 hash of file contents (to detect changes)."""
-    h = hashlib.sha1()
-    with open(path, "rb") as f:
-        while chunk := f.read(8192):
-            h.update(chunk)
-    return h.hexdigest()
+def file_hash(path: str, algo: str = "sha1") -> str:
+    """
+    Return a hash of file contents (to detect changes); for a folder of clips,
+    one hash over every clip's relative path and contents.
+    algo: sha1 (default), blake2b, or xxhash (falls back to blake2b if the
+    optional `xxhash` package is not installed).
+    """
+    if algo == "xxhash":
+        try:
+            import xxhash
+            h = xxhash.xxh3_128()
+        except ImportError:
+            algo, h = "blake2b", hashlib.blake2b()
+    else:
+        h = hashlib.new(algo)
+    for clip in list_clips(path):
+        if clip != path:
+            h.update(os.path.relpath(clip, path).encode("utf-8"))
+        with open(clip, "rb") as f:
+            while chunk := f.read(1 << 20):
+                h.update(chunk)
+    return f"{algo}:{h.hexdigest()}" if algo != "sha1" else h.hexdigest()
+
+
+def file_signature(path: str) -> dict:
+    """
+    Cheap change detector: size, mtime (ns) and inode from a single stat call.
+    For a folder: total clip size, newest mtime (folder or clip) and clip count.
+    """
+    st = os.stat(path)
+    if not os.path.isdir(path):
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+    clips = [os.stat(c) for c in list_clips(path)]
+    return {
+        "size": sum(c.st_size for c in clips),
+        "mtime_ns": max([st.st_mtime_ns] + [c.st_mtime_ns for c in clips]),
+        "inode": st.st_ino,
+        "clips": len(clips),
+    }
 
 
 def embed_from_file(file_path: str, verifier) -> np.ndarray:
     """Compute embedding from an audio file."""
+    import librosa
+    import torch
+
     audio, _ = librosa.load(file_path, sr=16000)
     tensor = torch.tensor(audio).unsqueeze(0)  # [1, T]
     emb = verifier.encode_batch(tensor)
@@ -158,52 +188,236 @@ def embed_from_file(file_path: str, verifier) -> np.ndarray:
 # ----------------------------
 # Main reference embeddings loader
 # ----------------------------
-def load_reference_embeddings(ref_config_path: str, verifier) -> dict:
+def sync_reference_store(ref_config_path: str, verifier, store: ReferenceStore = None,
+                         hash_algo: str = "sha1", threads: int = 4, sub_centroids: int = None,
+                         max_batch_samples: int = 16000 * 120, max_batch_rows: int = 64,
+                         timings: dict = None):
     """
-    Load reference embeddings from config file.
-    Keeps a persistent cache synced with references.json.
+    Sync the reference store with references.json.
     Auto-adds new, updates changed, prunes removed.
+    Each reference is an audio file or a folder of clips; changed ones are decoded on
+    the thread pool and embedded together in length-bucketed batches, stored as a
+    centroid plus up to `sub_centroids` sub-centroids (None keeps each speaker's
+    previous count; a different count forces re-enrollment).
+
+    Validation is stat-first: a reference whose size, mtime and inode match the
+    stored metadata is trusted without reading it. Only the rest are content-hashed,
+    and only those whose hash changed are re-embedded. Hashing and re-embedding
+    run on a thread pool of `threads` workers.
+    Per-phase metrics go into `timings` as "references.stat" / ".hash" / ".embed".
+    Returns (store, keys): the row keys (speakers and their "<name>#k" sub-centroids)
+    whose reference exists.
     """
     # Load JSON reference config
     with open(ref_config_path, "r", encoding="utf-8") as f:
         references = json.load(f)
 
-    # Load existing cache safely
-    cache = load_cache()
-
-    # Ensure all refs exist
+    store = store if store is not None else open_store()
+    phases = {}
     updated = False
-    valid_refs = {}
 
-    for name, path in references.items():
-        if not os.path.exists(path):
-            print(f"[speaker_utils] WARNING: file not found for {name}: {path}")
-            continue
-
-        fhash = file_hash(path)
-        cache_entry = cache.get(name)
+    # 1) stat pass
+    with timed("stat", phases):
+        valid_names = []
+        signatures = {}
+        suspects = []
+        for name, path in references.items():
+            try:
+                signatures[name] = file_signature(path)
+            except FileNotFoundError:
+                print(f"[speaker_utils] WARNING: file not found for {name}: {path}")
+                continue
+            valid_names.append(name)
+            entry = store.get(name)
+            if entry is None or any(entry.get(k) != v for k, v in signatures[name].items()):
+                suspects.append(name)
+            elif sub_centroids is not None and entry.get("sub_centroids", 0) != sub_centroids:
+                suspects.append(name)
+
+    # 2) hash only the references whose stat changed (or that are new)
+    to_embed = []
+    with timed("hash", phases), ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        hashes = dict(zip(suspects, pool.map(lambda n: file_hash(references[n], hash_algo), suspects)))
+        for name in suspects:
+            entry = store.get(name)
+            if entry is not None and entry.get("hash") == hashes[name] and (
+                    sub_centroids is None or entry.get("sub_centroids", 0) == sub_centroids):
+                # touched or copied but identical content: refresh metadata only
+                store.update_meta(name, **signatures[name])
+                updated = True
+            else:
+                to_embed.append(name)
+
+    # 3) re-embed new or changed speakers (all clips in shared length-bucketed batches)
+    clips = 0
+    with timed("embed", phases) as record:
+        if to_embed:
+            for name in to_embed[:20]:
+                print(f"[speaker_utils] Updating embedding for {name}...")
+            if len(to_embed) > 20:
+                print(f"[speaker_utils] ... and {len(to_embed) - 20} more speakers")
+            subs = {n: sub_centroids if sub_centroids is not None else (store.get(n) or {}).get("sub_centroids", 0)
+                    for n in to_embed}
+            clips, record["audio_seconds"] = enroll_speakers(
+                store, {n: list_clips(references[n]) for n in to_embed}, verifier,
+                sub_centroids=subs,
+                meta_by_name={n: dict(hash=hashes[n], **signatures[n]) for n in to_embed},
+                threads=threads, max_batch_samples=max_batch_samples, max_batch_rows=max_batch_rows
+            )
+            updated = True
 
-        # If new speaker or file changed → recompute
-        if cache_entry is None or cache_entry.get("hash") != fhash:
-            print(f"[speaker_utils] Updating embedding for {name}...")
-            emb = embed_from_file(path, verifier)
-            cache[name] = {"hash": fhash, "embedding": emb}
+    # Prune speakers (and their sub-centroids) no longer in references.json
+    for r in store.names():
+        speaker = store.get(r).get("speaker", r)
+        if speaker not in references:
+            if speaker == r:
+                print(f"[speaker_utils] Removing stale speaker: {r}")
+            store.delete(r)
             updated = True
-        else:
-            print(f"[speaker_utils] Using cached embedding for {name}")
 
-        valid_refs[name] = cache[name]
+    # Persist the index (and compact) if needed
+    if updated:
+        store.commit()
+
+    print(
+        f"[speaker_utils] Reference sync: {len(valid_names)} speakers, "
+        f"{len(valid_names) - len(suspects)} unchanged by stat, {len(suspects)} hashed, "
+        f"{len(to_embed)} re-embedded from {clips} clips "
+        f"(stat {phases['stat']['seconds']:.3f}s, hash {phases['hash']['seconds']:.3f}s, "
+        f"embed {phases['embed']['seconds']:.3f}s)"
+    )
+    if timings is not None:
+        timings.update({f"references.{phase}": record for phase, record in phases.items()})
+    valid = set(valid_names)
+    keys = [k for k in store.names() if store.get(k).get("speaker", k) in valid]
+    return store, keys
+
+
+def enroll_directory(root: str, verifier, ref_config_path: str = os.path.join("config", "references.json"),
+                     sub_centroids: int = 0, **sync_options):
+    """
+    Register every speaker folder under `root` in references.json (name -> folder)
+    and sync the store, which embeds only new or changed speakers.
+    Returns (store, keys) like sync_reference_store.
+    """
+    speakers = collect_speaker_folders(root)
+    references = {}
+    if os.path.exists(ref_config_path):
+        with open(ref_config_path, "r", encoding="utf-8") as f:
+            references = json.load(f)
+    references.update(speakers)
+    os.makedirs(os.path.dirname(ref_config_path) or ".", exist_ok=True)
+    with open(ref_config_path, "w", encoding="utf-8") as f:
+        json.dump(references, f, indent=2)
+    print(f"[speaker_utils] Registered {len(speakers)} speakers from '{root}' in {ref_config_path}")
+    return sync_reference_store(ref_config_path, verifier, sub_centroids=sub_centroids, **sync_options)
+
+
+def load_reference_matrix(ref_config_path: str, verifier, hash_algo: str = "sha1", threads: int = 4,
+                          timings: dict = None):
+    """
+    Sync the store and return (names, matrix) of unit-normalised reference embeddings.
+    The matrix is the store's memmap itself whenever every stored speaker is valid.
+    """
+    store, names = sync_reference_store(ref_config_path, verifier, hash_algo=hash_algo, threads=threads,
+                                        timings=timings)
+    return store.matrix(names)
 
-    # Prune speakers no longer in references.json
-    to_remove = set(cache.keys()) - set(references.keys())
-    for r in to_remove:
-        print(f"[speaker_utils] Removing stale speaker: {r}")
-        del cache[r]
-        updated = True
 
-    # Save updated cache if needed
-    if updated:
-        save_cache(cache)
+def load_reference_embeddings(ref_config_path: str, verifier, hash_algo: str = "sha1", threads: int = 4) -> dict:
+    """
+    Load reference embeddings from config file.
+    Keeps a persistent store synced with references.json.
+    Returns dict {name: embedding} (read-only views into the store).
+    """
+    store, names = sync_reference_store(ref_config_path, verifier, hash_algo=hash_algo, threads=threads)
+    return {name: store.embedding(name) for name in names}
+
+
+# ----------------------------
+# Lightweight inspection (no models, no audio decoding)
+# ----------------------------
+MIN_REFERENCE_SECONDS = 3.0
+
+
+def _wav_seconds(path: str):
+    """Duration of a PCM WAV from its header, or None for other formats / unreadable headers."""
+    if not path.lower().endswith(".wav"):
+        return None
+    try:
+        with wave.open(path, "rb") as w:
+            return w.getnframes() / float(w.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return None
+
 
-    # Return dict {name: embedding}
-    return {name: entry["embedding"] for name, entry in valid_refs.items()}
+def validate_references(ref_config_path: str):
+    """
+    Check references.json without loading any model. Returns (errors, warnings, references):
+    errors are problems that break enrollment (bad JSON, missing or empty audio, reserved
+    names), warnings are likely mistakes (unknown extension, very short or duplicate clips).
+    """
+    errors, warnings = [], []
+    try:
+        with open(ref_config_path, "r", encoding="utf-8") as f:
+            references = json.load(f)
+    except FileNotFoundError:
+        return [f"{ref_config_path} not found"], [], {}
+    except json.JSONDecodeError as e:
+        return [f"{ref_config_path} is not valid JSON: {e}"], [], {}
+    if not isinstance(references, dict):
+        return [f"{ref_config_path} must map speaker names to audio paths"], [], {}
+
+    seen = {}
+    for name, path in references.items():
+        if not isinstance(path, str):
+            errors.append(f"{name}: path must be a string, got {type(path).__name__}")
+            continue
+        if SUBCENTROID_SEP in name:
+            errors.append(f"{name}: '{SUBCENTROID_SEP}' is reserved for sub-centroid rows")
+        if not os.path.exists(path):
+            errors.append(f"{name}: {path} not found")
+            continue
+        clips = list_clips(path)
+        if not clips:
+            errors.append(f"{name}: folder {path} holds no audio clips")
+        for clip in clips:
+            if os.path.getsize(clip) == 0:
+                errors.append(f"{name}: {clip} is empty")
+                continue
+            if not clip.lower().endswith(AUDIO_EXTENSIONS):
+                warnings.append(f"{name}: {clip} has an unrecognised audio extension")
+            seconds = _wav_seconds(clip)
+            if seconds is not None and seconds < MIN_REFERENCE_SECONDS:
+                warnings.append(f"{name}: {clip} is only {seconds:.1f}s (aim for {MIN_REFERENCE_SECONDS:.0f}s+)")
+            if clip in seen:
+                warnings.append(f"{name}: {clip} is also used by {seen[clip]}")
+            seen.setdefault(clip, name)
+    return errors, warnings, references
+
+
+def describe_speakers(ref_config_path: str, store: ReferenceStore = None) -> list:
+    """
+    One row per speaker in references.json or the store: name, path, clips, sub-centroids
+    and status ("enrolled", "not enrolled" or "stale" = in the store but no longer configured).
+    """
+    references = {}
+    if os.path.exists(ref_config_path):
+        with open(ref_config_path, "r", encoding="utf-8") as f:
+            references = json.load(f)
+    store = store if store is not None else ReferenceStore()
+    rows = []
+    for name in sorted(set(references) | {n for n in store.names() if SUBCENTROID_SEP not in n}):
+        entry = store.get(name)
+        if entry is None:
+            status = "not enrolled"
+        else:
+            status = "enrolled" if name in references else "stale"
+        rows.append({
+            "name": name,
+            "path": references.get(name),
+            "clips": (entry or {}).get("clips", 1 if entry else 0),
+            "sub_centroids": (entry or {}).get("subs", 0),
+            "status": status,
+        })
+    return rows
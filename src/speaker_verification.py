@@ -2,64 +2,185 @@
 Speaker verification / embedding utilities using SpeechBrain's ECAPA-TDNN model.
 
 Functions:
-  - load_verification_model(device): returns a SpeakerRecognition instance
-  - compute_reference_embeddings(ref_config_path, verifier): loads refs from JSON and computes embeddings
-  - embed_segments(verification, full_audio, sr, segments, target_sr=16000): batch-embeds segments
+  - load_verification_model(device, backend, threads, interop_threads): returns a SpeakerRecognition
+      instance, optionally wrapped in an optimized ECAPA backend (see ecapa_backends.py)
+  - compute_reference_embeddings(ref_config_path, verifier): {name: embedding} for the refs in a JSON file
+      (delegates to speaker_utils.load_reference_embeddings, which caches and batches)
+  - embed_waveforms(verification, waveforms, ...): length-bucketed, memory-bounded batch embedding
+  - embed_segments(verification, full_audio, sr, segments, target_sr=16000, max_batch_samples, max_batch_rows):
+      slices whisperx segments and embeds them with embed_waveforms
+  - embed_speaker_clusters(verification, full_audio, sr, segments, max_seconds): one pooled
+      embedding per diarized speaker label, built from its longest non-overlapping regions
   - cosine_similarity / match_speaker: helpers for matching
 
 Important implementation notes:
   - Reference files are expected to be reasonably clean and at least several seconds long.
   - The matching threshold (cosine) can be tuned for your dataset.
+  - torch, librosa and speechbrain are imported inside the functions that need them,
+    so importing this module (e.g. for a CLI helper command) stays fast.
 """
 
-import json
 import numpy as np
-import librosa
-import torch
-from speechbrain.inference import SpeakerRecognition
+from .profiling import peak_rss_mb, current_rss_mb, cuda_peak_mb, format_mb
 
-def load_verification_model(device: str = "cpu"):
+ECAPA_SOURCE = "speechbrain/spkrec-ecapa-voxceleb"
+
+def load_verification_model(device: str = "cpu", backend: str = "eager", threads: int = 0,
+                            interop_threads: int = 0):
     """
     Load the SpeechBrain ECAPA model for extracting speaker embeddings.
-    The SpeechBrain method handles device placement via run_opts.
+    The SpeechBrain method handles device placement via run_opts. A non-eager `backend`
+    or a `threads` budget wraps it in ecapa_backends.OptimizedVerifier (same encode_batch).
     """
+    from speechbrain.inference import SpeakerRecognition
+
     print(f"[speaker_verif] Loading SpeechBrain speaker-verification model on device '{device}'...")
     verifier = SpeakerRecognition.from_hparams(
-        source="speechbrain/spkrec-ecapa-voxceleb",
+        source=ECAPA_SOURCE,
         run_opts={"device": device}
     )
+    if backend not in (None, "", "eager") or threads or interop_threads:
+        from .ecapa_backends import optimize_verifier
+        verifier = optimize_verifier(verifier, backend=backend, threads=threads, interop_threads=interop_threads)
     return verifier
 
 def compute_reference_embeddings(ref_config_path: str, verifier) -> dict:
     """
     Reads a JSON mapping of {name: path} and returns a dict {name: embedding_np}.
     JSON path example: config/references.json
+    Kept for compatibility; embeddings come from the synced reference store.
+    """
+    from .speaker_utils import load_reference_embeddings
+    return load_reference_embeddings(ref_config_path, verifier)
+
+def _verifier_device(verifier, fallback="cpu"):
+    """Best-effort lookup of the device the verifier's parameters live on."""
+    try:
+        # Inspect the first parameter of model to find device
+        return next(verifier.mods.parameters()).device
+    except Exception:
+        pass
+    try:
+        return next(verifier.modules()).parameters().__iter__().__next__().device
+    except Exception:
+        return fallback
+
+
+def plan_length_buckets(lengths, max_batch_samples: int, max_batch_rows: int = 64):
     """
-    print("[speaker_verif] Loading reference files and computing embeddings...")
-    with open(ref_config_path, "r", encoding="utf-8") as f:
-        reference_files = json.load(f)
+    Group item indices into batches ordered by descending length.
+
+    Each batch is padded to its longest item, so the padded cost of a batch is
+    rows * longest. Batches are closed once that cost would exceed
+    `max_batch_samples` or the row count would exceed `max_batch_rows`.
+    An item longer than the budget on its own still gets a batch of one.
+    Returns a list of index lists (indices into `lengths`).
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    buckets = []
+    current = []
+    longest = 0
+    for idx in order:
+        if not current:
+            current, longest = [idx], lengths[idx]
+            continue
+        # sorted descending, so the first item of the bucket sets the padded width
+        if (len(current) + 1) * longest > max_batch_samples or len(current) >= max_batch_rows:
+            buckets.append(current)
+            current, longest = [idx], lengths[idx]
+        else:
+            current.append(idx)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def embed_waveforms(
+    verifier,
+    waveforms,
+    target_sr=16000,
+    max_batch_samples: int = 16000 * 120,
+    max_batch_rows: int = 64,
+    label: str = "segments"
+):
+    """
+    Embed a list of 1-D waveforms (already at target_sr) in length-bucketed batches.
+
+    Waveforms are sorted by length and grouped so that each padded batch holds
+    at most `max_batch_samples` samples (rows * longest row). Relative lengths
+    are passed to ECAPA as `wav_lens` so padding does not leak into the
+    embeddings, and results are scattered back into input order.
+    Returns an embeddings array with one row per waveform.
+    """
+    import torch
+
+    tensors = [torch.as_tensor(w, dtype=torch.float32) for w in waveforms]  # shape [T] each
+    if len(tensors) == 0:
+        return np.zeros((0,))  # nothing to do
+
+    lengths = [int(t.shape[0]) for t in tensors]
+    buckets = plan_length_buckets(lengths, max_batch_samples, max_batch_rows)
+
+    # Move to expected device if possible (SpeechBrain was created with run_opts={"device": device})
+    device = _verifier_device(verifier)
+
+    print(
+        f"[speaker_verif] Embedding {len(tensors)} {label} in {len(buckets)} batches "
+        f"(budget {max_batch_samples} samples, max {max_batch_rows} rows)..."
+    )
+    embeddings_np = None
+    for batch_no, bucket in enumerate(buckets, start=1):
+        longest = lengths[bucket[0]]
+        rss_before = current_rss_mb()
+        batched = torch.nn.utils.rnn.pad_sequence([tensors[i] for i in bucket], batch_first=True)
+        wav_lens = torch.tensor([lengths[i] / longest for i in bucket], dtype=torch.float32)
+
+        try:
+            batched = batched.to(device)
+            wav_lens = wav_lens.to(device)
+        except Exception:
+            pass
 
-    embeddings = {}
-    for name, path in reference_files.items():
-        # librosa load ensures consistent sample rate 16 kHz
-        audio, sr = librosa.load(path, sr=16000)
-        audio_tensor = torch.tensor(audio).unsqueeze(0)  # shape: [1, T]
         with torch.no_grad():
-            emb = verifier.encode_batch(audio_tensor)
-        emb_np = emb.squeeze().detach().cpu().numpy()
-        embeddings[name] = emb_np
-        print(f"  - {name}: embedding shape {emb_np.shape}")
+            embeddings = verifier.encode_batch(batched, wav_lens)
+        batch_np = embeddings.detach().cpu().numpy()
+
+        if embeddings_np is None:
+            embeddings_np = np.empty((len(tensors),) + batch_np.shape[1:], dtype=batch_np.dtype)
+        # scatter back into original order
+        embeddings_np[bucket] = batch_np
+
+        # padded float32 input (B x max_len x 4 bytes), RSS change across this batch, and the
+        # process-lifetime RSS high-water mark (which never goes down, so it is labelled as such)
+        padded_mb = len(bucket) * longest * 4 / (1024 * 1024)
+        rss_after = current_rss_mb()
+        rss_delta = f"{rss_after - rss_before:+.1f} MB" if None not in (rss_before, rss_after) else "n/a"
+        print(
+            f"[speaker_verif]   batch {batch_no}/{len(buckets)}: {len(bucket)} rows x "
+            f"{longest / target_sr:.1f}s, padded input {padded_mb:.1f} MB, RSS {rss_delta}, "
+            f"process RSS high-water {format_mb(peak_rss_mb())}, "
+            f"peak CUDA {format_mb(cuda_peak_mb(device, reset=True))}"
+        )
+        del batched, embeddings
 
-    return embeddings
+    return embeddings_np
 
-def embed_segments(verifier, full_audio, sr, segments, target_sr=16000):
+def embed_segments(
+    verifier,
+    full_audio,
+    sr,
+    segments,
+    target_sr=16000,
+    max_batch_samples: int = 16000 * 120,
+    max_batch_rows: int = 64
+):
     """
     Given the full audio waveform and whisperx segments, slice each segment,
-    resample if needed to target_sr, pad, and run batch embedding.
+    resample if needed to target_sr, and embed them with embed_waveforms.
     Returns (segment_infos_list, embeddings_np_array)
     """
     print("[speaker_verif] Preparing segments for embedding...")
-    tensors = []
+    waveforms = []
     infos = []
 
     for seg in segments:
@@ -69,41 +190,96 @@ def embed_segments(verifier, full_audio, sr, segments, target_sr=16000):
 
         # resample to 16k if needed
         if sr != target_sr:
+            import librosa
             segment_audio = librosa.resample(segment_audio, orig_sr=sr, target_sr=target_sr)
 
         if segment_audio.size == 0:
             # skip empty segments (very short)
             continue
 
-        t = torch.tensor(segment_audio, dtype=torch.float32)  # shape [T]
-        tensors.append(t)
+        waveforms.append(segment_audio)
         infos.append(seg)
 
-    if len(tensors) == 0:
-        return infos, np.zeros((0,))  # nothing to do
+    embeddings_np = embed_waveforms(verifier, waveforms, target_sr, max_batch_samples, max_batch_rows)
+    return infos, embeddings_np
 
-    # pad to make a batch (B, max_T)
-    batched = torch.nn.utils.rnn.pad_sequence(tensors, batch_first=True)
+def _overlapping_segments(segments):
+    """Return ids of segments that overlap a segment carrying a different speaker label."""
+    ordered = sorted(segments, key=lambda s: s["start"])
+    overlapping = set()
+    for i, seg in enumerate(ordered):
+        for other in ordered[i + 1:]:
+            if other["start"] >= seg["end"]:
+                break
+            if other.get("speaker") != seg.get("speaker"):
+                overlapping.add(id(seg))
+                overlapping.add(id(other))
+    return overlapping
 
-    # Move to expected device if possible (SpeechBrain was created with run_opts={"device": device})
-    # We try to move batched to same device as verifier modules if accessible. If not, leave on CPU.
-    try:
-        # Inspect the first parameter of model to find device
-        device = next(verifier.modules()).parameters().__iter__().__next__().device
-    except Exception:
-        device = batched.device  # fallback
+def select_cluster_regions(segments, sr, max_seconds: float = 30.0):
+    """
+    Pick each diarized speaker's best regions: longest non-overlapping segments
+    first, until `max_seconds` of audio is collected (the last region is trimmed).
+    Segments without a "speaker" label are ignored. If every segment of a speaker
+    overlaps someone else, its overlapping segments are used instead.
+    Returns {speaker_label: [(start_sample, end_sample), ...]}.
+    """
+    overlapping = _overlapping_segments(segments)
+    by_speaker = {}
+    for seg in segments:
+        if seg.get("speaker") is not None and seg["end"] > seg["start"]:
+            by_speaker.setdefault(seg["speaker"], []).append(seg)
 
-    try:
-        batched = batched.to(device)
-    except Exception:
-        pass
+    budget = int(max_seconds * sr)
+    regions = {}
+    for speaker, segs in by_speaker.items():
+        clean = [s for s in segs if id(s) not in overlapping] or segs
+        clean.sort(key=lambda s: s["end"] - s["start"], reverse=True)
+        picked, total = [], 0
+        for seg in clean:
+            start, end = int(seg["start"] * sr), int(seg["end"] * sr)
+            end = min(end, start + budget - total)
+            if end > start:
+                picked.append((start, end))
+                total += end - start
+            if total >= budget:
+                break
+        if picked:
+            regions[speaker] = picked
+    return regions
 
-    print("[speaker_verif] Running batch embedding (this may use GPU if available)...")
-    with torch.no_grad():
-        embeddings = verifier.encode_batch(batched)
+def embed_speaker_clusters(
+    verifier,
+    full_audio,
+    sr,
+    segments,
+    max_seconds: float = 30.0,
+    target_sr=16000,
+    max_batch_samples: int = 16000 * 120,
+    max_batch_rows: int = 64
+):
+    """
+    Compute one pooled embedding per diarized speaker cluster (SPEAKER_00, ...).
 
-    embeddings_np = embeddings.detach().cpu().numpy()
-    return infos, embeddings_np
+    The cluster's best regions (see select_cluster_regions) are concatenated into a
+    single waveform, so ECAPA runs once per cluster instead of once per segment.
+    Returns (cluster_labels_list, embeddings_np_array).
+    """
+    regions = select_cluster_regions(segments, sr, max_seconds=max_seconds)
+    labels = list(regions)
+    waveforms = []
+    for label in labels:
+        pooled = np.concatenate([full_audio[start:end] for start, end in regions[label]])
+        if sr != target_sr:
+            import librosa
+            pooled = librosa.resample(pooled, orig_sr=sr, target_sr=target_sr)
+        waveforms.append(pooled)
+        print(f"[speaker_verif] Cluster {label}: {len(regions[label])} regions, "
+              f"{len(pooled) / target_sr:.1f}s pooled")
+
+    embeddings_np = embed_waveforms(verifier, waveforms, target_sr, max_batch_samples, max_batch_rows,
+                                    label="speaker clusters")
+    return labels, embeddings_np
 
 def cosine_similarity(vec1, vec2):
     v1 = np.array(vec1).flatten()
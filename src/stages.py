@@ -0,0 +1,84 @@
+"""
+Stage scheduler: run independent pipeline stages concurrently on threads and record
+per-stage metrics (profiling.timed).
+
+Usage:
+    scheduler = StageScheduler(timings, prefix="transcription.")
+    with torch_threads(4):                      # one budget for the overlapped section
+        diarization = scheduler.submit("diarization", diarize_pipeline, audio)
+        result = scheduler.run("asr", model.transcribe, audio)
+        diarize_segments = diarization.result()   # join point
+    scheduler.shutdown()
+
+The torch intra-op thread count is process-wide, so it is only ever changed from the
+thread driving the pipeline: once around a section of overlapping stages, or per
+stage with run(..., threads=n) when nothing runs in the background. Stages started
+with submit() never touch it.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .profiling import timed
+
+
+def auto_thread_budgets(asr_threads: int, concurrent: bool, cores: int = None) -> dict:
+    """
+    Split `cores` (default: all of them) between ASR (CTranslate2), alignment and diarization.
+    With concurrent diarization both torch stages share one process-wide count: the cores ASR
+    leaves free.
+    """
+    cores = cores or os.cpu_count() or 1
+    if not concurrent:
+        return {"align": cores, "diarization": cores}
+    torch_budget = max(1, cores - asr_threads)
+    return {"align": torch_budget, "diarization": torch_budget}
+
+
+@contextmanager
+def torch_threads(n):
+    """
+    Temporarily set the process-wide torch intra-op thread count (None/0 = leave unchanged).
+    Only use it from the thread driving the pipeline, never from concurrently running stages.
+    """
+    if not n:
+        yield
+        return
+    import torch
+    previous = torch.get_num_threads()
+    torch.set_num_threads(int(n))
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+class StageScheduler:
+    """Runs stages inline or on background threads and records their metrics into `timings`."""
+
+    def __init__(self, timings: dict = None, prefix: str = "", max_workers: int = 2):
+        self.timings = timings if timings is not None else {}
+        self.prefix = prefix
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage")
+
+    def _timed_call(self, name, fn, threads, args, kwargs):
+        # threads is only passed for stages on the calling thread (see run)
+        try:
+            with timed(self.prefix + name, self.timings), torch_threads(threads):
+                return fn(*args, **kwargs)
+        finally:
+            record = self.timings.get(self.prefix + name, {})
+            budget = f", {threads} threads" if threads else ""
+            print(f"[stages] {name} finished in {record.get('seconds', 0.0):.2f}s{budget}")
+
+    def run(self, name, fn, *args, threads=None, **kwargs):
+        """Run a stage on the calling thread, under `threads` torch threads if given."""
+        return self._timed_call(name, fn, threads, args, kwargs)
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Start a stage on a background thread, under the current torch thread count; returns a Future."""
+        return self._pool.submit(self._timed_call, name, fn, None, args, kwargs)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,219 @@
+"""
+Streaming, chunked processing for multi-hour recordings with bounded memory.
+
+The recording is read block by block (audio_utils.iter_audio_blocks) and cut into
+windows of about `window_seconds`. Each cut is moved to the quietest point near the
+target length (energy VAD), and every window carries `overlap_seconds` of the
+previous audio as left context; segments whose midpoint falls in that context
+belong to the previous window and are dropped.
+
+Each window is transcribed, aligned and diarized with the same warm models, and
+its diarized speakers are embedded once per window. SpeakerTracker links a
+window's local labels (SPEAKER_00, ...) to recording-wide speakers by embedding
+continuity, keeping a running centroid per speaker that is matched against the
+references. Finished lines are appended to the output files (writers.py) as each
+window completes, so neither the audio nor the transcript is ever fully held in memory.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from .audio_utils import iter_audio_blocks, find_quiet_point, SAMPLE_RATE
+from .transcription import transcribe_and_assign_speakers
+from .identification import compute_speaker_embeddings
+from .matching import normalize_rows
+from .speaker_utils import load_reference_matrix
+from .speaker_index import build_matcher
+from .models import load_models
+from .profiling import current_rss_mb, peak_rss_mb, format_mb
+from .writers import open_writers, segment_record
+
+
+def iter_windows(input_path, sr=SAMPLE_RATE, window_seconds=600.0, overlap_seconds=5.0,
+                 search_seconds=10.0, block_seconds=10.0):
+    """
+    Yield (chunk_start, core_start, chunk) tuples; sample offsets are absolute.
+    `chunk` covers [chunk_start, cut) where chunk_start = core_start - overlap.
+    Each cut is searched for within `search_seconds` of the target, so windows must be
+    longer than that.
+    """
+    if window_seconds <= search_seconds:
+        raise ValueError(f"window_seconds ({window_seconds}) must be greater than search_seconds ({search_seconds})")
+    window = int(window_seconds * sr)
+    overlap = int(overlap_seconds * sr)
+    search = int(search_seconds * sr)
+
+    buf = np.zeros(0, dtype=np.float32)
+    buf_start = 0      # absolute sample index of buf[0]
+    core_start = 0     # where the next window's own (non-overlap) audio begins
+    for block in iter_audio_blocks(input_path, sr=sr, block_seconds=block_seconds):
+        buf = np.concatenate([buf, block])
+        while buf_start + len(buf) - core_start >= window + search:
+            target = core_start + window - buf_start
+            cut = buf_start + find_quiet_point(buf, target - search, target + search, sr=sr)
+            chunk_start = max(buf_start, core_start - overlap)
+            yield chunk_start, core_start, buf[chunk_start - buf_start:cut - buf_start]
+            core_start = cut
+            # keep only what the next window needs (its overlap context onwards)
+            keep_from = max(0, core_start - overlap - buf_start)
+            buf = buf[keep_from:].copy()
+            buf_start += keep_from
+    if buf_start + len(buf) > core_start:
+        chunk_start = max(buf_start, core_start - overlap)
+        yield chunk_start, core_start, buf[chunk_start - buf_start:]
+
+
+class SpeakerTracker:
+    """Links per-window diarization labels to recording-wide speakers by embedding similarity."""
+
+    def __init__(self, link_threshold: float = 0.5):
+        self.link_threshold = link_threshold
+        self.sums = []      # running sum of unit embeddings per global speaker
+        self.counts = []
+
+    def centroids(self) -> np.ndarray:
+        return normalize_rows(np.stack(self.sums)) if self.sums else np.zeros((0, 0), dtype=np.float32)
+
+    def link(self, local_ids, embeddings) -> dict:
+        """Map each local label to a global speaker index, creating new speakers as needed."""
+        if not len(local_ids):
+            return {}
+        vecs = normalize_rows(np.asarray(embeddings).reshape(len(local_ids), -1))
+        mapping = {}
+        if self.sums:
+            scores = vecs @ self.centroids().T
+            # greedy one-to-one assignment, best pairs first
+            taken = set()
+            for flat in np.argsort(-scores, axis=None):
+                li, gi = divmod(int(flat), scores.shape[1])
+                if scores[li, gi] < self.link_threshold:
+                    break
+                if local_ids[li] in mapping or gi in taken:
+                    continue
+                mapping[local_ids[li]] = gi
+                taken.add(gi)
+        for li, local in enumerate(local_ids):
+            if local not in mapping:
+                self.sums.append(np.zeros(vecs.shape[1], dtype=np.float32))
+                self.counts.append(0)
+                mapping[local] = len(self.sums) - 1
+            gi = mapping[local]
+            self.sums[gi] += vecs[li]
+            self.counts[gi] += 1
+        return mapping
+
+
+def run_streaming_pipeline(
+    input_path: str,
+    ref_config_path: str = "config/references.json",
+    output_dir: str = "outputs",
+    hf_token: str = None,
+    model_name: str = "large-v2",
+    language: str = "en",
+    device: str = "cpu",
+    compute_type: str = "int8",
+    similarity_threshold: float = 0.37,
+    embed_max_batch_samples: int = 16000 * 120,
+    embed_max_batch_rows: int = 64,
+    embed_min_seconds: float = 1.0,
+    embed_merge_seconds: float = 8.0,
+    embed_max_seconds: float = 15.0,
+    embed_merge_gap_seconds: float = 1.5,
+    models=None,
+    asr_threads: int = 4,
+    matcher_backend: str = "exact",
+    index_nprobe: int = 8,
+    cluster_max_seconds: float = 30.0,
+    window_seconds: float = 600.0,
+    overlap_seconds: float = 5.0,
+    link_threshold: float = 0.5,
+    reference_hash: str = "sha1",
+    reference_sync_threads: int = 4,
+    ecapa_backend: str = "eager",
+    ecapa_threads: int = 0,
+    ecapa_interop_threads: int = 0,
+    output_formats="txt",
+    output_top_k: int = 3,
+    **transcription_options
+):
+    """
+    Process `input_path` window by window with flat memory use and append labelled
+    lines to `<output_dir>/<base>_result.txt` (and any other `output_formats`, with
+    recording-relative timings) as each window finishes.
+    Extra keyword arguments (concurrent_diarization, align_threads, ...) are passed
+    to transcribe_and_assign_speakers.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    output_file = os.path.join(output_dir, f"{base_name}_result.txt")
+
+    if models is None:
+        models = load_models(model_name=model_name, language=language, device=device,
+                             compute_type=compute_type, hf_token=hf_token, asr_threads=asr_threads,
+                             ecapa_backend=ecapa_backend, ecapa_threads=ecapa_threads,
+                             ecapa_interop_threads=ecapa_interop_threads)
+    ref_names, ref_matrix = load_reference_matrix(ref_config_path, models.verifier, hash_algo=reference_hash,
+                                                  threads=reference_sync_threads)
+    matcher = build_matcher(ref_names, ref_matrix, backend=matcher_backend, nprobe=index_nprobe)
+    tracker = SpeakerTracker(link_threshold=link_threshold)
+
+    start = time.perf_counter()
+    lines = 0
+    audio_seconds = 0.0
+    with open_writers(output_formats, output_dir, base_name) as writers:
+        for window_no, (chunk_start, core_start, chunk) in enumerate(
+            iter_windows(input_path, window_seconds=window_seconds, overlap_seconds=overlap_seconds), start=1
+        ):
+            offset = chunk_start / SAMPLE_RATE
+            core_offset = core_start / SAMPLE_RATE
+            print(f"[streaming] Window {window_no}: {core_offset:.1f}s-{offset + len(chunk) / SAMPLE_RATE:.1f}s")
+
+            result = transcribe_and_assign_speakers(
+                chunk, model_name=model_name, language=language, device=device,
+                compute_type=compute_type, hf_token=hf_token, models=models,
+                asr_threads=asr_threads, **transcription_options
+            )
+            # segments starting in the overlap context were already written by the previous window
+            segments = [s for s in result.get("segments", [])
+                        if offset + (s["start"] + s["end"]) / 2 >= core_offset]
+
+            embeddings = compute_speaker_embeddings(
+                models.verifier, chunk, SAMPLE_RATE, segments, mode="cluster",
+                cluster_max_seconds=cluster_max_seconds,
+                max_batch_samples=embed_max_batch_samples, max_batch_rows=embed_max_batch_rows,
+                min_seconds=embed_min_seconds, merge_seconds=embed_merge_seconds, max_seconds=embed_max_seconds,
+                merge_gap_seconds=embed_merge_gap_seconds
+            )
+            mapping = tracker.link(embeddings["cluster_ids"], embeddings["cluster_embeddings"])
+            global_matches = list(zip(*matcher.match(tracker.centroids(), threshold=similarity_threshold,
+                                                     top_k=output_top_k))) if tracker.sums else []
+
+            per_segment = {}
+            if len(embeddings["segment_indices"]):
+                seg_matches = zip(*matcher.match(embeddings["segment_embeddings"], threshold=similarity_threshold,
+                                                 top_k=output_top_k))
+                per_segment = dict(zip(embeddings["segment_indices"], seg_matches))
+
+            for i, seg in enumerate(segments):
+                if i in per_segment:
+                    speaker, names, scores = per_segment[i]
+                elif seg.get("speaker") in mapping:
+                    speaker, names, scores = global_matches[mapping[seg["speaker"]]]
+                else:
+                    continue
+                writers.write(segment_record(lines, seg, speaker, names, scores, offset=offset))
+                lines += 1
+            writers.flush()
+
+            audio_seconds = (chunk_start + len(chunk)) / SAMPLE_RATE
+            elapsed = time.perf_counter() - start
+            print(f"[streaming] Window {window_no} done: {len(segments)} segments, "
+                  f"{len(tracker.sums)} speakers so far, RTF {elapsed / max(audio_seconds, 1e-9):.2f}, "
+                  f"RSS {format_mb(current_rss_mb())} (process high-water {format_mb(peak_rss_mb())})")
+            del chunk, result, segments, embeddings
+
+    print(f"[streaming] Done. {lines} lines for {audio_seconds:.1f}s of audio written to: {output_file}")
+    return {"input_path": input_path, "output_file": output_file, "output_files": writers.paths, "lines": lines,
+            "audio_seconds": audio_seconds, "seconds": time.perf_counter() - start}
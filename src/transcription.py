@@ -1,46 +1,148 @@
 """
 Wrap WhisperX transcription, alignment and diarization.
 
-Function:
-  transcribe_and_assign_speakers(wav_path, model_name, language, device, compute_type, hf_token)
+Functions:
+  load_asr_model / load_alignment_model / load_diarization_pipeline
+    -> build the individual WhisperX model handles (so callers can keep them warm)
+  transcribe_and_assign_speakers(audio, model_name, language, device, compute_type, hf_token, models)
     -> returns whisperx-style 'result' dict with segments and assigned speakers
 
 Notes:
   - model_name, language, device, compute_type are passed so they can be changed at runtime.
   - hf_token is used for any HF model downloads that require authentication (e.g. diarization pipeline).
+  - audio is the shared 16 kHz float32 buffer from audio_utils.load_audio; a path is
+    still accepted and decoded once here.
+  - models is an optional src.models.PipelineModels; any handle it holds is reused
+    instead of being loaded again.
+  - diarization only needs the audio, so by default it runs on a background thread
+    while ASR and alignment run, and is joined at assign_word_speakers. Thread budgets
+    (asr_threads for CTranslate2, align_threads / diarize_threads for torch) keep the
+    overlapping stages from oversubscribing the CPU; 0 means "auto". The torch count is
+    process-wide, so while diarization overlaps the other stages it is set once, to
+    diarize_threads, and align_threads only applies when diarization runs afterwards.
+  - asr_batch_size / asr_chunk_size are the VAD chunks transcribed per batch and their
+    maximum length in seconds (see asr_tuning.py for sizing them to the machine).
+  - whisperx is imported on first use, and models missing from `models` come from the
+    shared registry in src.models (built once per process, on demand).
 """
 
-import whisperx
+from .audio_utils import load_audio
+from .stages import StageScheduler, auto_thread_budgets, torch_threads
+from .profiling import timed
+from .models import get_model
+
+def load_asr_model(model_name="large-v2", language="en", device="cpu", compute_type="int8", threads=4):
+    """Load a WhisperX model for transcription (model loading may download weights)."""
+    import whisperx
+
+    print(f"[transcription] Loading WhisperX model '{model_name}' on device '{device}' "
+          f"(compute: {compute_type}, threads: {threads})...")
+    return whisperx.load_model(model_name, device=device, compute_type=compute_type, language=language,
+                               threads=threads)
+
+def load_alignment_model(language="en", device="cpu"):
+    """Load the wav2vec2 alignment model for `language`; returns (align_model, metadata)."""
+    import whisperx
+
+    print(f"[transcription] Loading alignment model for '{language}'...")
+    return whisperx.load_align_model(language_code=language, device=device)
+
+def load_diarization_pipeline(hf_token=None, device="cpu"):
+    """Load the pyannote diarization pipeline (requires HF token for some models)."""
+    import whisperx.diarize
+
+    print("[transcription] Loading diarization pipeline (this may download diarization models)...")
+    return whisperx.diarize.DiarizationPipeline(use_auth_token=hf_token, device=device)
+
+def _diarize(audio, models, hf_token, device, timings):
+    if models is not None and models.diarizer is not None:
+        diarize_pipeline = models.diarizer
+    else:
+        with timed("transcription.load_diarization", timings):
+            diarize_pipeline = get_model("diarizer", hf_token=hf_token, device=device)
+    print("[transcription] Running diarization...")
+    return diarize_pipeline(audio)
+
+def _transcribe(audio, models, model_name, language, device, compute_type, asr_threads, batch_size, chunk_size,
+                timings):
+    if models is not None and models.asr is not None:
+        model = models.asr
+    else:
+        with timed("transcription.load_asr", timings):
+            model = get_model("asr", model_name=model_name, language=language, device=device,
+                              compute_type=compute_type, threads=asr_threads)
+    print(f"[transcription] Running transcription (batch size {batch_size}, chunks up to {chunk_size}s)...")
+    # returns {'text', 'segments', ...}
+    return model.transcribe(audio, batch_size=batch_size, chunk_size=chunk_size)
+
+def _align(segments, audio, models, language, device, timings):
+    if models is not None and models.align_model is not None:
+        align_model, metadata = models.align_model, models.align_metadata
+    else:
+        with timed("transcription.load_alignment", timings):
+            align_model, metadata = get_model("alignment", language=language, device=device)
+    import whisperx
+
+    print("[transcription] Aligning words...")
+    return whisperx.align(segments, align_model, metadata, audio, device)
 
 def transcribe_and_assign_speakers(
-    wav_path: str,
+    audio,
     model_name: str = "large-v2",
     language: str = "en",
     device: str = "cpu",
     compute_type: str = "int8",
-    hf_token: str = None
+    hf_token: str = None,
+    models=None,
+    concurrent_diarization: bool = True,
+    asr_threads: int = 4,
+    align_threads: int = 0,
+    diarize_threads: int = 0,
+    asr_batch_size: int = 16,
+    asr_chunk_size: int = 30,
+    timings: dict = None
 ):
-    # Load a WhisperX model for transcription (model loading may download weights)
-    print(f"[transcription] Loading WhisperX model '{model_name}' on device '{device}' (compute: {compute_type})...")
-    model = whisperx.load_model(model_name, device=device, compute_type=compute_type, language=language)
+    # Transcribe the shared buffer (decode here only if we were handed a path)
+    if isinstance(audio, str):
+        print(f"[transcription] Loading audio from '{audio}'...")
+        audio = load_audio(audio)
 
-    # Load audio and transcribe
-    print("[transcription] Loading audio and running transcription...")
-    audio = whisperx.load_audio(wav_path)
-    result = model.transcribe(audio, batch_size=16)  # returns {'text', 'segments', ...}
+    budgets = auto_thread_budgets(asr_threads, concurrent_diarization)
+    align_threads = align_threads or budgets["align"]
+    diarize_threads = diarize_threads or budgets["diarization"]
 
-    # Alignment (word-level timing)
-    print("[transcription] Loading alignment model and aligning words...")
-    align_model, metadata = whisperx.load_align_model(language_code=language, device=device)
-    result = whisperx.align(result["segments"], align_model, metadata, audio, device)
+    timings = timings if timings is not None else {}
+    scheduler = StageScheduler(timings, prefix="transcription.")
+    try:
+        if concurrent_diarization:
+            # Diarization depends only on the audio: start it first so it overlaps ASR + alignment.
+            # The torch thread count is process-wide, so it is set once for the whole overlap.
+            with torch_threads(diarize_threads):
+                print(f"[transcription] torch threads: {diarize_threads} while diarization overlaps ASR")
+                diarization = scheduler.submit("diarization", _diarize, audio, models, hf_token, device,
+                                               timings)
+                result = scheduler.run("asr", _transcribe, audio, models, model_name, language, device,
+                                       compute_type, asr_threads, asr_batch_size, asr_chunk_size, timings)
+                result = scheduler.run("alignment", _align, result["segments"], audio, models, language,
+                                       device, timings)
+                # Join point: diarization must be finished before speakers are assigned
+                diarize_segments = diarization.result()
+        else:
+            result = scheduler.run("asr", _transcribe, audio, models, model_name, language, device,
+                                   compute_type, asr_threads, asr_batch_size, asr_chunk_size, timings)
 
-    # Diarization: produce speaker segments (requires HF token for some models)
-    print("[transcription] Running diarization (this may download diarization models)...")
-    diarize_pipeline = whisperx.diarize.DiarizationPipeline(use_auth_token=hf_token, device=device)
-    diarize_segments = diarize_pipeline(audio)
+            # Alignment (word-level timing)
+            result = scheduler.run("alignment", _align, result["segments"], audio, models, language, device,
+                                   timings, threads=align_threads)
+            diarize_segments = scheduler.run("diarization", _diarize, audio, models, hf_token, device,
+                                             timings, threads=diarize_threads)
+    finally:
+        scheduler.shutdown()
 
     # Combine diarization with aligned transcription to assign speaker labels to words/segments
+    import whisperx
+
     print("[transcription] Assigning word speakers to transcription segments...")
-    result = whisperx.assign_word_speakers(diarize_segments, result)
+    result = scheduler.run("assign_speakers", whisperx.assign_word_speakers, diarize_segments, result)
 
     return result
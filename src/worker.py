@@ -0,0 +1,202 @@
+"""
+Long-lived pipeline worker: load the WhisperX, alignment, diarization and ECAPA
+models once, keep them warm, and run jobs against them.
+
+Transports:
+  - spool directory: drop `<id>.json` job files into `<spool>/incoming/`; the worker
+    claims them into `processing/` and writes the outcome to `done/` or `failed/`.
+  - local socket: newline-delimited JSON over TCP on 127.0.0.1. Each request line
+    gets exactly one response line. `{"op": "ping"}` answers once models are loaded.
+
+Job format:
+    {"id": "optional-id", "input_path": "meeting.m4a", "options": {"similarity_threshold": 0.4}}
+
+Only per-job options listed in JOB_OPTIONS may be overridden; model choice, language
+and device are fixed when the worker starts.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+
+from .pipeline import run_pipeline
+
+JOB_OPTIONS = (
+    "ref_config_path",
+    "output_dir",
+    "similarity_threshold",
+    "embed_max_batch_samples",
+    "embed_max_batch_rows",
+    "concurrent_diarization",
+    "align_threads",
+    "diarize_threads",
+    "matcher_backend",
+    "speaker_id_mode",
+    "cluster_max_seconds",
+)
+
+
+class PipelineWorker:
+    """Runs jobs one at a time against a shared set of warm models."""
+
+    def __init__(self, models, defaults: dict):
+        self.models = models
+        self.defaults = dict(defaults)
+        self._lock = threading.Lock()
+        self.jobs_done = 0
+
+    def run_job(self, job: dict) -> dict:
+        job_id = job.get("id") or uuid.uuid4().hex
+        input_path = job.get("input_path")
+        options = {k: v for k, v in (job.get("options") or {}).items() if k in JOB_OPTIONS}
+        ignored = set(job.get("options") or {}) - set(options)
+        if ignored:
+            print(f"[worker] Job {job_id}: ignoring non-overridable options {sorted(ignored)}")
+
+        start = time.perf_counter()
+        if not input_path or not os.path.exists(input_path):
+            return {"id": job_id, "status": "error", "error": f"file not found: {input_path}"}
+
+        kwargs = {**self.defaults, **options}
+        try:
+            # models are not thread-safe; serialise jobs on this worker
+            with self._lock:
+                result = run_pipeline(input_path=input_path, models=self.models, **kwargs)
+                self.jobs_done += 1
+        except Exception as e:
+            print(f"[worker] Job {job_id} failed: {e}")
+            return {"id": job_id, "status": "error", "error": str(e),
+                    "latency_s": time.perf_counter() - start}
+
+        return {"id": job_id, "status": "ok", "result": result,
+                "latency_s": time.perf_counter() - start}
+
+
+# ----------------------------
+# Spool directory transport
+# ----------------------------
+def _spool_dirs(spool_dir: str) -> dict:
+    dirs = {name: os.path.join(spool_dir, name) for name in ("incoming", "processing", "done", "failed")}
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+    return dirs
+
+
+def _write_json_atomic(path: str, payload: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+def serve_spool(worker: PipelineWorker, spool_dir: str, poll_interval: float = 0.5, stop_event=None):
+    """Poll `<spool_dir>/incoming` for job files and process them in arrival order."""
+    dirs = _spool_dirs(spool_dir)
+    print(f"[worker] Watching spool directory '{spool_dir}' (Ctrl+C to stop)...")
+    while stop_event is None or not stop_event.is_set():
+        pending = sorted(
+            (f for f in os.listdir(dirs["incoming"]) if f.endswith(".json")),
+            key=lambda f: os.path.getmtime(os.path.join(dirs["incoming"], f))
+        )
+        if not pending:
+            time.sleep(poll_interval)
+            continue
+
+        for name in pending:
+            claimed = os.path.join(dirs["processing"], name)
+            try:
+                # rename is atomic, so only one worker can claim a job file
+                os.replace(os.path.join(dirs["incoming"], name), claimed)
+            except FileNotFoundError:
+                continue
+
+            try:
+                with open(claimed, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                job = {}
+                response = {"id": name[:-5], "status": "error", "error": f"invalid job file: {e}"}
+            else:
+                job.setdefault("id", name[:-5])
+                print(f"[worker] Spool job {job['id']}: {job.get('input_path')}")
+                response = worker.run_job(job)
+
+            target = "done" if response["status"] == "ok" else "failed"
+            _write_json_atomic(os.path.join(dirs[target], name), response)
+            os.remove(claimed)
+
+
+def submit_spool_job(spool_dir: str, input_path: str, options: dict = None, job_id: str = None) -> str:
+    """Queue a job in the spool directory and return its id."""
+    dirs = _spool_dirs(spool_dir)
+    job_id = job_id or uuid.uuid4().hex
+    job = {"id": job_id, "input_path": os.path.abspath(input_path), "options": options or {}}
+    _write_json_atomic(os.path.join(dirs["incoming"], f"{job_id}.json"), job)
+    return job_id
+
+
+def wait_spool_result(spool_dir: str, job_id: str, timeout: float = None, poll_interval: float = 0.2) -> dict:
+    """Block until the job's result file appears in done/ or failed/."""
+    dirs = _spool_dirs(spool_dir)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while deadline is None or time.monotonic() < deadline:
+        for target in ("done", "failed"):
+            path = os.path.join(dirs[target], f"{job_id}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        time.sleep(poll_interval)
+    raise TimeoutError(f"job {job_id} did not finish within {timeout}s")
+
+
+# ----------------------------
+# Local socket transport
+# ----------------------------
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {"status": "error", "error": f"invalid JSON: {e}"}
+            else:
+                if request.get("op") == "ping":
+                    response = {"status": "ok", "jobs_done": self.server.worker.jobs_done}
+                else:
+                    response = self.server.worker.run_job(request)
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _JobServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_socket(worker: PipelineWorker, host: str = "127.0.0.1", port: int = 8765):
+    """Serve newline-delimited JSON jobs on a local TCP socket until interrupted."""
+    with _JobServer((host, port), _JobHandler) as server:
+        server.worker = worker
+        print(f"[worker] Listening on {host}:{port} (Ctrl+C to stop)...")
+        server.serve_forever()
+
+
+def submit_job(input_path: str = None, host: str = "127.0.0.1", port: int = 8765,
+               options: dict = None, timeout: float = None, request: dict = None) -> dict:
+    """Send one job (or a raw `request`, e.g. a ping) to a socket worker and wait for the response."""
+    if request is None:
+        request = {"input_path": os.path.abspath(input_path), "options": options or {}}
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("worker closed the connection without a response")
+    return json.loads(line)
@@ -0,0 +1,222 @@
+"""
+Pluggable, streaming output writers.
+
+Each labelled segment becomes one record, written to every selected format as soon
+as it is produced; nothing keeps the whole transcript in memory:
+
+  - "txt":     `[speaker]: text` lines (the classic `<base>_result.txt`, always written)
+  - "jsonl":   one JSON object per segment
+  - "srt":     SubRip subtitles, `[speaker] text` cues
+  - "vtt":     WebVTT subtitles with `<v speaker>` voice tags
+  - "parquet": columnar Parquet, one row group per `batch_rows` segments (needs pyarrow)
+  - "arrow":   Arrow IPC file, same schema (needs pyarrow)
+
+A record holds: index, start, end, speaker (matched name or "Unknown"),
+diarized_speaker (SPEAKER_00, ...), score (top-1 cosine), top_k
+([{"speaker", "score"}, ...]), text and words ([{"word", "start", "end", "score"}]).
+
+    with open_writers(["txt", "jsonl", "parquet"], "outputs", "meeting") as writers:
+        writers.write(segment_record(0, seg, "Amit", ["Amit", "Mudit"], [0.71, 0.42]))
+"""
+
+import json
+import math
+import os
+
+TEXT_BUFFER_BYTES = 1 << 16
+OUTPUT_FORMATS = ("txt", "jsonl", "srt", "vtt", "parquet", "arrow")
+
+
+def _num(value):
+    """float or None (whisperx leaves NaN / missing timings on some words)."""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def segment_record(index: int, seg: dict, speaker: str, top_names=(), top_scores=(), offset: float = 0.0) -> dict:
+    """Build the output record for one whisperx segment; `offset` shifts all timings (seconds)."""
+    def shift(t):
+        t = _num(t)
+        return None if t is None else t + offset
+
+    top_k = [{"speaker": name, "score": _num(score)} for name, score in zip(top_names, top_scores)]
+    return {
+        "index": index,
+        "start": shift(seg.get("start")),
+        "end": shift(seg.get("end")),
+        "speaker": speaker,
+        "diarized_speaker": seg.get("speaker"),
+        "score": top_k[0]["score"] if top_k else None,
+        "top_k": top_k,
+        "text": seg.get("text", "").strip(),
+        "words": [{"word": w.get("word", ""), "start": shift(w.get("start")), "end": shift(w.get("end")),
+                   "score": _num(w.get("score"))} for w in seg.get("words", ())],
+    }
+
+
+class TextWriter:
+    """Base for line-oriented formats: a buffered text file and one `format(record)` per segment."""
+
+    extension = ".txt"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8", buffering=TEXT_BUFFER_BYTES)
+        self._f.write(self.header())
+
+    def header(self) -> str:
+        return ""
+
+    def format(self, record: dict) -> str:
+        return f"[{record['speaker']}]: {record['text']}\n"
+
+    def write(self, record: dict):
+        self._f.write(self.format(record))
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class JsonlWriter(TextWriter):
+    extension = ".jsonl"
+
+    def format(self, record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _timestamp(seconds, sep: str) -> str:
+    ms = int(round((seconds or 0.0) * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+
+class SrtWriter(TextWriter):
+    extension = ".srt"
+
+    def __init__(self, path: str):
+        self.cues = 0
+        super().__init__(path)
+
+    def format(self, record: dict) -> str:
+        self.cues += 1
+        return (f"{self.cues}\n{_timestamp(record['start'], ',')} --> {_timestamp(record['end'], ',')}\n"
+                f"[{record['speaker']}] {record['text']}\n\n")
+
+
+class VttWriter(TextWriter):
+    extension = ".vtt"
+
+    def header(self) -> str:
+        return "WEBVTT\n\n"
+
+    def format(self, record: dict) -> str:
+        return (f"{_timestamp(record['start'], '.')} --> {_timestamp(record['end'], '.')}\n"
+                f"<v {record['speaker']}>{record['text']}\n\n")
+
+
+class ArrowWriter:
+    """Parquet or Arrow IPC output, flushed every `batch_rows` records (pyarrow is optional)."""
+
+    def __init__(self, path: str, fmt: str = "parquet", batch_rows: int = 1024):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.path = path
+        self.batch_rows = batch_rows
+        self.rows = []
+        candidate = pa.struct([("speaker", pa.string()), ("score", pa.float32())])
+        word = pa.struct([("word", pa.string()), ("start", pa.float64()), ("end", pa.float64()),
+                          ("score", pa.float32())])
+        self.schema = pa.schema([
+            ("index", pa.int32()), ("start", pa.float64()), ("end", pa.float64()),
+            ("speaker", pa.string()), ("diarized_speaker", pa.string()), ("score", pa.float32()),
+            ("top_k", pa.list_(candidate)), ("text", pa.string()), ("words", pa.list_(word)),
+        ])
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, record: dict):
+        self.rows.append(record)
+        if len(self.rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self._writer.write_table(self.pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+WRITERS = {
+    "txt": TextWriter,
+    "jsonl": JsonlWriter,
+    "srt": SrtWriter,
+    "vtt": VttWriter,
+}
+
+
+class OutputWriters:
+    """Fan one stream of records out to several writers; `paths` maps format -> file."""
+
+    def __init__(self, writers: dict):
+        self.writers = writers
+        self.paths = {fmt: w.path for fmt, w in writers.items()}
+        self.count = 0
+
+    def write(self, record: dict):
+        for writer in self.writers.values():
+            writer.write(record)
+        self.count += 1
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_writers(formats, output_dir: str, base_name: str, batch_rows: int = 1024) -> OutputWriters:
+    """
+    Open `<output_dir>/<base_name>_result.<ext>` for every format (list or comma-separated
+    string). "txt" is always included. Unknown formats, and parquet / arrow without
+    pyarrow, are skipped with a warning.
+    """
+    if isinstance(formats, str):
+        formats = [f.strip().lower() for f in formats.split(",")]
+    formats = ["txt"] + [f for f in dict.fromkeys(formats or ()) if f and f != "txt"]
+    os.makedirs(output_dir, exist_ok=True)
+    writers = {}
+    for fmt in formats:
+        if fmt not in OUTPUT_FORMATS:
+            print(f"[writers] Unknown output format '{fmt}', skipping")
+            continue
+        path = os.path.join(output_dir, f"{base_name}_result.{fmt}")
+        if fmt in WRITERS:
+            writers[fmt] = WRITERS[fmt](path)
+            continue
+        try:
+            writers[fmt] = ArrowWriter(path, fmt=fmt, batch_rows=batch_rows)
+        except ImportError:
+            print(f"[writers] '{fmt}' output needs pyarrow (pip install pyarrow), skipping")
+    return OutputWriters(writers)
@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+import torch
+
+from src import batch
+
+
+def test_output_names_keep_unique_file_names():
+    names = batch.output_names(["a/x.wav", "a/y.m4a"])
+    assert names == {"a/x.wav": "x", "a/y.m4a": "y"}
+
+
+def test_output_names_disambiguate_shared_file_names():
+    names = batch.output_names(["a/x.wav", "b/x.wav", "c/z.wav"])
+    assert names["c/z.wav"] == "z"
+    assert names["a/x.wav"] != names["b/x.wav"]
+    assert all(names[p].startswith("x_") for p in ("a/x.wav", "b/x.wav"))
+    assert batch.output_names(["b/x.wav", "a/x.wav"]) == {k: names[k] for k in ("b/x.wav", "a/x.wav")}
+    assert batch.output_path_for("a/x.wav", "out", names["a/x.wav"]) == \
+        os.path.join("out", f"{names['a/x.wav']}_result.txt")
+
+
+def test_init_worker_splits_only_its_own_cores(monkeypatch):
+    import src.models
+
+    loaded = {}
+    monkeypatch.setattr(src.models, "load_models", lambda **kwargs: loaded.update(kwargs) or "models")
+    previous = torch.get_num_threads()
+    options = {"model_name": "tiny", "language": "en", "device": "cpu", "compute_type": "int8",
+               "asr_threads": 4, "align_threads": 0, "diarize_threads": 0, "concurrent_diarization": True}
+    try:
+        batch._init_worker(options, threads=3)
+    finally:
+        torch.set_num_threads(previous)
+    worker = batch._WORKER_OPTIONS
+    assert worker["asr_threads"] == 3 and loaded["asr_threads"] == 3
+    assert 1 <= worker["align_threads"] <= 3
+    assert 1 <= worker["diarize_threads"] <= 3
+
+
+def _fake_pool(monkeypatch, output_dir, runs):
+    """Threads instead of worker processes; the fake job writes the transcript and report run_pipeline would."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run_one(input_path, overrides):
+        runs.append(input_path)
+        base = overrides["output_name"]
+        with open(os.path.join(output_dir, f"{base}_result.txt"), "w", encoding="utf-8") as f:
+            f.write(input_path)
+        with open(os.path.join(output_dir, f"{base}_report.json"), "w", encoding="utf-8") as f:
+            json.dump({"input_path": input_path}, f)
+        return {"status": "ok", "output_file": f"{base}_result.txt", "seconds": 0.0}
+
+    monkeypatch.setattr(batch, "_run_one", run_one)
+    monkeypatch.setattr(batch, "ProcessPoolExecutor",
+                        lambda max_workers, mp_context, initializer, initargs: ThreadPoolExecutor(max_workers))
+
+
+@pytest.mark.parametrize("first, second", [
+    (["a/x.wav"], ["a/x.wav", "b/x.wav"]),   # a same-named file is added
+    (["a/x.wav", "b/x.wav"], ["a/x.wav"]),   # ... or dropped
+    (["b/x.wav"], ["a/x.wav"]),              # a different file takes the plain name
+])
+def test_rerun_finds_outputs_when_file_name_collisions_change(monkeypatch, tmp_path, first, second):
+    output_dir = str(tmp_path / "outputs")
+    for name in ("a/x.wav", "b/x.wav"):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_bytes(b"RIFF")
+    runs = []
+    _fake_pool(monkeypatch, output_dir, runs)
+    options = {"output_dir": output_dir}
+
+    batch.run_batch([str(tmp_path / p) for p in first], options, workers=1, ffmpeg_jobs=0)
+    transcripts = sorted(os.listdir(output_dir))
+    runs.clear()
+    summary = batch.run_batch([str(tmp_path / p) for p in second], options, workers=1, ffmpeg_jobs=0)
+
+    new = [p for p in second if p not in first]
+    assert sorted(runs) == sorted(str(tmp_path / p) for p in new)
+    assert summary["skipped"] == len(second) - len(new)
+    results = [f for f in os.listdir(output_dir) if f.endswith("_result.txt")]
+    assert len(results) == len(set(first) | set(second))   # no input written twice
+    for f in results:   # and every transcript belongs to the input its report names
+        with open(os.path.join(output_dir, f), encoding="utf-8") as fh:
+            assert batch._written_for(output_dir, f[:-len("_result.txt")]) == fh.read()
+    assert set(transcripts) <= set(os.listdir(output_dir))
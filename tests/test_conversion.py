@@ -0,0 +1,75 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src import conversion
+from src.conversion import INDEX_FILE, AudioConverter
+
+
+@pytest.fixture
+def converter(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversion, "load_audio", lambda path, sr=16000: np.full(160, len(path), np.float32))
+    monkeypatch.setattr(AudioConverter, "needs_conversion", staticmethod(lambda path, sr=16000: True))
+    return AudioConverter(str(tmp_path / "cache"))
+
+
+def _inputs(tmp_path, n):
+    paths = []
+    for i in range(n):
+        path = tmp_path / f"in{i}.m4a"
+        path.write_bytes(f"audio {i}".encode())
+        paths.append(str(path))
+    return paths
+
+
+def _index(converter):
+    with open(os.path.join(converter.cache_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_convert_many_writes_index_once(converter, tmp_path, monkeypatch):
+    paths = _inputs(tmp_path, 4)
+    writes = []
+    original = conversion.ResultCache._write_atomic
+    monkeypatch.setattr(conversion.ResultCache, "_write_atomic", staticmethod(
+        lambda path, write: (writes.append(os.path.basename(path)), original(path, write))[1]))
+
+    assert converter.convert_many(paths) == {}
+    assert writes.count(INDEX_FILE) == 1
+    index = _index(converter)
+    assert sorted(index) == sorted(os.path.abspath(p) for p in paths)
+    assert all(len(entry["files"]) == 1 for entry in index.values())
+
+
+def test_load_hits_after_convert(converter, tmp_path):
+    path = _inputs(tmp_path, 1)[0]
+    status = {}
+    first = converter.load(path, status=status)
+    assert status["cache"] == "miss"
+    second = AudioConverter(converter.cache_dir).load(path, status=status)
+    assert status["cache"] == "hit"
+    np.testing.assert_array_equal(first, second)
+
+
+def test_index_prunes_missing_sources_and_evicted_entries(converter, tmp_path):
+    gone, evicted, kept, new = _inputs(tmp_path, 4)
+    converter.convert_many([gone, evicted, kept])
+    index = _index(converter)
+    os.remove(gone)
+    os.remove(os.path.join(converter.cache_dir, index[os.path.abspath(evicted)]["files"][0]))
+
+    fresh = AudioConverter(converter.cache_dir)
+    fresh.load(new)
+    assert sorted(_index(fresh)) == sorted(os.path.abspath(p) for p in (kept, new))
+
+
+def test_index_merges_concurrent_writers(converter, tmp_path):
+    a, b = _inputs(tmp_path, 2)
+    other = AudioConverter(converter.cache_dir)
+    converter._load_index()   # both loaded the index before either wrote
+    other._load_index()
+    converter.load(a)
+    other.load(b)
+    assert sorted(_index(converter)) == sorted(os.path.abspath(p) for p in (a, b))
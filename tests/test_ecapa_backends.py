@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import torch
+
+from src.ecapa_backends import optimize_verifier
+
+
+class _Net(torch.nn.Module):
+    def __init__(self, layer):
+        super().__init__()
+        self.layer = layer
+
+    def forward(self, feats, wav_lens=None):
+        if isinstance(self.layer, torch.nn.Conv1d):
+            return self.layer(feats.transpose(1, 2)).mean(dim=2, keepdim=True).transpose(1, 2)
+        return self.layer(feats).mean(dim=1, keepdim=True)
+
+
+def _verifier(layer):
+    torch.manual_seed(0)
+    mods = SimpleNamespace(
+        embedding_model=_Net(layer),
+        compute_features=lambda wavs: wavs[:, :wavs.shape[1] // 160 * 160].reshape(len(wavs), -1, 160)[..., :16],
+        mean_var_norm=lambda feats, wav_lens: feats,
+    )
+    return SimpleNamespace(mods=mods, device="cpu")
+
+
+def test_int8_quantizes_linear_layers(tmp_path):
+    verifier = optimize_verifier(_verifier(torch.nn.Linear(16, 8)), backend="int8", cache_dir=str(tmp_path))
+    assert verifier.backend == "int8"
+    assert verifier.encode_batch(torch.randn(2, 16000)).shape == (2, 1, 8)
+
+
+def test_int8_refused_when_nothing_is_quantized(tmp_path, capsys):
+    verifier = optimize_verifier(_verifier(torch.nn.Conv1d(16, 8, 3)), backend="int8", cache_dir=str(tmp_path))
+    assert verifier.backend == "eager"
+    assert "replaced 0 nn.Linear layers" in capsys.readouterr().out
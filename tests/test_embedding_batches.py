@@ -0,0 +1,32 @@
+from src.speaker_verification import plan_length_buckets
+
+
+def test_every_index_is_planned_once():
+    lengths = [5, 1, 9, 3, 7, 2, 8]
+    buckets = plan_length_buckets(lengths, max_batch_samples=20, max_batch_rows=64)
+    assert sorted(i for b in buckets for i in b) == list(range(len(lengths)))
+
+
+def test_buckets_are_sorted_longest_first_and_within_budget():
+    lengths = [5, 1, 9, 3, 7, 2, 8, 4]
+    buckets = plan_length_buckets(lengths, max_batch_samples=20, max_batch_rows=64)
+    flat = [lengths[i] for b in buckets for i in b]
+    assert flat == sorted(lengths, reverse=True)
+    for bucket in buckets:
+        # padded cost is rows x the first (longest) item
+        assert len(bucket) * lengths[bucket[0]] <= 20 or len(bucket) == 1
+
+
+def test_row_cap():
+    buckets = plan_length_buckets([1] * 10, max_batch_samples=10 ** 6, max_batch_rows=3)
+    assert [len(b) for b in buckets] == [3, 3, 3, 1]
+
+
+def test_oversized_item_gets_its_own_batch():
+    buckets = plan_length_buckets([100, 2, 2], max_batch_samples=10)
+    assert buckets[0] == [0]
+    assert sorted(buckets[1]) == [1, 2]
+
+
+def test_empty():
+    assert plan_length_buckets([], max_batch_samples=10) == []
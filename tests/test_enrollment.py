@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from src.enrollment import speaker_centroids
+from src.matching import speaker_of
+from src.speaker_index import SpeakerMatcher
+from src.speaker_utils import enroll_directory, load_reference_matrix
+
+
+def _clip_embeddings(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_centroid_is_the_unit_mean_of_unit_clip_embeddings():
+    embs = _clip_embeddings(6)
+    centroid, subs = speaker_centroids(embs)
+    assert subs.shape == (0, 8)
+    unit = embs / np.linalg.norm(embs, axis=1, keepdims=True)
+    expected = unit.mean(axis=0) / np.linalg.norm(unit.mean(axis=0))
+    np.testing.assert_allclose(centroid, expected, rtol=1e-5, atol=1e-6)
+    # a loud clip does not outweigh the others
+    scaled = embs.copy()
+    scaled[0] *= 100
+    np.testing.assert_allclose(speaker_centroids(scaled)[0], centroid, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("clips, k, expected", [(1, 3, 0), (3, 3, 0), (4, 3, 2), (5, 3, 2), (6, 3, 3), (20, 3, 3)])
+def test_sub_centroids_need_two_clips_each(clips, k, expected):
+    _, subs = speaker_centroids(_clip_embeddings(clips), sub_centroids=k)
+    assert subs.shape == (expected, 8)
+    if expected:
+        np.testing.assert_allclose(np.linalg.norm(subs, axis=1), 1.0, rtol=1e-5)
+
+
+def _write_clips(folder, profile, n):
+    """`n` clips whose decoded samples (see the clip_audio fixture) follow `profile` with a little noise."""
+    folder.mkdir(parents=True)
+    rng = np.random.default_rng(len(profile) + n)
+    for i in range(n):
+        samples = np.clip(np.asarray(profile) + rng.integers(-8, 8, len(profile)), 0, 255)
+        (folder / f"clip{i}.wav").write_bytes(bytes(samples.astype(np.uint8).tolist()))
+
+
+def test_enroll_then_match_round_trip(tmp_path, monkeypatch, clip_audio, fake_verifier):
+    monkeypatch.chdir(tmp_path)   # load_reference_matrix uses the default ./refs store
+    high_low, low_high = [250] * 4 + [10] * 4 + [0] * 8, [10] * 4 + [250] * 4 + [0] * 8
+    _write_clips(tmp_path / "speakers" / "alice", high_low, 6)
+    _write_clips(tmp_path / "speakers" / "bob", low_high, 3)
+
+    _, keys = enroll_directory("speakers", fake_verifier, "references.json", sub_centroids=2, threads=1)
+    assert sorted(keys) == ["alice", "alice#1", "alice#2", "bob"]   # bob has too few clips for sub-centroids
+
+    names, matrix = load_reference_matrix("references.json", fake_verifier, threads=1)
+    assert sorted(names) == sorted(keys) and fake_verifier.rows == 9   # nothing re-embedded
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-5)
+
+    matcher = SpeakerMatcher(names, matrix, normalized=True)
+    queries = np.asarray([high_low[:8], low_high[:8]], np.float32) / 255.0 + 1.0
+    labels, _, _ = matcher.match(queries, threshold=0.9, top_k=2)
+    assert [speaker_of(label) for label in labels] == ["alice", "bob"]
@@ -0,0 +1,47 @@
+from src.identification import plan_segment_windows
+
+
+def _segments(*spans):
+    return [{"start": start, "end": end, "speaker": speaker} for start, end, speaker in spans]
+
+
+def _plan(segments, **kwargs):
+    return plan_segment_windows(segments, list(range(len(segments))), **kwargs)
+
+
+def test_merges_consecutive_same_speaker_segments():
+    segments = _segments((0.0, 2.0, "A"), (2.2, 4.0, "A"), (4.1, 6.0, "B"))
+    assert _plan(segments)["windows"] == [[0, 1], [2]]
+
+
+def test_does_not_merge_across_another_speakers_short_segment():
+    # B's fragment is too short to embed, but A's two turns are still not contiguous
+    segments = _segments((0.0, 3.0, "A"), (3.1, 3.5, "B"), (3.6, 6.0, "A"))
+    plan = _plan(segments)
+    assert plan["windows"] == [[0], [2]]
+    assert plan["inherit"] == {1: 1}   # no B window: nearest in time
+
+
+def test_merges_across_same_speaker_short_fragment():
+    segments = _segments((0.0, 3.0, "A"), (3.1, 3.4, "A"), (3.5, 6.0, "A"))
+    plan = _plan(segments)
+    assert plan["windows"] == [[0, 2]]
+    assert set(plan["inherit"]) == {1}
+
+
+def test_respects_max_gap():
+    segments = _segments((0.0, 2.0, "A"), (5.0, 7.0, "A"), (7.5, 9.0, "A"))
+    assert _plan(segments, merge_gap_seconds=1.0)["windows"] == [[0], [1, 2]]
+    assert _plan(segments, merge_gap_seconds=0)["windows"] == [[0, 1, 2]]
+
+
+def test_respects_merge_length_and_limits_off():
+    segments = _segments((0.0, 5.0, "A"), (5.1, 10.0, "A"), (10.1, 12.0, "A"))
+    assert _plan(segments, merge_seconds=8.0)["windows"] == [[0], [1, 2]]
+    assert _plan(segments, merge_seconds=0)["windows"] == [[0], [1], [2]]
+
+
+def test_all_short_segments_are_embedded():
+    segments = _segments((0.0, 0.5, "A"), (0.6, 0.9, "B"))
+    plan = _plan(segments)
+    assert plan["windows"] == [[0], [1]] and plan["inherit"] == {}
@@ -0,0 +1,46 @@
+import numpy as np
+
+from src import live
+from src.live import LiveCaptioner
+
+
+def _frames(levels, frame=480, seed=0):
+    """One frame of noise per entry, scaled to that RMS."""
+    rng = np.random.default_rng(seed)
+    for level in levels:
+        x = rng.standard_normal(frame).astype(np.float32)
+        yield x * (level / np.sqrt(np.mean(x ** 2)))
+
+
+def _speech_levels(n, seed=1):
+    """Speech-like frame RMS: mostly 0.03-0.2, never near silence."""
+    return np.random.default_rng(seed).uniform(0.03, 0.2, n)
+
+
+def test_stream_opening_mid_utterance_is_captioned():
+    captioner = LiveCaptioner(None, None, None, vad_threshold=0.01)
+    decisions = [captioner._is_speech(f) for f in _frames(_speech_levels(200))]
+    assert all(decisions)
+    assert captioner.noise_floor <= captioner.vad_threshold * live.NOISE_FLOOR_MAX
+
+
+def test_noise_floor_is_capped_below_speech():
+    captioner = LiveCaptioner(None, None, None, vad_threshold=0.01)
+    # loud background just under the running threshold keeps nudging the floor up
+    for f in _frames([0.019] * 500):
+        captioner._is_speech(f)
+    assert captioner.noise_floor <= captioner.vad_threshold * live.NOISE_FLOOR_MAX
+    assert all(captioner._is_speech(f) for f in _frames(_speech_levels(50)))
+
+
+def test_background_noise_above_vad_threshold_is_learned():
+    captioner = LiveCaptioner(None, None, None, vad_threshold=0.01)
+    decisions = [captioner._is_speech(f) for f in _frames([0.012] * 300)]
+    assert not any(decisions[-100:])
+
+
+def test_feed_opens_an_utterance_at_the_first_speech_frame():
+    captioner = LiveCaptioner(None, None, None, vad_threshold=0.01, partial_interval=1e9, max_utterance=1e9)
+    captioner.feed(np.concatenate(list(_frames(_speech_levels(20)))))
+    assert captioner._utt_start == 0
+    assert len(captioner._utterance) == 20
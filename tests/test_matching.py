@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from src.matching import UNKNOWN, SpeakerMatcher, normalize_rows
+from src.speaker_index import IVFIndex
+
+
+def _roster(n=200, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    names = [f"spk{i}" for i in range(n)]
+    return names, rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def _queries(matrix, n=40, noise=0.3, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(matrix), n, replace=False)
+    return matrix[picks] + noise * rng.standard_normal((n, matrix.shape[1])).astype(np.float32)
+
+
+def test_exact_top_k_matches_brute_force():
+    names, matrix = _roster()
+    queries = _queries(matrix)
+    matcher = SpeakerMatcher(names, matrix)
+    indices, scores = matcher.top_k(queries, k=5, chunk_elements=1000)
+
+    brute = normalize_rows(queries) @ normalize_rows(matrix).T
+    expected = np.argsort(-brute, axis=1)[:, :5]
+    np.testing.assert_array_equal(indices, expected)
+    np.testing.assert_allclose(scores, np.take_along_axis(brute, expected, axis=1), rtol=1e-5)
+
+
+def test_match_threshold_and_subcentroids():
+    matrix = np.eye(3, dtype=np.float32)
+    matcher = SpeakerMatcher(["Amit", "Amit#1", "Bea"], matrix)
+    queries = np.array([[0.0, 1.0, 0.1], [0.0, 0.0, 1.0], [-1.0, -1.0, -1.0]], dtype=np.float32)
+    labels, top_names, top_scores = matcher.match(queries, threshold=0.5, top_k=2)
+    assert labels == ["Amit", "Bea", UNKNOWN]
+    assert top_names[0] == ["Amit", "Bea"]   # Amit's two rows count once
+    assert top_scores.shape == (3, 2)
+
+
+def test_ivf_probing_every_cell_equals_exact():
+    names, matrix = _roster()
+    queries = _queries(matrix)
+    index = IVFIndex(names, matrix, nlist=8, nprobe=8)
+    exact = SpeakerMatcher(names, matrix)
+    for k in (1, 3):
+        got_idx, got_scores = index.top_k(queries, k=k)
+        exp_idx, exp_scores = exact.top_k(queries, k=k)
+        np.testing.assert_array_equal(got_idx, exp_idx)
+        np.testing.assert_allclose(got_scores, exp_scores, rtol=1e-5)
+    assert index.match(queries, top_k=3)[:2] == exact.match(queries, top_k=3)[:2]
+
+
+def test_ivf_recall_with_partial_probe():
+    names, matrix = _roster(n=1000, seed=3)
+    queries = _queries(matrix, n=100, noise=0.2, seed=4)
+    index = IVFIndex(names, matrix, nprobe=8)
+    assert len(index.centroids) > 8
+    hits = np.mean(index.top_k(queries, k=1)[0][:, 0] == SpeakerMatcher(names, matrix).top_k(queries, k=1)[0][:, 0])
+    assert hits >= 0.9
+
+
+def test_ivf_sync_keeps_parity():
+    names, matrix = _roster(n=64)
+    refs = dict(zip(names, matrix))
+    index = IVFIndex(names, matrix, nlist=4, nprobe=4)
+    rng = np.random.default_rng(7)
+    del refs["spk3"]
+    refs["spk5"] = rng.standard_normal(matrix.shape[1]).astype(np.float32)
+    refs["new"] = rng.standard_normal(matrix.shape[1]).astype(np.float32)
+    assert index.sync(refs)
+    assert not index.sync(refs)
+    assert sorted(index.names) == sorted(refs)
+
+    exact = SpeakerMatcher.from_dict(refs)
+    queries = _queries(np.stack(list(refs.values())), n=20)
+    got = index.top_k(queries, k=3)
+    want = exact.top_k(queries, k=3)
+    assert [[index.names[i] for i in row] for row in got[0]] == [[exact.names[i] for i in row] for row in want[0]]
+    np.testing.assert_allclose(got[1], want[1], rtol=1e-5)
+
+
+def test_ivf_save_load_roundtrip(tmp_path):
+    names, matrix = _roster(n=100)
+    queries = _queries(matrix, n=10)
+    index = IVFIndex(names, matrix, nlist=6, nprobe=2)
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = IVFIndex.load(path)
+    assert loaded.names == index.names
+    for a, b in zip(loaded.top_k(queries, k=3), index.top_k(queries, k=3)):
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.parametrize("cls", [SpeakerMatcher, IVFIndex])
+def test_empty_roster(cls):
+    labels, top_names, top_scores = cls([], np.zeros((0, 0), np.float32)).match(np.ones((2, 4)))
+    assert labels == [UNKNOWN, UNKNOWN]
+    assert top_names == [[], []]
+    assert top_scores.shape == (2, 0)
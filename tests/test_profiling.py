@@ -0,0 +1,29 @@
+import numpy as np
+
+from src.profiling import print_timings, timed, write_prometheus
+
+
+def test_timed_records_rss_change_and_high_water(capsys):
+    timings = {}
+    with timed("alloc", timings, audio_seconds=10.0):
+        block = np.ones(64 * 1024 * 1024 // 8)   # 64 MB, touched
+    record = timings["alloc"]
+    assert record["rtf"] == record["seconds"] / 10.0
+    if record["rss_delta_mb"] is not None:
+        assert record["rss_delta_mb"] > 32
+    del block
+
+    print_timings(timings)
+    out = capsys.readouterr().out
+    assert "RSS high-water" in out and "peak RSS" not in out
+
+
+def test_prometheus_labels_high_water(tmp_path):
+    timings = {}
+    with timed("stage", timings):
+        pass
+    path = tmp_path / "metrics.prom"
+    write_prometheus(str(path), timings, job="j")
+    text = path.read_text()
+    assert "speaker_id_stage_rss_delta_megabytes" in text
+    assert "high-water" in text
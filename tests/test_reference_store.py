@@ -0,0 +1,179 @@
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src import reference_store
+from src.reference_store import ReferenceStore
+
+
+def _vec(seed, dim=8):
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_put_and_reload(tmp_path):
+    store = ReferenceStore(str(tmp_path))
+    store.put("a", _vec(0), hash="h0")
+    store.put("b", _vec(1), hash="h1")
+    store.commit()
+
+    reopened = ReferenceStore(str(tmp_path))
+    assert reopened.names() == ["a", "b"]
+    assert reopened.get("b")["hash"] == "h1"
+    names, matrix = reopened.matrix()
+    assert isinstance(matrix, np.memmap)   # compact store: zero-copy
+    np.testing.assert_allclose(matrix[1], _vec(1), rtol=1e-6)
+
+
+def test_replace_and_delete_tombstone_rows(tmp_path):
+    store = ReferenceStore(str(tmp_path), compact_ratio=1.0)
+    for i, name in enumerate("abcd"):
+        store.put(name, _vec(i))
+    store.put("b", _vec(10))
+    store.delete("c")
+    store.commit()
+
+    reopened = ReferenceStore(str(tmp_path), compact_ratio=1.0)
+    assert reopened.rows == 5
+    assert reopened.deleted == {1, 2}
+    assert reopened.names() == ["a", "d", "b"]
+    np.testing.assert_allclose(reopened.embedding("b"), _vec(10), rtol=1e-6)
+    names, matrix = reopened.matrix()
+    assert names == ["a", "d", "b"] and matrix.shape == (3, 8)
+
+
+def test_commit_compacts_past_threshold(tmp_path):
+    store = ReferenceStore(str(tmp_path), compact_ratio=0.25)
+    for i, name in enumerate("abcd"):
+        store.put(name, _vec(i))
+    store.delete("a")
+    store.delete("b")
+    store.commit()
+
+    assert store.rows == 2 and not store.deleted
+    matrices = [f for f in os.listdir(tmp_path) if f.endswith(".f32")]
+    assert matrices == [os.path.basename(store.matrix_path)]
+    reopened = ReferenceStore(str(tmp_path))
+    assert reopened.names() == ["c", "d"]
+    assert [reopened.get(n)["row"] for n in ("c", "d")] == [0, 1]
+    np.testing.assert_allclose(reopened.embedding("d"), _vec(3), rtol=1e-6)
+
+    reopened.put("e", _vec(4))   # appends to the compacted file
+    reopened.commit()
+    np.testing.assert_allclose(ReferenceStore(str(tmp_path)).embedding("e"), _vec(4), rtol=1e-6)
+
+
+def test_crash_before_index_switch_keeps_old_store(tmp_path, monkeypatch):
+    store = ReferenceStore(str(tmp_path))
+    for i, name in enumerate("abc"):
+        store.put(name, _vec(i))
+    store.commit()
+    store.delete("a")
+
+    def crash(self):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ReferenceStore, "_save_index", crash)
+    with pytest.raises(OSError):
+        store.compact()
+    monkeypatch.undo()
+
+    reopened = ReferenceStore(str(tmp_path))
+    assert reopened.names() == ["a", "b", "c"]
+    np.testing.assert_allclose(reopened.embedding("c"), _vec(2), rtol=1e-6)
+    reopened.delete("a")
+    reopened.compact()   # a later compaction clears the stranded file
+    assert [f for f in os.listdir(tmp_path) if f.endswith(".f32")] == [os.path.basename(reopened.matrix_path)]
+    assert ReferenceStore(str(tmp_path)).names() == ["b", "c"]
+
+
+def test_uncompacted_store_keeps_original_file_name(tmp_path):
+    store = ReferenceStore(str(tmp_path))
+    store.put("a", _vec(0))
+    store.commit()
+    assert os.path.basename(store.matrix_path) == reference_store.MATRIX_FILE
+
+
+# ----------------------------
+# sync_reference_store
+# ----------------------------
+@pytest.fixture
+def references(tmp_path, clip_audio, monkeypatch):
+    """references.json over two single-clip speakers, and a counter of content hashes."""
+    from src import speaker_utils
+
+    clips = {"alice": tmp_path / "alice.wav", "bob": tmp_path / "bob.wav"}
+    for i, path in enumerate(clips.values()):
+        path.write_bytes(bytes(range(10 * i, 10 * i + 16)))
+    config = tmp_path / "references.json"
+    config.write_text(json.dumps({name: str(path) for name, path in clips.items()}))
+    hashed = []
+    original = speaker_utils.file_hash
+    monkeypatch.setattr(speaker_utils, "file_hash", lambda path, algo="sha1": hashed.append(path) or original(path, algo))
+    return SimpleNamespace(config=str(config), clips=clips, hashed=hashed, store_dir=str(tmp_path / "refs"))
+
+
+def _sync(references, verifier):
+    from src.speaker_utils import sync_reference_store
+
+    store = ReferenceStore(references.store_dir, compact_ratio=1.0)
+    return sync_reference_store(references.config, verifier, store=store, threads=1)
+
+
+def test_sync_unchanged_stat_skips_hash_and_embedding(references, fake_verifier):
+    _, keys = _sync(references, fake_verifier)
+    assert keys == ["alice", "bob"] and fake_verifier.rows == 2
+    references.hashed.clear()
+
+    store, keys = _sync(references, fake_verifier)
+    assert keys == ["alice", "bob"]
+    assert references.hashed == [] and fake_verifier.rows == 2
+
+
+def test_sync_touched_file_is_hashed_but_not_reembedded(references, fake_verifier):
+    _sync(references, fake_verifier)
+    references.hashed.clear()
+    alice = str(references.clips["alice"])
+    mtime_ns = os.stat(alice).st_mtime_ns + 5 * 10 ** 9
+    os.utime(alice, ns=(mtime_ns, mtime_ns))
+
+    store, _ = _sync(references, fake_verifier)
+    assert references.hashed == [alice] and fake_verifier.rows == 2
+    assert store.rows == 2   # no new row written
+    assert ReferenceStore(references.store_dir).get("alice")["mtime_ns"] == mtime_ns   # update_meta persisted
+
+
+def test_sync_changed_content_is_reembedded(references, fake_verifier):
+    store, _ = _sync(references, fake_verifier)
+    before = store.embedding("alice").copy()
+    references.clips["alice"].write_bytes(bytes(range(100, 120)))
+
+    store, keys = _sync(references, fake_verifier)
+    assert sorted(keys) == ["alice", "bob"] and fake_verifier.rows == 3
+    assert not np.allclose(store.embedding("alice"), before)
+    reopened = ReferenceStore(references.store_dir)
+    np.testing.assert_allclose(reopened.embedding("alice"), store.embedding("alice"))
+    assert reopened.get("alice")["hash"] != reopened.get("bob")["hash"]
+
+
+def test_sync_removed_reference_is_tombstoned(references, fake_verifier):
+    store, _ = _sync(references, fake_verifier)
+    bob_row = store.get("bob")["row"]
+    with open(references.config, "w", encoding="utf-8") as f:
+        json.dump({"alice": str(references.clips["alice"])}, f)
+
+    store, keys = _sync(references, fake_verifier)
+    assert keys == ["alice"] and fake_verifier.rows == 2
+    reopened = ReferenceStore(references.store_dir, compact_ratio=1.0)
+    assert reopened.names() == ["alice"] and reopened.deleted == {bob_row}
+
+
+def test_sync_missing_file_is_left_out_of_the_keys(references, fake_verifier):
+    _sync(references, fake_verifier)
+    os.remove(references.clips["bob"])
+
+    store, keys = _sync(references, fake_verifier)
+    assert keys == ["alice"] and "bob" in store
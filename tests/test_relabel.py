@@ -0,0 +1,99 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.matching import SpeakerMatcher
+from src.relabel import load_sidecar, relabel_outputs, sidecar_path, write_sidecar
+from src.writers import OUTPUT_FORMATS, open_writers, segment_record
+
+DIM = 8
+
+
+def _unit(i):
+    v = np.zeros(DIM, dtype=np.float32)
+    v[i] = 1.0
+    return v
+
+
+def _run(output_dir, formats):
+    """What run_pipeline leaves behind for a two-speaker meeting matched against Amit only."""
+    segments = [
+        {"start": 0.0, "end": 2.5, "text": " hello there", "speaker": "SPEAKER_00",
+         "words": [{"word": "hello", "start": 0.1, "end": 0.6, "score": 0.9}]},
+        {"start": 3.0, "end": 5.0, "text": " hi", "speaker": "SPEAKER_01", "words": []},
+        {"start": 5.5, "end": 7.0, "text": " how are you", "speaker": "SPEAKER_00", "words": []},
+    ]
+    embeddings = {"cluster_ids": ["SPEAKER_00", "SPEAKER_01"],
+                  "cluster_embeddings": np.stack([_unit(0), _unit(1)]),
+                  "segment_indices": [], "segment_embeddings": np.zeros((0, DIM), np.float32)}
+    matcher = SpeakerMatcher(["Amit", "Bea"], np.stack([_unit(0), _unit(2)]))
+    cluster_labels, cluster_names, cluster_scores = matcher.match(embeddings["cluster_embeddings"], top_k=2)
+    row = {"SPEAKER_00": 0, "SPEAKER_01": 1}
+    labels = [cluster_labels[row[s["speaker"]]] for s in segments]
+    top_names = [cluster_names[row[s["speaker"]]] for s in segments]
+    top_scores = [cluster_scores[row[s["speaker"]]] for s in segments]
+
+    with open_writers(formats, str(output_dir), "meeting") as writers:
+        for n, seg in enumerate(segments):
+            writers.write(segment_record(n, seg, labels[n], top_names[n], top_scores[n]))
+    output_file = writers.paths["txt"]
+    write_sidecar(sidecar_path(output_file), embeddings, segments, segments, labels, top_scores,
+                  threshold=0.37, top_k=2)
+    return output_file
+
+
+def _new_roster():
+    return SpeakerMatcher(["Amit", "Bea", "Cleo"], np.stack([_unit(0), _unit(2), _unit(1)]))
+
+
+def test_relabel_rewrites_jsonl_and_srt(tmp_path):
+    output_file = _run(tmp_path, ["txt", "jsonl", "srt", "vtt"])
+    assert "[Unknown]: hi" in open(output_file, encoding="utf-8").read()
+
+    summary = relabel_outputs(str(tmp_path), _new_roster())
+    assert summary["changed"] == {output_file: 1}
+
+    assert open(output_file, encoding="utf-8").read().splitlines() == [
+        "[Amit]: hello there", "[Cleo]: hi", "[Amit]: how are you"]
+    records = [json.loads(line) for line in open(tmp_path / "meeting_result.jsonl", encoding="utf-8")]
+    assert [r["speaker"] for r in records] == ["Amit", "Cleo", "Amit"]
+    assert records[1]["diarized_speaker"] == "SPEAKER_01"
+    assert records[1]["top_k"][0] == {"speaker": "Cleo", "score": pytest.approx(1.0)}
+    assert len(records[1]["top_k"]) == 2
+    assert records[0]["words"][0]["word"] == "hello"
+    assert records[2]["start"] == pytest.approx(5.5)
+    srt = open(tmp_path / "meeting_result.srt", encoding="utf-8").read()
+    assert "2\n00:00:03,000 --> 00:00:05,000\n[Cleo] hi\n" in srt
+    assert "<v Cleo>hi" in open(tmp_path / "meeting_result.vtt", encoding="utf-8").read()
+    assert not [f for f in os.listdir(tmp_path) if f.startswith(".relabel-")]
+
+    assert load_sidecar(sidecar_path(output_file))["labels"] == ["Amit", "Cleo"]
+    assert relabel_outputs(str(tmp_path), _new_roster())["changed"] == {}
+
+
+@pytest.mark.parametrize("fmt", [f for f in OUTPUT_FORMATS if f != "txt"])
+def test_relabel_regenerates_every_format(tmp_path, fmt):
+    if fmt in ("parquet", "arrow"):
+        pytest.importorskip("pyarrow")
+    _run(tmp_path, ["txt", fmt])
+    relabel_outputs(str(tmp_path), _new_roster())
+    path = tmp_path / f"meeting_result.{fmt}"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        assert pq.read_table(path).column("speaker").to_pylist() == ["Amit", "Cleo", "Amit"]
+    elif fmt == "arrow":
+        import pyarrow as pa
+        assert pa.ipc.open_file(str(path)).read_all().column("speaker").to_pylist() == ["Amit", "Cleo", "Amit"]
+    else:
+        text = path.read_text(encoding="utf-8")
+        assert "Cleo" in text and "Unknown" not in text
+
+
+def test_dry_run_changes_nothing(tmp_path):
+    output_file = _run(tmp_path, ["txt", "jsonl"])
+    before = {f: (tmp_path / f).read_bytes() for f in os.listdir(tmp_path)}
+    summary = relabel_outputs(str(tmp_path), _new_roster(), dry_run=True)
+    assert summary["changed"] == {output_file: 1}
+    assert {f: (tmp_path / f).read_bytes() for f in os.listdir(tmp_path)} == before
@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import pipeline
+from src.result_cache import STATS_FILE, ResultCache, evict_lru
+from src.speaker_index import SpeakerMatcher
+
+
+def _embeddings(dim=8):
+    return {
+        "mode": "cluster",
+        "cluster_ids": ["SPEAKER_00"],
+        "cluster_embeddings": np.ones((1, dim), np.float32),
+        "segment_indices": [],
+        "segment_embeddings": np.zeros((0, dim), np.float32),
+    }
+
+
+def _files(cache_dir):
+    return sorted(name for _, _, names in os.walk(cache_dir) for name in names if name != STATS_FILE)
+
+
+def test_keys_are_stable_and_audio_keys_follow_content(tmp_path):
+    a, b, c = (tmp_path / n for n in ("a.wav", "b.wav", "c.wav"))
+    a.write_bytes(b"same audio")
+    b.write_bytes(b"same audio")
+    c.write_bytes(b"other audio")
+    assert ResultCache.audio_key(str(a)) == ResultCache.audio_key(str(b)) != ResultCache.audio_key(str(c))
+    assert ResultCache.make_key("x", 1, None) == ResultCache.make_key("x", 1, None)
+    assert ResultCache.make_key("x", 1) != ResultCache.make_key(1, "x")
+
+
+def test_transcript_and_embeddings_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    assert cache.load_transcript("k1") is None and cache.load_embeddings("k1") is None
+    cache.save_transcript("k1", {"segments": [{"start": np.float32(0.5), "words": np.arange(2)}]})
+    cache.save_embeddings("k1", _embeddings())
+    assert cache.load_transcript("k1") == {"segments": [{"start": 0.5, "words": [0, 1]}]}
+    loaded = cache.load_embeddings("k1")
+    assert loaded["mode"] == "cluster" and loaded["cluster_ids"] == ["SPEAKER_00"]
+    np.testing.assert_array_equal(loaded["cluster_embeddings"], _embeddings()["cluster_embeddings"])
+    assert loaded["segment_embeddings"].shape == (0, 8) and loaded["segment_indices"] == []
+    assert cache.stats == {"transcript": {"hits": 1, "misses": 1}, "embeddings": {"hits": 1, "misses": 1}}
+
+
+def test_evict_lru_keeps_the_cache_under_its_cap(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    (cache_dir / STATS_FILE).write_bytes(b"x" * 500)
+    for i in range(5):
+        path = cache_dir / f"entry{i}"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+    os.utime(cache_dir / "entry0", (2000, 2000))   # most recently used
+
+    evict_lru(str(cache_dir), 250, skip=(STATS_FILE,))
+    assert _files(cache_dir) == ["entry0", "entry4"]
+    assert (cache_dir / STATS_FILE).exists()
+
+
+def test_lookup_refreshes_lru_position(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    for key in ("old", "new"):
+        cache.save_transcript(key, {"segments": ["x" * 100]})
+    for i, key in enumerate(("old", "new")):
+        os.utime(cache._path(key, ".transcript.json"), (1000 + i, 1000 + i))
+    cache.load_transcript("old")
+    size = os.path.getsize(cache._path("old", ".transcript.json"))
+    cache.max_bytes = size
+    cache.evict()
+    assert _files(cache.cache_dir) == ["old.transcript.json"]
+
+
+@pytest.fixture
+def fake_pipeline(tmp_path, monkeypatch):
+    """run_pipeline with the models replaced; counts how often each cached stage really runs."""
+    runs = {"transcription": 0, "embeddings": 0}
+    references = {"names": ["Amit"]}
+
+    def transcribe(audio, **kwargs):
+        runs["transcription"] += 1
+        return {"segments": [{"start": 0.0, "end": 2.0, "text": "hi", "speaker": "SPEAKER_00"}]}
+
+    def embed(verifier, audio, sr, segments, **kwargs):
+        runs["embeddings"] += 1
+        return _embeddings()
+
+    def load_references(path, verifier, **kwargs):
+        names = references["names"]
+        return names, np.eye(len(names), 8, dtype=np.float32)
+
+    monkeypatch.setattr(pipeline, "load_audio", lambda path, sr=16000: np.zeros(sr * 2, np.float32))
+    monkeypatch.setattr(pipeline, "transcribe_and_assign_speakers", transcribe)
+    monkeypatch.setattr(pipeline, "compute_speaker_embeddings", embed)
+    monkeypatch.setattr(pipeline, "load_reference_matrix", load_references)
+    monkeypatch.setattr(pipeline, "build_matcher", lambda names, matrix, **kw: SpeakerMatcher(names, matrix))
+    audio = tmp_path / "meeting.wav"
+    audio.write_bytes(b"RIFF audio")
+
+    def run(**options):
+        pipeline.run_pipeline(str(audio), output_dir=str(tmp_path / "outputs"), audio_cache_dir=None,
+                              cache_dir=str(tmp_path / "cache"), **options)
+        return dict(runs)
+
+    run.references = references
+    return run
+
+
+def test_threshold_or_reference_changes_reuse_cached_stages(fake_pipeline):
+    assert fake_pipeline() == {"transcription": 1, "embeddings": 1}
+    assert fake_pipeline(similarity_threshold=0.9) == {"transcription": 1, "embeddings": 1}
+    fake_pipeline.references["names"] = ["Amit", "Priya"]
+    assert fake_pipeline(matcher_backend="exact", output_top_k=2) == {"transcription": 1, "embeddings": 1}
+
+
+@pytest.mark.parametrize("options, transcribed", [
+    ({"model_name": "medium"}, True),
+    ({"compute_type": "float32"}, True),
+    ({"language": "de"}, True),
+    ({"asr_chunk_size": 15}, True),
+    ({"speaker_id_mode": "segment"}, False),
+    ({"cluster_max_seconds": 10.0}, False),
+    ({"ecapa_backend": "onnx"}, False),
+    ({"embed_merge_gap_seconds": 0.5}, False),
+])
+def test_model_and_identification_changes_miss(fake_pipeline, options, transcribed):
+    fake_pipeline()
+    assert fake_pipeline(**options) == {"transcription": 1 + transcribed, "embeddings": 2}
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import service
+
+
+class Server:
+    """A JobService on an ephemeral port, with threads standing in for the worker processes."""
+
+    def __init__(self, monkeypatch, tmp_path, max_queue=4):
+        self.output_dir = tmp_path / "outputs"
+        self.output_dir.mkdir()
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        monkeypatch.setattr(service, "_run_one", self.run_one)
+        monkeypatch.setattr(service, "_worker_pid", lambda delay=0: threading.get_ident())
+        monkeypatch.setattr(service.JobService, "_new_executor", lambda svc: ThreadPoolExecutor(svc.workers))
+        self.service = service.JobService({}, workers=1, max_queue=max_queue,
+                                          upload_dir=str(tmp_path / "uploads"))
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.server = self._call(self._start())
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout=10)
+
+    async def _start(self):
+        await self.service.start()
+        return await asyncio.start_server(self.service.handle, "127.0.0.1", 0)
+
+    def run_one(self, input_path, overrides):
+        """Writes `<output_name>_result.txt` as run_pipeline does; fails for files named bad.*"""
+        self.calls.append((input_path, overrides))
+        self.gate.wait(10)
+        if os.path.basename(input_path).startswith("bad"):
+            return {"status": "error", "error": "boom"}
+        output_file = str(self.output_dir / f"{overrides['output_name']}_result.txt")
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(input_path)
+        return {"status": "ok", "output_file": output_file, "output_files": {"txt": output_file}, "segments": 1}
+
+    def close(self):
+        self.gate.set()
+        self.server.close()
+        self.service.shutdown()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def raw(self, data: bytes, shutdown: bool = False) -> tuple:
+        """(status, headers, JSON body) for one raw HTTP request; `shutdown` ends the body early."""
+        with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+            sock.sendall(data)
+            if shutdown:
+                sock.shutdown(socket.SHUT_WR)
+            response = b""
+            while chunk := sock.recv(65536):
+                response += chunk
+        head, body = response.split(b"\r\n\r\n", 1)
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        headers = dict(line.split(": ", 1) for line in header_lines)
+        return int(status_line.split()[1]), headers, json.loads(body)
+
+    def request(self, method: str, path: str, payload=None) -> tuple:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        return self.raw(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n"
+                        .encode("latin-1") + body)
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    server = Server(monkeypatch, tmp_path)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def audio(tmp_path):
+    paths = {}
+    for name in ("a/meeting.wav", "b/meeting.wav", "bad.wav"):
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"RIFF")
+        paths[name] = str(path)
+    return paths
+
+
+def test_jobs_with_the_same_file_name_get_their_own_outputs(server, audio):
+    ids = [server.request("POST", "/jobs", {"input_path": audio[name]})[2]["id"]
+           for name in ("a/meeting.wav", "b/meeting.wav")]
+    results = [server.request("GET", f"/jobs/{job_id}/result?wait=10") for job_id in ids]
+    assert [status for status, _, _ in results] == [200, 200]
+    assert [payload["transcript"] for _, _, payload in results] == [audio["a/meeting.wav"], audio["b/meeting.wav"]]
+    assert [overrides["output_name"] for _, overrides in server.calls] == ids
+    assert sorted(os.listdir(server.output_dir)) == sorted(f"{job_id}_result.txt" for job_id in ids)
+
+
+def test_duplicate_job_id_is_rejected(server, audio):
+    payload = {"input_path": audio["a/meeting.wav"], "id": "call-42"}
+    assert server.request("POST", "/jobs", payload)[:1] == (202,)
+    status, _, body = server.request("POST", "/jobs", dict(payload, input_path=audio["b/meeting.wav"]))
+    assert status == 409 and "call-42" in body["error"]
+    assert server.request("GET", "/jobs/call-42/result?wait=10")[2]["transcript"] == audio["a/meeting.wav"]
+
+
+@pytest.mark.parametrize("job_id", ["../x", "", "a" * 65, 7])
+def test_job_id_must_be_a_safe_file_name(server, audio, job_id):
+    status, _, _ = server.request("POST", "/jobs", {"input_path": audio["a/meeting.wav"], "id": job_id})
+    assert status == 400
+    assert server.service.jobs == {}
+
+
+def test_path_and_resource_options_cannot_be_overridden(server, audio):
+    options = {"similarity_threshold": 0.5, "output_formats": "jsonl,srt", "output_dir": "/etc",
+               "ref_config_path": "/tmp/refs.json", "align_threads": 64, "embed_max_batch_rows": 100000}
+    status, _, body = server.request("POST", "/jobs", {"input_path": audio["a/meeting.wav"], "options": options})
+    assert status == 202
+    assert body["ignored_options"] == ["align_threads", "embed_max_batch_rows", "output_dir", "ref_config_path"]
+    server.request("GET", f"/jobs/{body['id']}/result?wait=10")
+    assert server.calls[0][1] == {"similarity_threshold": 0.5, "output_formats": ["jsonl", "srt"],
+                                  "output_name": body["id"]}
+
+
+@pytest.mark.parametrize("options", [
+    {"similarity_threshold": "x"}, {"similarity_threshold": 2}, {"similarity_threshold": True},
+    {"output_top_k": 2.5}, {"output_top_k": 0}, {"speaker_id_mode": "frame"},
+    {"matcher_backend": None}, {"output_formats": ["txt", "docx"]}, {"cluster_max_seconds": 1e9},
+])
+def test_invalid_option_values_are_rejected_at_submit(server, audio, options):
+    status, _, body = server.request("POST", "/jobs", {"input_path": audio["a/meeting.wav"], "options": options})
+    assert status == 400 and next(iter(options)) in body["error"]
+    assert server.service.jobs == {}
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1.5"])
+def test_invalid_content_length_is_a_bad_request(server, length):
+    status, _, body = server.raw(f"POST /jobs HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}".encode("latin-1"))
+    assert status == 400 and "Content-Length" in body["error"]
+
+
+def test_truncated_json_body_is_a_bad_request(server, audio):
+    body = json.dumps({"input_path": audio["a/meeting.wav"]})
+    status, _, payload = server.raw(f"POST /jobs HTTP/1.1\r\nContent-Length: {len(body) + 10}\r\n\r\n{body}"
+                                    .encode("latin-1"), shutdown=True)
+    assert status == 400 and "Content-Length" in payload["error"]
+
+
+def test_missing_content_length(server):
+    assert server.raw(b"POST /jobs HTTP/1.1\r\nHost: test\r\n\r\n")[0] == 411
+
+
+@pytest.mark.parametrize("payload", [{"input_path": "/no/such.wav"}, {"input_path": ["x"]}, {}, [1, 2]])
+def test_submission_must_name_an_existing_file(server, payload):
+    assert server.request("POST", "/jobs", payload)[0] == 400
+
+
+@pytest.mark.parametrize("wait", ["soon", "nan", "-1"])
+def test_invalid_wait_is_a_bad_request(server, audio, wait):
+    job_id = server.request("POST", "/jobs", {"input_path": audio["a/meeting.wav"]})[2]["id"]
+    status, _, body = server.request("GET", f"/jobs/{job_id}/result?wait={wait}")
+    assert status == 400 and "wait" in body["error"]
+
+
+def test_unknown_job(server):
+    assert server.request("GET", "/jobs/nope/result")[0] == 404
+    assert server.request("GET", "/jobs/nope")[0] == 404
+
+
+def test_failed_job_result(server, audio):
+    job_id = server.request("POST", "/jobs", {"input_path": audio["bad.wav"]})[2]["id"]
+    status, _, body = server.request("GET", f"/jobs/{job_id}/result?wait=10")
+    assert status == 500 and body["status"] == "error" and body["error"] == "boom"
+
+
+def test_full_queue_is_rejected_with_retry_after(monkeypatch, tmp_path, audio):
+    server = Server(monkeypatch, tmp_path, max_queue=1)
+    try:
+        server.gate.clear()
+        first = server.request("POST", "/jobs", {"input_path": audio["a/meeting.wav"]})[2]["id"]
+        deadline = time.monotonic() + 10
+        while not server.calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server.request("POST", "/jobs", {"input_path": audio["b/meeting.wav"]})[0] == 202
+        status, headers, _ = server.request("POST", "/jobs", {"input_path": audio["a/meeting.wav"]})
+        assert status == 429 and int(headers["Retry-After"]) >= 1
+        assert server.request("GET", f"/jobs/{first}/result")[0] == 202
+        server.gate.set()
+        assert server.request("GET", f"/jobs/{first}/result?wait=10")[0] == 200
+    finally:
+        server.close()
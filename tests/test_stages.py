@@ -0,0 +1,42 @@
+import threading
+
+import torch
+
+from src.stages import StageScheduler, auto_thread_budgets, torch_threads
+
+
+def test_auto_budgets_use_given_cores():
+    assert auto_thread_budgets(3, concurrent=True, cores=4) == {"align": 1, "diarization": 1}
+    assert auto_thread_budgets(2, concurrent=True, cores=8) == {"align": 6, "diarization": 6}
+    assert auto_thread_budgets(8, concurrent=False, cores=2) == {"align": 2, "diarization": 2}
+
+
+def test_torch_threads_restores_count():
+    before = torch.get_num_threads()
+    with torch_threads(1):
+        assert torch.get_num_threads() == 1
+    assert torch.get_num_threads() == before
+
+
+def test_background_stage_leaves_thread_count_alone():
+    before = torch.get_num_threads()
+    seen = {}
+    started, release = threading.Event(), threading.Event()
+
+    def background():
+        started.set()
+        release.wait(5)
+        seen["background"] = torch.get_num_threads()
+
+    scheduler = StageScheduler({}, prefix="t.")
+    try:
+        future = scheduler.submit("background", background)
+        started.wait(5)
+        scheduler.run("inline", lambda: None, threads=1)
+        assert torch.get_num_threads() == before
+        release.set()
+        future.result()
+    finally:
+        scheduler.shutdown()
+    assert torch.get_num_threads() == before
+    assert seen["background"] == before
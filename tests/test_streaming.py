@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from src import streaming
+from src.streaming import SpeakerTracker, iter_windows
+
+SR = 100   # samples per second; small enough to make long "recordings" cheap
+
+
+def _recording(seconds, pauses=(), seed=0):
+    """Noise with silent half-second pauses at the given times."""
+    audio = np.random.default_rng(seed).uniform(0.2, 1.0, int(seconds * SR)).astype(np.float32)
+    for t in pauses:
+        audio[int(t * SR):int((t + 0.5) * SR)] = 0.0
+    return audio
+
+
+def _blocks(monkeypatch, audio, block=137):
+    monkeypatch.setattr(streaming, "iter_audio_blocks",
+                        lambda path, sr, block_seconds: (audio[i:i + block] for i in range(0, len(audio), block)))
+
+
+def _check_windows(windows, audio, overlap):
+    expected_core = 0
+    for chunk_start, core_start, chunk in windows:
+        assert core_start == expected_core   # cores tile the recording with no gap or repeat
+        assert chunk_start == max(0, core_start - overlap)
+        np.testing.assert_array_equal(chunk, audio[chunk_start:chunk_start + len(chunk)])
+        expected_core = chunk_start + len(chunk)
+    assert expected_core == len(audio)
+
+
+@pytest.mark.parametrize("seconds", [5, 60, 61, 250])
+def test_windows_cover_the_whole_input_with_overlap(monkeypatch, seconds):
+    audio = _recording(seconds)
+    _blocks(monkeypatch, audio)
+    windows = list(iter_windows("x.wav", sr=SR, window_seconds=60, overlap_seconds=5, search_seconds=10))
+    _check_windows(windows, audio, overlap=5 * SR)
+    for chunk_start, core_start, chunk in windows[:-1]:   # each cut is within search_seconds of the target
+        assert 50 * SR <= chunk_start + len(chunk) - core_start <= 70 * SR
+
+
+def test_cuts_land_in_pauses(monkeypatch):
+    audio = _recording(170, pauses=(57, 121))
+    _blocks(monkeypatch, audio)
+    cores = [core for _, core, _ in iter_windows("x.wav", sr=SR, window_seconds=60, overlap_seconds=5,
+                                                 search_seconds=10)]
+    assert [round(c / SR) for c in cores[1:]] == [57, 121]
+    assert all(audio[c] == 0.0 for c in cores[1:])
+
+
+def test_windows_from_a_wav_file(tmp_path):
+    sf = pytest.importorskip("soundfile")
+    audio = _recording(130) * 0.5
+    path = tmp_path / "long.wav"
+    sf.write(str(path), audio, SR, subtype="FLOAT")
+    windows = list(iter_windows(str(path), sr=SR, window_seconds=60, overlap_seconds=5, search_seconds=10,
+                                block_seconds=7))
+    assert len(windows) == 2
+    _check_windows(windows, audio, overlap=5 * SR)
+
+
+@pytest.mark.parametrize("window_seconds", [10, 5])
+def test_window_must_be_longer_than_the_cut_search(monkeypatch, window_seconds):
+    _blocks(monkeypatch, _recording(100))
+    with pytest.raises(ValueError, match="search_seconds"):
+        next(iter_windows("x.wav", sr=SR, window_seconds=window_seconds, search_seconds=10))
+
+
+def _unit(seed, dim=16):
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_tracker_links_the_same_speaker_across_windows():
+    alice, bob, carol = _unit(1), _unit(2), _unit(3)
+    tracker = SpeakerTracker(link_threshold=0.5)
+    assert tracker.link(["SPEAKER_00", "SPEAKER_01"], [alice, bob]) == {"SPEAKER_00": 0, "SPEAKER_01": 1}
+    # next window: diarization numbered them the other way round, and a new speaker joined
+    noisy_bob, noisy_alice = bob + 0.1 * _unit(4), alice + 0.1 * _unit(5)
+    mapping = tracker.link(["SPEAKER_00", "SPEAKER_01", "SPEAKER_02"], [noisy_bob, noisy_alice, carol])
+    assert mapping == {"SPEAKER_00": 1, "SPEAKER_01": 0, "SPEAKER_02": 2}
+    assert tracker.counts == [2, 2, 1]
+    centroids = tracker.centroids()
+    assert centroids.shape == (3, 16)
+    assert centroids[0] @ alice > 0.99 and centroids[1] @ bob > 0.99
+
+
+def test_tracker_links_one_to_one():
+    alice = _unit(1)
+    tracker = SpeakerTracker(link_threshold=0.5)
+    tracker.link(["SPEAKER_00"], [alice])
+    # two local labels close to the same global speaker: only the closer one is linked
+    mapping = tracker.link(["SPEAKER_00", "SPEAKER_01"], [alice + 0.3 * _unit(6), alice])
+    assert mapping == {"SPEAKER_01": 0, "SPEAKER_00": 1}
+    assert tracker.link([], np.zeros((0, 16))) == {}